@@ -6,7 +6,10 @@ Torrent Spider - 使用Scrapy爬取网站上的torrents链接地址
 使用方法:
 1. 基本使用: python app.py
 2. 指定URL: python app.py --urls "http://example.com,http://another.com"
-3. 指定输出格式: python app.py --output json  # 支持: json, csv, sqlite, all
+3. 指定输出格式: python app.py --output json  # 支持: json, jsonl, csv, sqlite, all
+4. 可恢复任务: python app.py --resume nightly --urls "http://example.com"  # 中断后再次运行 python app.py --resume nightly
+5. 全文搜索: python app.py search "关键词" --min-seeders 10  # 在SQLite输出中搜索
+6. 查询服务: python app.py serve --port 8080  # 提供搜索、按infohash查找和做种数排行的HTTP接口
 
 """
 
@@ -14,6 +17,10 @@ import os
 import sys
 import json
 import argparse
+import time
+import queue
+import sqlite3
+import multiprocessing
 from datetime import datetime
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
@@ -22,6 +29,15 @@ from scrapy.utils.project import get_project_settings
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from torrent_spider.spiders.torrent_spider import TorrentSpider
+from torrent_spider.jobs import load_manifest, save_manifest
+from torrent_spider.history import SwarmHistory
+from torrent_spider.pipelines import migrate_torrents_table
+from torrent_spider.search import open_readonly, search_torrents
+from torrent_spider.service import QueryServer
+from torrent_spider.merge import (
+    split_urls, shard_output_settings, jsonl_path, merge_json, merge_jsonl,
+    merge_csv, merge_sqlite, merge_dedup_indexes, remove_shard_files,
+)
 
 
 def apply_timestamp(config):
@@ -48,17 +64,71 @@ def load_config(config_file='config.json'):
             "download_delay": 2.0,
             "concurrent_requests": 1,
             "output_format": "all",
+            "list_only": False,
+            "detail_fields": [],
             "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         },
         "filter_settings": {
             "min_seeders": 0,
             # "blocked_keywords": ["spam", "fake", "virus"],
-            "max_pages": 10
+            "blocked_keywords_file": "",
+            "blocked_fields": ["name", "description", "category"],
+            "max_pages": 10,
+            "max_detail_links": 10
+        },
+        "budget_settings": {
+            "max_requests": 0,
+            "max_mb": 0,
+            "max_minutes": 0,
+            "action": "stop"
+        },
+        "priority_settings": {
+            "enabled": True,
+            "seeders_weight": 1.0,
+            "recency_weight": 2.0,
+            "recency_half_life_days": 30,
+            "category_weights": {},
+            "depth_penalty": 0.5
+        },
+        "concurrency_settings": {
+            "adaptive": True,
+            "max_total": 16,
+            "target_latency": 2.0,
+            "default": {"min": 1, "max": 4},
+            "domains": {}
+        },
+        "dedup_settings": {
+            "backend": "sqlite",
+            "bloom_capacity": 10000000,
+            "bloom_error_rate": 0.001,
+            "bloom_max_mb": 0
+        },
+        "incremental_settings": {
+            "enabled": False,
+            "state_file": "incremental_state.db"
+        },
+        "history_settings": {
+            "enabled": False,
+            "history_file": "swarm_history.db"
+        },
+        "job_settings": {
+            "jobs_dir": "jobs",
+            "checkpoint_interval": 30
+        },
+        "service_settings": {
+            "host": "127.0.0.1",
+            "port": 8080,
+            "pool_size": 4,
+            "cache_size": 1024,
+            "max_limit": 100
         },
         "output_settings": {
             "json_file": "torrents.json",
+            "jsonl_file": "torrents.jsonl",
+            "jsonl_gzip": False,
             "csv_file": "torrents.csv",
-            "sqlite_file": "torrents.db"
+            "sqlite_file": "torrents.db",
+            "dedup_file": "torrents_dedup.db"
         }
     }
     
@@ -87,26 +157,433 @@ def load_config(config_file='config.json'):
         return apply_timestamp(default_config)
 
 
-def setup_pipelines(output_format='all'):
+def setup_pipelines(output_format='all', history=False):
     """根据输出格式配置管道"""
+    # SQLite管道位于去重管道之前：历史上出现过的种子不再写入文件输出，
+    # 但仍会更新数据库中对应行的做种数和最后出现时间
     pipelines = {
         'torrent_spider.pipelines.TorrentSpiderPipeline': 100,
+        'torrent_spider.pipelines.FilterPipeline': 150,
         'torrent_spider.pipelines.DuplicatesPipeline': 200,
-        'torrent_spider.pipelines.FilterPipeline': 250,
     }
     
     if output_format in ['json', 'all']:
         pipelines['torrent_spider.pipelines.JsonWriterPipeline'] = 300
     
+    if output_format == 'jsonl':
+        pipelines['torrent_spider.pipelines.JsonLinesWriterPipeline'] = 350
+    
     if output_format in ['csv', 'all']:
         pipelines['torrent_spider.pipelines.CsvWriterPipeline'] = 400
     
     if output_format in ['sqlite', 'all']:
-        pipelines['torrent_spider.pipelines.SqlitePipeline'] = 500
+        pipelines['torrent_spider.pipelines.SqlitePipeline'] = 180
+    
+    # 时间序列同样需要已爬取过的种子的新观测，位于去重管道之前
+    if history:
+        pipelines['torrent_spider.pipelines.SwarmHistoryPipeline'] = 190
     
     return pipelines
 
 
+def job_directory(config, job_id):
+    return os.path.join(config['job_settings']['jobs_dir'], job_id)
+
+
+def prepare_job(config, job_id, urls, output_format):
+    """创建或恢复任务：新任务保存URL、输出格式和确定的输出文件名，恢复时沿用保存的设置
+
+    返回 (urls, output_format)，恢复时会用保存的输出文件名替换 config 中的设置。
+    """
+    job_dir = job_directory(config, job_id)
+    manifest = load_manifest(job_dir)
+    if manifest is not None:
+        if urls and urls != manifest['urls']:
+            print("注意: 恢复任务时使用任务保存的URL列表，忽略本次指定的URL")
+        config['output_settings'] = manifest['output_settings']
+        print(f"恢复任务 {job_id}（创建于 {manifest['created']}）")
+        return manifest['urls'], manifest['output_format']
+    if urls:
+        save_manifest(job_dir, {
+            'job_id': job_id,
+            'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'urls': urls,
+            'output_format': output_format,
+            'output_settings': config['output_settings'],
+        })
+        print(f"创建任务 {job_id}（任务目录: {job_dir}）")
+    return urls, output_format
+
+
+def build_settings(config, output_format, delay, concurrent, frontier_file=None, job_id=None):
+    """根据配置和命令行参数生成Scrapy设置"""
+    # 获取项目设置
+    settings = get_project_settings()
+    
+    # 使用共享的磁盘队列，多个进程（或主机）指向同一文件即可协同爬取
+    if frontier_file:
+        settings.set('SCHEDULER', 'torrent_spider.frontier.FrontierScheduler')
+        settings.set('FRONTIER_FILE', frontier_file)
+    
+    # 可恢复任务：定期检查点；未指定共享队列时使用任务私有的队列文件，
+    # 恢复时收回上次运行留下的租约
+    if job_id:
+        job_dir = job_directory(config, job_id)
+        settings.set('JOB_ID', job_id)
+        settings.set('JOB_DIR', job_dir)
+        settings.set('JOB_CHECKPOINT_INTERVAL', config['job_settings']['checkpoint_interval'])
+        if not frontier_file:
+            settings.set('SCHEDULER', 'torrent_spider.frontier.FrontierScheduler')
+            settings.set('FRONTIER_FILE', os.path.join(job_dir, 'frontier.db'))
+            settings.set('FRONTIER_RECLAIM_LEASES', True)
+    
+    # 配置管道
+    settings.set('ITEM_PIPELINES', setup_pipelines(output_format, config['history_settings']['enabled']))
+    settings.set('JSONL_GZIP', config['output_settings']['jsonl_gzip'])
+    
+    # 搜索页仅列表模式
+    settings.set('SEARCH_LIST_ONLY', config['spider_settings']['list_only'])
+    settings.set('SEARCH_DETAIL_FIELDS', config['spider_settings']['detail_fields'])
+    
+    # 每个来源的爬取预算（0为不限制）
+    budget_settings = config['budget_settings']
+    settings.set('CRAWL_BUDGET_MAX_REQUESTS', budget_settings['max_requests'])
+    settings.set('CRAWL_BUDGET_MAX_BYTES', int(budget_settings['max_mb'] * 1024 * 1024))
+    settings.set('CRAWL_BUDGET_MAX_SECONDS', budget_settings['max_minutes'] * 60)
+    settings.set('CRAWL_BUDGET_ACTION', budget_settings['action'])
+    
+    # 增量爬取：条件请求列表页，遇到全部已见过的列表页时停止翻页
+    settings.set('INCREMENTAL_ENABLED', config['incremental_settings']['enabled'])
+    settings.set('INCREMENTAL_FILE', config['incremental_settings']['state_file'])
+    
+    # 做种数/下载数时间序列
+    settings.set('HISTORY_FILE', config['history_settings']['history_file'])
+    
+    # 按列表页信息估算的请求优先级
+    priority_settings = config['priority_settings']
+    settings.set('PRIORITY_ENABLED', priority_settings['enabled'])
+    settings.set('PRIORITY_SEEDERS_WEIGHT', priority_settings['seeders_weight'])
+    settings.set('PRIORITY_RECENCY_WEIGHT', priority_settings['recency_weight'])
+    settings.set('PRIORITY_RECENCY_HALF_LIFE_DAYS', priority_settings['recency_half_life_days'])
+    settings.set('PRIORITY_CATEGORY_WEIGHTS', priority_settings['category_weights'])
+    settings.set('PRIORITY_DEPTH_PENALTY', priority_settings['depth_penalty'])
+    
+    # 配置去重后端
+    settings.set('DEDUP_BACKEND', config['dedup_settings']['backend'])
+    settings.set('DEDUP_BLOOM_CAPACITY', config['dedup_settings']['bloom_capacity'])
+    settings.set('DEDUP_BLOOM_ERROR_RATE', config['dedup_settings']['bloom_error_rate'])
+    settings.set('DEDUP_BLOOM_MAX_MB', config['dedup_settings']['bloom_max_mb'])
+    
+    # 配置请求延迟和并发
+    # 启用自适应并发时 --concurrent 为每个域名的初始并发数，总并发上限取 max_total
+    concurrency_settings = config['concurrency_settings']
+    settings.set('DOWNLOAD_DELAY', delay)
+    settings.set('CONCURRENT_REQUESTS_PER_DOMAIN', concurrent)
+    settings.set('ADAPTIVE_CONCURRENCY_ENABLED', concurrency_settings['adaptive'])
+    if concurrency_settings['adaptive']:
+        settings.set('CONCURRENT_REQUESTS', max(concurrent, concurrency_settings['max_total']))
+        settings.set('ADAPTIVE_CONCURRENCY_TARGET_LATENCY', concurrency_settings['target_latency'])
+        settings.set('ADAPTIVE_CONCURRENCY_DEFAULT', concurrency_settings['default'])
+        settings.set('ADAPTIVE_CONCURRENCY_DOMAINS', concurrency_settings['domains'])
+        # 下载槽的延迟由自适应并发按并发数设置，AutoThrottle 会把它改回按延迟估算的值
+        settings.set('AUTOTHROTTLE_ENABLED', False)
+    else:
+        settings.set('CONCURRENT_REQUESTS', concurrent)
+        # 不使用自适应并发时由 AutoThrottle 按响应时间调整下载延迟
+        settings.set('AUTOTHROTTLE_ENABLED', True)
+    
+    # 配置用户代理
+    settings.set('DEFAULT_REQUEST_HEADERS', {
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en',
+        'User-Agent': config['spider_settings']['user_agent']
+    })
+    
+    return settings
+
+
+def run_crawl(settings, urls, output_settings, filter_config):
+    """在当前进程中运行爬虫直到结束，返回各来源的预算消耗"""
+    # 创建爬虫进程
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(TorrentSpider)
+    
+    # 启动爬虫，传递配置参数
+    process.crawl(
+        crawler, 
+        urls=','.join(urls),
+        json_file=output_settings['json_file'],
+        jsonl_file=output_settings['jsonl_file'],
+        csv_file=output_settings['csv_file'],
+        sqlite_file=output_settings['sqlite_file'],
+        dedup_file=output_settings['dedup_file'],
+        filter_config=filter_config
+    )
+    process.start()
+    # 爬虫创建失败时统计收集器可能还没有设置：较新的Scrapy访问 crawler.stats 时抛出
+    # RuntimeError，较旧的版本返回None，两种情况都不能掩盖原来的错误
+    try:
+        stats = crawler.stats
+    except RuntimeError:
+        return {}
+    if stats is None:
+        return {}
+    return stats.get_value('budget/sources', {})
+
+
+def run_worker(urls, config, output_format, delay, concurrent, output_settings, frontier_file=None,
+               results=None):
+    """工作进程入口：只爬取分配到的URL，结果写入本分片的输出文件，预算消耗发回主进程"""
+    settings = build_settings(config, output_format, delay, concurrent, frontier_file)
+    sources = run_crawl(settings, urls, output_settings, config['filter_settings'])
+    if results is not None:
+        results.put(sources)
+
+
+def merge_budget_sources(summaries):
+    """合并各工作进程的预算消耗（共享队列时同一来源可能分布在多个进程中）"""
+    merged = {}
+    for sources in summaries:
+        for source, usage in sources.items():
+            total = merged.get(source)
+            if total is None:
+                merged[source] = dict(usage)
+                continue
+            for key in ('requests', 'pages', 'bytes', 'dropped', 'deprioritized'):
+                total[key] += usage[key]
+            total['seconds'] = max(total['seconds'], usage['seconds'])
+            total['exhausted'] = total['exhausted'] or usage['exhausted']
+    return merged
+
+
+def print_budget_summary(sources):
+    """打印每个来源的爬取预算消耗"""
+    if not sources:
+        return
+    print("各来源爬取消耗:")
+    for source, usage in sorted(sources.items()):
+        status = f"，预算已用尽({usage['exhausted']})" if usage['exhausted'] else ''
+        skipped = usage['dropped'] + usage['deprioritized']
+        if skipped:
+            status += f"，{skipped} 个请求被{'丢弃' if usage['dropped'] else '降低优先级'}"
+        print(f"  - {source}: {usage['pages']} 页, {usage['requests']} 个请求, "
+              f"{usage['bytes'] / 1024 / 1024:.2f} MB, {usage['seconds']} 秒{status}")
+
+
+def run_sharded(urls, workers, config, output_format, delay, concurrent, frontier_file=None):
+    """把URL分配到多个工作进程并行爬取，结束后合并各分片的输出"""
+    if frontier_file:
+        # 使用共享队列时每个进程都提交全部起始URL，由队列去重并动态分配
+        shards = [urls] * workers
+    else:
+        shards = split_urls(urls, workers)
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = []
+    shard_settings = []
+    
+    for index, shard_urls in enumerate(shards):
+        output_settings = shard_output_settings(config['output_settings'], index)
+        shard_settings.append(output_settings)
+        process = context.Process(
+            target=run_worker,
+            args=(shard_urls, config, output_format, delay, concurrent, output_settings, frontier_file,
+                  results),
+            name=f'torrent-worker-{index}'
+        )
+        process.start()
+        processes.append(process)
+        print(f"工作进程 {index} (pid {process.pid}): {len(shard_urls)} 个URL")
+    
+    # 在等待进程结束前取出结果，避免队列未读完导致工作进程无法退出
+    summaries = []
+    while len(summaries) < len(processes) and any(process.is_alive() for process in processes):
+        try:
+            summaries.append(results.get(timeout=1))
+        except queue.Empty:
+            pass
+    while True:
+        try:
+            summaries.append(results.get_nowait())
+        except queue.Empty:
+            break
+    
+    for index, process in enumerate(processes):
+        process.join()
+        if process.exitcode != 0:
+            print(f"警告: 工作进程 {index} 异常退出 (exit code {process.exitcode})，将合并其已写入的结果")
+    
+    merge_outputs(config, output_format, shard_settings)
+    return merge_budget_sources(summaries)
+
+
+def merge_outputs(config, output_format, shard_settings):
+    """合并各分片的输出文件并跨分片去重，完成后删除分片文件"""
+    output_settings = config['output_settings']
+    compress = output_settings['jsonl_gzip']
+    merged = []
+    
+    if output_format in ['json', 'all']:
+        count = merge_json([s['json_file'] for s in shard_settings], output_settings['json_file'])
+        merged.append(('JSON', count, [s['json_file'] for s in shard_settings]))
+    
+    if output_format == 'jsonl':
+        shard_files = [jsonl_path(s['jsonl_file'], compress) for s in shard_settings]
+        count = merge_jsonl(shard_files, jsonl_path(output_settings['jsonl_file'], compress))
+        merged.append(('JSON Lines', count, shard_files))
+    
+    if output_format in ['csv', 'all']:
+        count = merge_csv([s['csv_file'] for s in shard_settings], output_settings['csv_file'])
+        merged.append(('CSV', count, [s['csv_file'] for s in shard_settings]))
+    
+    if output_format in ['sqlite', 'all']:
+        count = merge_sqlite([s['sqlite_file'] for s in shard_settings], output_settings['sqlite_file'])
+        merged.append(('SQLite', count, [s['sqlite_file'] for s in shard_settings]))
+    
+    dedup_files = [s['dedup_file'] for s in shard_settings]
+    merge_dedup_indexes(dedup_files, output_settings['dedup_file'])
+    
+    for label, count, shard_files in merged:
+        print(f"合并{label}分片: {count} 条记录")
+        remove_shard_files(shard_files)
+    remove_shard_files(dedup_files)
+
+
+def migrate_databases(filenames, target=None):
+    """升级旧版本的SQLite输出；指定 target 时把各数据库合并到 target（原文件不变）"""
+    if target:
+        count = merge_sqlite(filenames, target)
+        connection = sqlite3.connect(target)
+        rows = connection.execute('SELECT COUNT(*) FROM torrents').fetchone()[0]
+        connection.close()
+        print(f"合并 {len(filenames)} 个数据库的 {count} 条记录到 {target}，合并后 {rows} 个种子")
+        return
+    for filename in filenames:
+        if not os.path.exists(filename):
+            print(f"跳过不存在的文件: {filename}")
+            continue
+        connection = sqlite3.connect(filename)
+        try:
+            merged = migrate_torrents_table(connection)
+            rows = connection.execute('SELECT COUNT(*) FROM torrents').fetchone()[0]
+        finally:
+            connection.close()
+        print(f"已升级 {filename}: 合并 {merged} 条重复记录，剩余 {rows} 个种子")
+
+
+def show_history(filename, infohash, period='raw'):
+    """显示一个种子的做种数/下载数历史"""
+    if not os.path.exists(filename):
+        print(f"历史文件 {filename} 不存在")
+        return
+    history = SwarmHistory(filename)
+    try:
+        if period == 'raw':
+            rows = [(datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S'), f'{seeders}', f'{leechers}')
+                    for ts, seeders, leechers in history.history(infohash)]
+            header = ('时间', '做种数', '下载数')
+        else:
+            fmt = '%Y-%m-%d %H:00' if period == 'hour' else '%Y-%m-%d'
+            rows = [(datetime.fromtimestamp(row['start']).strftime(fmt), str(row['changes']),
+                     f"{row['seeders_min']}/{row['seeders_avg']:.0f}/{row['seeders_max']}",
+                     f"{row['leechers_min']}/{row['leechers_avg']:.0f}/{row['leechers_max']}")
+                    for row in history.rollup(infohash, period)]
+            header = ('时间', '变化次数', '做种数 最小/平均/最大', '下载数 最小/平均/最大')
+    except ValueError as e:
+        print(e)
+        return
+    finally:
+        history.close()
+    if not rows:
+        print(f"没有 {infohash} 的记录")
+        return
+    print('  '.join(header))
+    for row in rows:
+        print('  '.join(row))
+
+
+def search_main(argv):
+    """search 子命令：在SQLite输出中全文搜索"""
+    parser = argparse.ArgumentParser(prog='app.py search', description='在SQLite输出中全文搜索种子')
+    parser.add_argument('query', help='搜索词，多个词之间为AND；"带引号的短语"、前缀*、-排除词')
+    parser.add_argument('--config', type=str, default='config.json', help='配置文件路径（默认: config.json）')
+    parser.add_argument('--db', type=str, help='数据库文件（默认: 配置文件中的 sqlite_file）')
+    parser.add_argument('--min-seeders', type=int, default=0, help='最少做种数')
+    parser.add_argument('--min-size', type=str, help='最小文件大小，如 700MB')
+    parser.add_argument('--max-size', type=str, help='最大文件大小，如 4.5GB')
+    parser.add_argument('--category', type=str, help='分类（前缀匹配）')
+    parser.add_argument('--sort', choices=['rank', 'seeders', 'size', 'newest'], default='rank',
+                        help='排序方式：rank 相关度（默认）、seeders 做种数、size 大小、newest 上传时间')
+    parser.add_argument('--limit', type=int, default=20, help='返回条数（默认: 20）')
+    parser.add_argument('--json', action='store_true', help='以JSON Lines输出（每行一条结果）')
+    args = parser.parse_args(argv)
+    
+    filename = args.db or load_config(args.config)['output_settings']['sqlite_file']
+    if not os.path.exists(filename):
+        print(f"数据库文件 {filename} 不存在，请用 --db 指定")
+        return
+    connection = open_readonly(filename)
+    try:
+        if not connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'torrents_fts'").fetchone():
+            print(f"{filename} 中没有全文索引，请先运行 python app.py --migrate-db {filename}")
+            return
+        start = time.perf_counter()
+        try:
+            results = search_torrents(connection, args.query, min_seeders=args.min_seeders,
+                                      min_size=args.min_size, max_size=args.max_size,
+                                      category=args.category, order=args.sort, limit=args.limit)
+        except ValueError as e:
+            print(e)
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        connection.close()
+    
+    if args.json:
+        for row in results:
+            print(json.dumps(row, ensure_ascii=False))
+        return
+    print(f"找到 {len(results)} 条结果（{elapsed:.1f} ms）")
+    for row in results:
+        print(f"[{row['seeders'] if row['seeders'] is not None else '-':>5}/"
+              f"{row['leechers'] if row['leechers'] is not None else '-':<5}] "
+              f"{row['size'] or '-':>10}  {row['name']}")
+        link = row['magnet_url'] or row['torrent_url']
+        if link:
+            print(f"{'':>24}{link}")
+
+
+def serve_main(argv):
+    """serve 子命令：在SQLite输出上启动只读HTTP查询服务"""
+    parser = argparse.ArgumentParser(prog='app.py serve', description='在SQLite输出上启动只读HTTP查询服务')
+    parser.add_argument('--config', type=str, default='config.json', help='配置文件路径（默认: config.json）')
+    parser.add_argument('--db', type=str, help='数据库文件（默认: 配置文件中的 sqlite_file）')
+    parser.add_argument('--host', type=str, help='监听地址（默认: service_settings.host）')
+    parser.add_argument('--port', type=int, help='监听端口（默认: service_settings.port）')
+    args = parser.parse_args(argv)
+    
+    config = load_config(args.config)
+    service_settings = config['service_settings']
+    filename = args.db or config['output_settings']['sqlite_file']
+    if not os.path.exists(filename):
+        print(f"数据库文件 {filename} 不存在，请用 --db 指定")
+        return
+    host = args.host or service_settings['host']
+    port = service_settings['port'] if args.port is None else args.port
+    server = QueryServer(filename, host, port, pool_size=service_settings['pool_size'],
+                         cache_size=service_settings['cache_size'], max_limit=service_settings['max_limit'])
+    print(f"查询服务已启动: http://{host}:{server.server_address[1]}/ （数据库: {filename}，Ctrl+C 停止）")
+    print("  GET /search?q=关键词&min_seeders=&min_size=&max_size=&category=&sort=&limit=&cursor=")
+    print("  GET /torrents/<infohash>")
+    print("  GET /top?category=&limit=&cursor=")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n查询服务已停止")
+    finally:
+        server.server_close()
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='Torrent Spider - 爬取种子链接')
@@ -125,7 +602,7 @@ def main():
     parser.add_argument(
         '--output', 
         type=str, 
-        choices=['json', 'csv', 'sqlite', 'all'],
+        choices=['json', 'jsonl', 'csv', 'sqlite', 'all'],
         help='输出格式（覆盖配置文件中的设置）',
         default='all'
     )
@@ -139,58 +616,138 @@ def main():
         type=int,
         help='并发请求数（覆盖配置文件中的设置）'
     )
+    parser.add_argument(
+        '--list-only',
+        action='store_true',
+        help='搜索页仅列表模式：直接用列表行生成结果，只在缺少 detail_fields 中的字段时请求详情页'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='增量爬取：列表页使用条件请求，遇到全部已爬取过的列表页时停止翻页（适合定时刷新）'
+    )
+    parser.add_argument(
+        '--track-history',
+        action='store_true',
+        help='记录每个种子的做种数/下载数时间序列（同 history_settings.enabled）'
+    )
+    parser.add_argument(
+        '--history',
+        type=str,
+        metavar='INFOHASH',
+        help='显示一个种子的做种数/下载数历史后退出'
+    )
+    parser.add_argument(
+        '--history-period',
+        choices=['raw', 'hour', 'day'],
+        default='raw',
+        help='与 --history 一起使用：raw 为原始观测（默认），hour/day 为按小时/按天的汇总'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='工作进程数，大于1时按域名/URL分片并行爬取并在结束后合并输出（默认: 1）'
+    )
+    parser.add_argument(
+        '--frontier',
+        type=str,
+        help='共享请求队列文件（SQLite），多个进程或主机使用同一文件协同爬取同一任务'
+    )
+    parser.add_argument(
+        '--resume',
+        type=str,
+        metavar='JOB_ID',
+        help='可恢复任务：首次运行时创建任务，进程中断后用同一ID再次运行即从上次检查点继续'
+    )
+    parser.add_argument(
+        '--migrate-db',
+        type=str,
+        nargs='+',
+        metavar='FILE',
+        help='升级旧版本的SQLite输出文件（添加infohash列和索引、合并重复行）后退出'
+    )
+    parser.add_argument(
+        '--migrate-into',
+        type=str,
+        metavar='FILE',
+        help='与 --migrate-db 一起使用：把各数据库合并到该文件，而不是逐个原地升级'
+    )
     
     args = parser.parse_args()
     
+    if args.migrate_db:
+        migrate_databases(args.migrate_db, args.migrate_into)
+        return
+    
     # 加载配置文件
     config = load_config(args.config)
     
+    if args.history:
+        show_history(config['history_settings']['history_file'], args.history, args.history_period)
+        return
+    
     # 合并命令行参数和配置文件设置（命令行参数优先）
     output_format = args.output if args.output else config['spider_settings']['output_format']
     delay = args.delay if args.delay is not None else config['spider_settings']['download_delay']
     concurrent = args.concurrent if args.concurrent is not None else config['spider_settings']['concurrent_requests']
     
-    # 获取项目设置
-    settings = get_project_settings()
-    
-    # 配置管道
-    settings.set('ITEM_PIPELINES', setup_pipelines(output_format))
-    
-    # 配置请求延迟和并发
-    settings.set('DOWNLOAD_DELAY', delay)
-    settings.set('CONCURRENT_REQUESTS', concurrent)
-    settings.set('CONCURRENT_REQUESTS_PER_DOMAIN', concurrent)
-    
-    # 配置用户代理
-    settings.set('DEFAULT_REQUEST_HEADERS', {
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        'Accept-Language': 'en',
-        'User-Agent': config['spider_settings']['user_agent']
-    })
-    
-    # 创建爬虫进程
-    process = CrawlerProcess(settings)
+    if args.list_only:
+        config['spider_settings']['list_only'] = True
+    if args.incremental:
+        config['incremental_settings']['enabled'] = True
+    if args.track_history:
+        config['history_settings']['enabled'] = True
     
     # 处理URL参数
     if args.urls:
         urls = args.urls.split(',')
     else:
         urls = config['default_urls']
-        if not urls:
-            print("警告: 没有指定要爬取的URL")
-            print("请在配置文件中设置 default_urls 或使用 --urls 参数指定要爬取的网站")
-            print("例如:")
-            print("python app.py --urls \"https://example.com,https://another.com\"")
-            print("或者编辑 config.json 文件中的 default_urls 字段")
-            print("\\n注意: 请确保遵守网站的robots.txt和使用条款")
+    
+    if args.resume:
+        if args.workers > 1:
+            print("错误: --resume 暂不支持多个工作进程（--workers），多进程协同请使用 --frontier")
             return
+        urls, output_format = prepare_job(config, args.resume, urls, output_format)
+    
+    if not urls:
+        print("警告: 没有指定要爬取的URL")
+        print("请在配置文件中设置 default_urls 或使用 --urls 参数指定要爬取的网站")
+        print("例如:")
+        print("python app.py --urls \"https://example.com,https://another.com\"")
+        print("或者编辑 config.json 文件中的 default_urls 字段")
+        print("\\n注意: 请确保遵守网站的robots.txt和使用条款")
+        return
     
     print(f"开始爬取以下网站:")
     for url in urls:
         print(f"  - {url}")
     print(f"输出格式: {output_format}")
     print(f"请求延迟: {delay}秒")
-    print(f"并发数: {concurrent}")
+    if config['concurrency_settings']['adaptive']:
+        print(f"并发数: {concurrent}（按域名自适应调整）")
+    else:
+        print(f"并发数: {concurrent}")
+    if config['spider_settings']['list_only']:
+        detail_fields = ', '.join(config['spider_settings']['detail_fields']) or '无'
+        print(f"搜索页仅列表模式（按需请求详情页的字段: {detail_fields}）")
+    if config['incremental_settings']['enabled']:
+        print(f"增量爬取（状态文件: {config['incremental_settings']['state_file']}）")
+    if config['history_settings']['enabled']:
+        print(f"记录做种数历史（{config['history_settings']['history_file']}）")
+    if args.workers > 1:
+        print(f"工作进程数: {args.workers}")
+    if args.frontier:
+        print(f"共享请求队列: {args.frontier}")
+    if args.resume:
+        print(f"可恢复任务: {args.resume}（每 {config['job_settings']['checkpoint_interval']} 秒检查点）")
+    budget_settings = config['budget_settings']
+    limits = [f"{budget_settings['max_requests']} 个请求" if budget_settings['max_requests'] else '',
+              f"{budget_settings['max_mb']} MB" if budget_settings['max_mb'] else '',
+              f"{budget_settings['max_minutes']} 分钟" if budget_settings['max_minutes'] else '']
+    if any(limits):
+        print(f"每个来源的爬取预算: {', '.join(l for l in limits if l)}（用尽后: {budget_settings['action']}）")
     print(f"配置文件: {args.config}")
     print("-" * 50)
     
@@ -198,16 +755,11 @@ def main():
     start_time = datetime.now()
     # print(f"任务开始时间: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
     
-    # 启动爬虫，传递配置参数
-    process.crawl(
-        TorrentSpider, 
-        urls=','.join(urls),
-        json_file=config['output_settings']['json_file'],
-        csv_file=config['output_settings']['csv_file'],
-        sqlite_file=config['output_settings']['sqlite_file'],
-        filter_config=config['filter_settings']
-    )
-    process.start()
+    if args.workers > 1:
+        sources = run_sharded(urls, args.workers, config, output_format, delay, concurrent, args.frontier)
+    else:
+        settings = build_settings(config, output_format, delay, concurrent, args.frontier, args.resume)
+        sources = run_crawl(settings, urls, config['output_settings'], config['filter_settings'])
     
     # 记录结束时间并计算耗时
     end_time = datetime.now()
@@ -221,10 +773,15 @@ def main():
     print("输出文件:")
     if output_format in ['json', 'all'] and os.path.exists(config['output_settings']['json_file']):
         print(f"  - {config['output_settings']['json_file']}")
+    if output_format == 'jsonl':
+        jsonl_file = jsonl_path(config['output_settings']['jsonl_file'], config['output_settings']['jsonl_gzip'])
+        if os.path.exists(jsonl_file):
+            print(f"  - {jsonl_file}")
     if output_format in ['csv', 'all'] and os.path.exists(config['output_settings']['csv_file']):
         print(f"  - {config['output_settings']['csv_file']}")
     if output_format in ['sqlite', 'all'] and os.path.exists(config['output_settings']['sqlite_file']):
         print(f"  - {config['output_settings']['sqlite_file']}")
+    print_budget_summary(sources)
 
 
 def show_examples():
@@ -247,9 +804,43 @@ def show_examples():
 5. 只输出JSON格式（覆盖配置文件）:
    python app.py --output json
 
+   输出JSON Lines格式（每行一条记录，爬取过程中即可读取）:
+   python app.py --output jsonl
+
 6. 设置请求延迟和并发数（覆盖配置文件）:
    python app.py --delay 3 --concurrent 2
 
+7. 使用多个工作进程并行爬取（结束后自动合并各进程的输出）:
+   python app.py --urls "https://site1.com,https://site2.com" --workers 4
+
+8. 多个进程或主机共享同一个请求队列（同一页面只会被抓取一次，进程崩溃后其
+   未完成的请求在租约到期后由其他进程接手）:
+   python app.py --urls "https://site1.com" --frontier /shared/crawl_frontier.db --workers 4
+
+9. 增量爬取（列表页条件请求，遇到全部已爬取过的列表页时停止翻页，适合每小时刷新）:
+   python app.py --urls "https://site1.com/search/?search=ubuntu" --incremental
+
+10. 可恢复任务（定期检查点，进程被杀死或重新部署后用同一任务ID继续，不会重复抓取或重复写入）:
+   python app.py --urls "https://site1.com" --resume crawl-2024-06
+   python app.py --resume crawl-2024-06
+
+11. 升级旧版本的SQLite输出（每个种子只保留一行），或把按时间戳命名的多个数据库合并为一个:
+   python app.py --migrate-db output/torrents_20240601_020000.db
+   python app.py --migrate-db output/torrents_*.db --migrate-into output/torrents.db
+
+12. 记录做种数/下载数的变化，并查看某个种子的历史（原始观测或按小时/按天汇总）:
+   python app.py --urls "https://site1.com" --track-history
+   python app.py --history 0123456789abcdef0123456789abcdef01234567 --history-period day
+
+13. 在SQLite输出中全文搜索（按相关度排序，支持中文，可按做种数、大小和分类过滤）:
+   python app.py search "ubuntu 22.04" --min-seeders 10 --max-size 5GB
+   python app.py search 中文字幕 --category Movies --sort seeders
+
+14. 启动只读HTTP查询服务（搜索、按infohash查找、做种数排行，结果带 next_cursor 分页）:
+   python app.py serve --port 8080
+   curl "http://127.0.0.1:8080/search?q=ubuntu&min_seeders=10"
+   curl "http://127.0.0.1:8080/top?category=Movies&limit=50"
+
 配置文件示例 (config.json):
 {
   "default_urls": [
@@ -276,5 +867,9 @@ def show_examples():
 if __name__ == '__main__':
     if len(sys.argv) > 1 and sys.argv[1] in ['--help', '-h', 'help']:
         show_examples()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'search':
+        search_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve_main(sys.argv[2:])
     else:
         main()
\ No newline at end of file
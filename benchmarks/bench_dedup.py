@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+去重后端基准测试 - 对比原内存字符串集合、SQLite精确索引和布隆过滤器索引的
+内存占用与查询吞吐量
+
+使用方法:
+    python benchmarks/bench_dedup.py [--items 200000] [--duplicate-ratio 0.3]
+
+吞吐量和内存分两次运行测量，避免tracemalloc拖慢计时。内存为tracemalloc统计的
+Python侧峰值（包含集合保留的字符串）；SQLite页缓存由C库分配，不计入其中，
+其上限由 cache_size 决定。
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from torrent_spider.dedup import InfohashIndex, BloomInfohashIndex, extract_infohash
+
+
+def make_keys(count, duplicate_ratio, seed=42):
+    """生成 (infohash, 序号) 列表，磁力链接字符串在测量过程中再构造"""
+    rng = random.Random(seed)
+    unique = [rng.getrandbits(160) for _ in range(int(count * (1 - duplicate_ratio)))]
+    keys = [(unique[i] if i < len(unique) else rng.choice(unique), i) for i in range(count)]
+    rng.shuffle(keys)
+    return keys
+
+
+def magnets(keys):
+    for infohash, i in keys:
+        # 同一种子的dn不同，原字符串集合无法识别这类重复
+        yield (f'magnet:?xt=urn:btih:{infohash:040x}&dn=Some.Release.{i}'
+               f'&tr=udp%3A%2F%2Ftracker.example.org%3A2710%2Fannounce')
+
+
+def run_set(keys, directory):
+    """原实现：保存完整磁力链接字符串的集合"""
+    seen = set()
+    duplicates = 0
+    for magnet in magnets(keys):
+        if magnet in seen:
+            duplicates += 1
+        else:
+            seen.add(magnet)
+    return duplicates, seen
+
+
+def run_sqlite(keys, directory):
+    index = InfohashIndex(os.path.join(directory, f'sqlite_{time.time_ns()}.db'))
+    return run_index(index, keys)
+
+
+def run_bloom(keys, directory, error_rate=0.001):
+    index = BloomInfohashIndex(os.path.join(directory, f'bloom_{time.time_ns()}.db'),
+                               capacity=len(keys), error_rate=error_rate)
+    return run_index(index, keys)
+
+
+def run_index(index, keys):
+    duplicates = 0
+    for magnet in magnets(keys):
+        if not index.add_infohash(extract_infohash(magnet)):
+            duplicates += 1
+    index.close()
+    return duplicates, index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='去重后端基准测试')
+    parser.add_argument('--items', type=int, default=200000, help='磁力链接数量')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.3, help='重复比例')
+    args = parser.parse_args()
+
+    keys = make_keys(args.items, args.duplicate_ratio)
+    print(f"{args.items} 条磁力链接，重复比例 {args.duplicate_ratio}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for label, func in [('set', run_set), ('sqlite', run_sqlite), ('bloom', run_bloom)]:
+            start = time.perf_counter()
+            duplicates, holder = func(keys, directory)
+            elapsed = time.perf_counter() - start
+            del holder
+
+            tracemalloc.start()
+            _, holder = func(keys, directory)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f"  {label:<8} {args.items / elapsed:>10,.0f} 次/秒  "
+                  f"峰值内存 {peak / 1024 / 1024:>7.1f} MB  识别重复 {duplicates}")
+            if label == 'bloom':
+                print(f"  布隆过滤器位数组 {holder.bloom.memory_bytes / 1024 / 1024:.2f} MB，"
+                      f"{holder.bloom.hash_count} 个哈希函数")
+            del holder
+
+
+if __name__ == '__main__':
+    main()
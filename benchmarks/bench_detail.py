@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+详情页解析基准测试 - 对比逐链接提取页面信息与按页面共享提取结果、合并同一发布的链接
+
+使用方法:
+    python benchmarks/bench_detail.py [--mirrors 1,4,16] [--rounds 200]
+
+以 generic_detail.html 为基础，在链接区放入 N 个镜像（每个镜像一个以infohash
+命名的种子文件链接和对应的磁力链接）。原实现对每个链接重复提取标题、大小、
+种子数和描述，并为种子文件和磁力链接分别生成一条记录；现实现每个页面只提取
+一次，同一发布合并为一条记录。
+"""
+
+import os
+import re
+import sys
+import time
+import hashlib
+import argparse
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapy.http import HtmlResponse, Request
+
+from torrent_spider.profiles import GENERIC_PROFILE
+from torrent_spider.spiders.torrent_spider import TorrentSpider
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+URL = 'https://example.org/details/1/Documentary'
+LINKS_PATTERN = re.compile(r'<div class="links">.*?</div>', re.S)
+
+
+def make_page(template, mirrors):
+    """把固定页面的链接区替换为 mirrors 个镜像"""
+    links = []
+    for index in range(mirrors):
+        infohash = hashlib.sha1(b'release-%d' % index).hexdigest().upper()
+        links.append(f'<a href="/torrent/{infohash}.torrent">下载种子 {index}</a>')
+        links.append(f'<a href="magnet:?xt=urn:btih:{infohash}&amp;dn=doc.{index}">磁力链接 {index}</a>')
+    return LINKS_PATTERN.sub(lambda _: '<div class="links">\n' + '\n'.join(links) + '\n</div>', template)
+
+
+def legacy_parse_detail(spider, response, profile=GENERIC_PROFILE):
+    """原实现：每个种子文件链接和磁力链接各生成一条记录，每条记录重新提取页面信息"""
+    source_url = response.meta.get('source_url', response.url)
+    for link in response.css(profile.selectors['detail_torrent_links']):
+        href = link.css('::attr(href)').get()
+        if href:
+            yield spider.create_detailed_torrent_item(response, torrent_url=urljoin(response.url, href),
+                                                      source_url=source_url, profile=profile)
+    for link in response.css(profile.selectors['detail_magnet_links']):
+        href = link.css('::attr(href)').get()
+        if href:
+            yield spider.create_detailed_torrent_item(response, magnet_url=href, source_url=source_url,
+                                                      profile=profile)
+
+
+def timeit(parse, body, rounds):
+    """每轮使用新的响应对象，避免选择器缓存影响结果；返回 (每页耗时, 记录数)"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        response = HtmlResponse(url=URL, request=Request(URL), body=body, encoding='utf-8')
+        items = list(parse(response))
+    return (time.perf_counter() - start) / rounds, len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='详情页解析基准测试')
+    parser.add_argument('--mirrors', type=str, default='1,4,16', help='每页镜像数量，逗号分隔')
+    parser.add_argument('--rounds', type=int, default=200, help='每种情况的重复次数')
+    args = parser.parse_args()
+
+    with open(os.path.join(FIXTURE_DIR, 'generic_detail.html'), 'r', encoding='utf-8') as f:
+        template = f.read()
+    spider = TorrentSpider()
+
+    print(f"{'镜像数':>6}{'原实现':>14}{'记录数':>8}{'现实现':>14}{'记录数':>8}{'加速比':>10}")
+    for mirrors in [int(m) for m in args.mirrors.split(',')]:
+        body = make_page(template, mirrors).encode('utf-8')
+        legacy_time, legacy_items = timeit(lambda r: legacy_parse_detail(spider, r), body, args.rounds)
+        shared_time, shared_items = timeit(spider.parse_detail, body, args.rounds)
+        print(f"{mirrors:>8}{legacy_time * 1000:>12.3f} ms{legacy_items:>10}"
+              f"{shared_time * 1000:>12.3f} ms{shared_items:>10}{legacy_time / shared_time:>11.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+元数据提取基准测试 - 对比逐条 re.search 与单遍预编译提取器
+
+使用方法:
+    python benchmarks/bench_extract.py [--rounds 200]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from torrent_spider.extractors import (
+    RARBG_DETAIL_FIELDS, GENERIC_DETAIL_FIELDS,
+    RARBG_DETAIL_EXTRACTOR, GENERIC_DETAIL_EXTRACTOR,
+)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def legacy_extract(fields, page_text):
+    """原实现：每个模式单独 re.search 扫描全文"""
+    result = {}
+    for name, patterns, convert in fields:
+        for pattern in patterns:
+            match = re.search(pattern, page_text, re.IGNORECASE)
+            if match:
+                value = match.group(1)
+                result[name] = convert(value) if convert else value
+                break
+    return result
+
+
+def timeit(func, text, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(text)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='元数据提取基准测试')
+    parser.add_argument('--rounds', type=int, default=200, help='每个页面的重复次数')
+    args = parser.parse_args()
+
+    cases = [
+        ('rarbg_detail.html', RARBG_DETAIL_FIELDS, RARBG_DETAIL_EXTRACTOR),
+        ('generic_detail.html', GENERIC_DETAIL_FIELDS, GENERIC_DETAIL_EXTRACTOR),
+    ]
+
+    for filename, fields, extractor in cases:
+        with open(os.path.join(FIXTURE_DIR, filename), 'r', encoding='utf-8') as f:
+            text = f.read()
+
+        expected = legacy_extract(fields, text)
+        actual = extractor.extract(text)
+        if expected != actual:
+            print(f"{filename}: 结果不一致!\n  legacy: {expected}\n  engine: {actual}")
+            sys.exit(1)
+
+        legacy_time = timeit(lambda t: legacy_extract(fields, t), text, args.rounds)
+        engine_time = timeit(extractor.extract, text, args.rounds)
+
+        print(f"{filename} ({len(text)} chars)")
+        print(f"  提取结果: {actual}")
+        print(f"  逐条匹配: {legacy_time * 1000:.3f} ms/页")
+        print(f"  单遍提取: {engine_time * 1000:.3f} ms/页")
+        print(f"  加速比:   {legacy_time / engine_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
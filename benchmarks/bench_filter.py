@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+屏蔽词匹配基准测试 - 对比原逐个关键词子串判断与编译后的 KeywordMatcher
+
+使用方法:
+    python benchmarks/bench_filter.py [--items 20000] [--keywords 10,1000,10000]
+
+两种实现只检查名称时的过滤结果必须一致；另外给出 ItemFilter 一次扫描名称、
+描述和分类三个字段的耗时。
+"""
+
+import os
+import sys
+import time
+import random
+import string
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from torrent_spider.filters import KeywordMatcher, ItemFilter
+
+WORDS = ['movie', 'show', 'season', 'episode', 'complete', 'collection', 'remastered', 'extended',
+         'directors', 'cut', 'web', 'bluray', 'hdtv', 'x264', 'x265', 'hevc', 'aac', 'dts', 'proper',
+         'repack', 'internal', 'multi', 'subs', 'dubbed', 'ubuntu', 'desktop', 'server', 'linux']
+
+
+def random_word(rng, length):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def make_keywords(count, rng):
+    """生成屏蔽词：少量常见词加上大量随机词（模拟审核词表）"""
+    keywords = ['spam', 'fake', 'virus', 'hdcam', 'telesync'][:count]
+    while len(keywords) < count:
+        keywords.append(random_word(rng, rng.randint(5, 12)))
+    return keywords
+
+
+def make_items(count, keywords, rng):
+    items = []
+    for i in range(count):
+        parts = [rng.choice(WORDS).title() for _ in range(rng.randint(3, 7))]
+        # 约5%的名称包含屏蔽词
+        if rng.random() < 0.05:
+            parts.insert(rng.randint(0, len(parts)), rng.choice(keywords).upper())
+        parts.append(rng.choice(['1080p', '720p', '2160p']))
+        items.append({
+            'name': '.'.join(parts) + f'-GRP{i % 97}',
+            'description': ' '.join(rng.choice(WORDS) for _ in range(20)),
+            'category': rng.choice(['Movies', 'TV', 'Applications', 'Music']),
+        })
+    return items
+
+
+def legacy_blocked(name, keywords):
+    """原实现：名称转小写后逐个关键词判断"""
+    name = name.lower()
+    for keyword in keywords:
+        if keyword in name:
+            return keyword
+    return None
+
+
+def timed(func, items):
+    start = time.perf_counter()
+    results = [func(item) for item in items]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='屏蔽词匹配基准测试')
+    parser.add_argument('--items', type=int, default=20000, help='名称数量')
+    parser.add_argument('--keywords', type=str, default='10,1000,10000', help='屏蔽词数量，逗号分隔')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    for count in [int(n) for n in args.keywords.split(',')]:
+        keywords = make_keywords(count, rng)
+        items = make_items(args.items, keywords, rng)
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(keywords)
+        compile_time = time.perf_counter() - start
+        item_filter = ItemFilter({'blocked_keywords': keywords})
+
+        legacy_time, expected = timed(lambda item: legacy_blocked(item['name'], keywords), items)
+        matcher_time, actual = timed(lambda item: matcher.search(item['name']), items)
+        filter_time, _ = timed(item_filter.reject_reason, items)
+
+        if [e is not None for e in expected] != [a is not None for a in actual]:
+            print(f"{count} 个屏蔽词: 结果不一致!")
+            sys.exit(1)
+
+        blocked = sum(1 for a in actual if a is not None)
+        print(f"{count:>6} 个屏蔽词  过滤 {blocked}/{args.items}  编译 {compile_time * 1000:.1f} ms")
+        print(f"  逐个子串判断(名称):     {legacy_time / args.items * 1e6:9.2f} us/条")
+        print(f"  KeywordMatcher(名称):   {matcher_time / args.items * 1e6:9.2f} us/条  "
+              f"加速比 {legacy_time / matcher_time:.1f}x")
+        print(f"  ItemFilter(名称+描述+分类): {filter_time / args.items * 1e6:6.2f} us/条")
+
+
+if __name__ == '__main__':
+    main()
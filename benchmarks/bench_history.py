@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+做种数历史基准测试 - 对比每次观测一行的普通表与差分编码分块存储的空间、查询和写入开销
+
+使用方法:
+    python benchmarks/bench_history.py [--torrents 5000] [--days 30] [--crawls-per-day 4]
+
+模拟每天爬取 crawls-per-day 次、连续 days 天，每次观测 torrents 个种子，做种数/
+下载数每次有一定概率变化（热门种子变化更频繁）。普通表为
+(infohash, ts, seeders, leechers) 主键表，每次观测一行；SwarmHistory 只写入发生
+变化的点（差分编码，按天分块），按小时/按天的汇总在查询时计算。比较：
+
+1. 文件大小（每次观测的平均字节数）
+2. 查询一个种子全部历史的平均耗时
+3. 爬虫线程上的耗时：普通表在管道中同步 executemany 提交，SwarmHistoryPipeline
+   在爬虫线程上只追加到缓冲区
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from torrent_spider.history import SwarmHistory
+
+
+def make_crawls(torrents, days, crawls_per_day, seed=1):
+    """返回每次爬取的观测列表 [(infohash, ts, seeders, leechers)]"""
+    rng = random.Random(seed)
+    hashes = [rng.getrandbits(160).to_bytes(20, 'big') for _ in range(torrents)]
+    state = [[rng.randint(0, 2000), rng.randint(0, 300)] for _ in range(torrents)]
+    # 约两成种子较活跃
+    change_rate = [0.6 if rng.random() < 0.2 else 0.1 for _ in range(torrents)]
+    crawls = []
+    start = 1700000000
+    for crawl in range(days * crawls_per_day):
+        ts = start + crawl * 86400 // crawls_per_day
+        observations = []
+        for index, infohash in enumerate(hashes):
+            values = state[index]
+            if rng.random() < change_rate[index]:
+                values[0] = max(0, values[0] + rng.randint(-50, 40))
+                values[1] = max(0, values[1] + rng.randint(-10, 10))
+            observations.append((infohash, ts + index % 600, values[0], values[1]))
+        crawls.append(observations)
+    return hashes, crawls
+
+
+def file_size(filename):
+    return sum(os.path.getsize(path) for path in (filename, filename + '-wal') if os.path.exists(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='做种数历史基准测试')
+    parser.add_argument('--torrents', type=int, default=5000, help='种子数')
+    parser.add_argument('--days', type=int, default=30, help='天数')
+    parser.add_argument('--crawls-per-day', type=int, default=4, help='每天爬取次数')
+    args = parser.parse_args()
+
+    hashes, crawls = make_crawls(args.torrents, args.days, args.crawls_per_day)
+    observations = sum(len(crawl) for crawl in crawls)
+
+    with tempfile.TemporaryDirectory() as directory:
+        plain_file = os.path.join(directory, 'plain.db')
+        plain = sqlite3.connect(plain_file)
+        plain.execute('PRAGMA journal_mode=WAL')
+        plain.execute('PRAGMA synchronous=NORMAL')
+        plain.execute('CREATE TABLE snapshots (infohash BLOB, ts INTEGER, seeders INTEGER, leechers INTEGER, '
+                      'PRIMARY KEY (infohash, ts)) WITHOUT ROWID')
+        plain_blocking = 0.0
+        for crawl in crawls:
+            start = time.perf_counter()
+            with plain:
+                plain.executemany('INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)', crawl)
+            plain_blocking += time.perf_counter() - start
+        plain.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+        history_file = os.path.join(directory, 'history.db')
+        history = SwarmHistory(history_file)
+        buffer_time = 0.0
+        write_time = 0.0
+        points = 0
+        for crawl in crawls:
+            start = time.perf_counter()
+            buffer = []
+            for observation in crawl:
+                buffer.append(observation)
+            buffer_time += time.perf_counter() - start
+            start = time.perf_counter()
+            points += history.record(buffer)
+            write_time += time.perf_counter() - start
+        history.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+        sample = hashes[::max(1, len(hashes) // 200)]
+        start = time.perf_counter()
+        for infohash in sample:
+            plain.execute('SELECT ts, seeders, leechers FROM snapshots WHERE infohash = ? ORDER BY ts',
+                          (infohash,)).fetchall()
+        plain_query = (time.perf_counter() - start) / len(sample) * 1000
+        start = time.perf_counter()
+        for infohash in sample:
+            history.history(infohash)
+        history_query = (time.perf_counter() - start) / len(sample) * 1000
+        start = time.perf_counter()
+        for infohash in sample:
+            history.rollup(infohash, 'day', until=crawls[-1][-1][1])
+        rollup_query = (time.perf_counter() - start) / len(sample) * 1000
+
+        plain_size = file_size(plain_file)
+        history_size = file_size(history_file)
+        history_data = history.connection.execute('SELECT SUM(LENGTH(data)) FROM series').fetchone()[0]
+        plain.close()
+        history.close()
+
+    print(f"{args.torrents} 个种子 x {args.days} 天 x 每天 {args.crawls_per_day} 次 = {observations} 次观测，"
+          f"其中 {points} 次值有变化（{points / observations:.0%}）")
+    print(f"{'':<22}{'文件大小':>12}{'字节/观测':>10}{'单个种子历史':>14}")
+    print(f"{'每次观测一行':<20}{plain_size / 1048576:>12.1f}MB{plain_size / observations:>10.1f}"
+          f"{plain_query:>14.3f}ms")
+    print(f"{'差分编码分块':<20}{history_size / 1048576:>12.1f}MB{history_size / observations:>10.1f}"
+          f"{history_query:>14.3f}ms")
+    print(f"  其中编码后的数据 {history_data / 1048576:.2f}MB（{history_data / max(points, 1):.1f} 字节/点），"
+          f"按天汇总 {rollup_query:.3f}ms")
+    print(f"爬虫线程上的耗时: 同步写入 {plain_blocking:.2f}s，追加到缓冲区 {buffer_time:.3f}s"
+          f"（后台线程写入 {write_time:.2f}s）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+item内存基准测试 - 用 tracemalloc 对比 scrapy.Item 与紧凑记录的单条内存占用
+
+使用方法:
+    python benchmarks/bench_memory.py [--count 20000]
+
+1. 结果item：对比 TorrentItem（scrapy.Item，值保存在字典中）与 TorrentRecord
+   （__slots__）保存同样的一行搜索结果时每条的内存占用
+2. 排队中的详情页请求：对比 Request.meta['base_item'] 携带 TorrentItem 与
+   SearchRow 元组时每个请求的内存占用（请求排队期间一直保留）
+3. 同样的记录经过全部管道处理（ItemAdapter）后输出一致
+
+字段值在测量前预先生成，只统计item对象本身（及请求对象）的分配。
+"""
+
+import os
+import sys
+import json
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from itemadapter import ItemAdapter
+from scrapy import Request
+
+from torrent_spider.items import TorrentItem, TorrentRecord, search_row
+from torrent_spider.pipelines import TorrentSpiderPipeline, FilterPipeline
+
+
+def make_rows(count):
+    """列表行的字段值（与 parse_rarbg_search 生成的字段相同）"""
+    return [{
+        'name': f'Some.Release.{index}.1080p.WEB-DL.DDP5.1.H.264-GRP',
+        'source_url': f'https://rarbg.to/torrent/{index:08x}',
+        'crawl_time': f'2024-01-01T12:{index // 60 % 60:02d}:{index % 60:02d}.{index:06d}',
+        'size': f'{index % 50 + 0.5:.2f} GB',
+        'seeders': index % 1000,
+        'leechers': index % 300,
+        'upload_time': '2023-12-31 10:00:00',
+        'category': 'Movies/x264/1080',
+    } for index in range(count)]
+
+
+def measure(build, rows):
+    """返回 build 为每行创建的对象的平均内存占用（字节）"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [build(row) for row in rows]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    # 不计入保存对象的列表本身
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    total -= sys.getsizeof(objects)
+    return total / len(rows)
+
+
+def scrapy_item(row):
+    item = TorrentItem()
+    for key, value in row.items():
+        item[key] = value
+    return item
+
+
+def record(row):
+    item = TorrentRecord()
+    for key, value in row.items():
+        item[key] = value
+    return item
+
+
+def request_with(carrier):
+    def build(row):
+        return Request(row['source_url'], meta={'source_url': 'https://rarbg.to/search/', 'base_item': carrier(row)})
+    return build
+
+
+def pipeline_output(item):
+    """经过基础处理和过滤管道后的输出"""
+    spider = type('Spider', (), {'logger': None})()
+    item = TorrentSpiderPipeline().process_item(item, spider)
+    item = FilterPipeline().process_item(item, spider)
+    output = ItemAdapter(item).asdict()
+    output.pop('crawl_ts')
+    return json.dumps(output, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='item内存基准测试')
+    parser.add_argument('--count', type=int, default=20000, help='创建的item数量')
+    args = parser.parse_args()
+
+    rows = make_rows(args.count)
+    cases = [
+        ('结果item', [('TorrentItem', scrapy_item), ('TorrentRecord', record)]),
+        ('排队中的详情页请求', [('meta携带TorrentItem', request_with(scrapy_item)),
+                         ('meta携带SearchRow', request_with(lambda row: search_row(record(row))))]),
+    ]
+    print(f"{args.count} 条记录（不含字段值本身）")
+    for title, variants in cases:
+        print(title)
+        results = [(label, measure(build, rows)) for label, build in variants]
+        baseline = results[0][1]
+        for label, size in results:
+            print(f"  {label:<22}{size:>8.0f} 字节/条  ({size / baseline:.0%})")
+
+    same = all(pipeline_output(scrapy_item(row)) == pipeline_output(record(row)) for row in rows[:100])
+    print(f"管道输出一致: {'是' if same else '否'}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
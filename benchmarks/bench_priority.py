@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求优先级模拟基准测试 - 对比默认优先级与 ExpectedValueScorer 评分时价值的收集速度
+
+使用方法:
+    python benchmarks/bench_priority.py [--sources 4] [--pages 20] [--rows 25] [--seed 42]
+
+模拟若干个搜索来源，每个来源有多页RARBG格式的搜索结果（越靠后的页面越旧）。
+搜索页由爬虫的 parse_rarbg_search 真实解析，产生的请求放入与Scrapy默认调度器
+相同顺序的队列（优先级高的先出，同优先级后进先出），每次抓取一个请求：搜索页产生
+新请求，详情页收集该种子的价值（做种数，即可用的下载源数量）。输出抓取了一定比例
+的请求时已收集的价值占总价值的比例，以及价值曲线下的面积（1.0为理想顺序）。
+"""
+
+import os
+import sys
+import time
+import heapq
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapy.http import HtmlResponse, Request
+
+from torrent_spider.priority import ExpectedValueScorer
+from torrent_spider.spiders.torrent_spider import TorrentSpider
+
+NOW = datetime(2024, 1, 1)
+CATEGORIES = ['Movies/x264/1080', 'TV HD Episodes', 'Movies/x265/4k', 'Music/MP3', 'Games/PC ISO']
+ROW_TEMPLATE = '''<tr class="lista2">
+<td align="left" class="lista">{category}</td>
+<td align="left" class="lista"><a href="/torrent/{source}-{index}" title="{name}">{name}</a></td>
+<td align="center" class="lista">0</td>
+<td align="center" class="lista">{upload_time}</td>
+<td align="center" class="lista">{size}</td>
+<td align="center" class="lista">{seeders}</td>
+<td align="center" class="lista">{leechers}</td>
+<td align="center" class="lista">GRP</td>
+</tr>'''
+PAGE_TEMPLATE = '''<html><body><table class="lista2t">
+<tr><td>Cat.</td><td>File</td><td>comments</td><td>Added</td><td>Size</td><td>S.</td><td>L.</td><td>Uploader</td></tr>
+{rows}
+</table>
+<div id="pager_links">{next_link}</div>
+</body></html>'''
+
+
+def make_catalog(sources, pages, rows, rng):
+    """生成搜索结果：每个来源的结果按上传时间倒序分页，做种数为长尾分布并随时间衰减"""
+    catalog = {}
+    for source in range(sources):
+        # 不同来源的更新频率不同
+        items_per_day = rng.choice([5, 20, 80])
+        entries = []
+        for index in range(pages * rows):
+            age_days = index / items_per_day + rng.random()
+            seeders = int(rng.lognormvariate(3, 1.2) * 0.5 ** (age_days / 60))
+            entries.append({
+                'index': index,
+                'name': f'Some.Release.{source}.{index}.1080p.WEB-GRP',
+                'category': rng.choice(CATEGORIES),
+                'upload_time': (NOW - timedelta(days=age_days)).strftime('%Y-%m-%d %H:%M:%S'),
+                'size': f'{rng.uniform(0.5, 50):.2f} GB',
+                'seeders': seeders,
+                'leechers': int(seeders * rng.random()),
+            })
+        catalog[source] = entries
+    return catalog
+
+
+def render_page(source, page, pages, rows, entries):
+    body = '\n'.join(ROW_TEMPLATE.format(source=source, **entry)
+                     for entry in entries[(page - 1) * rows:page * rows])
+    next_link = f'<a href="/search/{page + 1}/?s={source}">next</a>' if page < pages else ''
+    return PAGE_TEMPLATE.format(rows=body, next_link=next_link).encode('utf-8')
+
+
+def simulate(spider, catalog, pages, rows):
+    """按调度顺序逐个抓取请求，返回每次抓取后累计收集的价值"""
+    queue = []
+    seq = 0
+
+    def push(request):
+        nonlocal seq
+        seq += 1
+        # 优先级高的先出，同优先级后进先出（与Scrapy默认的内存队列一致）
+        heapq.heappush(queue, (-request.priority, -seq, request))
+
+    for source in catalog:
+        url = f'https://rarbg{source}.example/search/1/?s={source}'
+        push(Request(url, meta={'source_url': url, 'page': 1, 'source': source}))
+
+    values = {(source, entry['index']): entry['seeders'] for source, entries in catalog.items()
+              for entry in entries}
+    collected = 0
+    curve = []
+    while queue:
+        _, _, request = heapq.heappop(queue)
+        if '/torrent/' in request.url:
+            source, index = request.url.rsplit('/', 1)[1].split('-')
+            collected += values[(int(source), int(index))]
+        else:
+            source = request.meta['source']
+            page = request.meta['page']
+            response = HtmlResponse(url=request.url, request=request,
+                                    body=render_page(source, page, pages, rows, catalog[source]),
+                                    encoding='utf-8')
+            for output in spider.parse_rarbg_search(response):
+                if isinstance(output, Request):
+                    output.meta['source'] = source
+                    push(output)
+        curve.append(collected)
+    return curve, sum(values.values())
+
+
+def ideal_curve(catalog, total_requests):
+    """理想顺序：先抓取全部搜索页，再按价值从高到低抓取详情页（作为上界）"""
+    values = sorted((entry['seeders'] for entries in catalog.values() for entry in entries), reverse=True)
+    pages = total_requests - len(values)
+    curve, collected = [0] * pages, 0
+    for value in values:
+        collected += value
+        curve.append(collected)
+    return curve
+
+
+def make_spider(scorer):
+    spider = TorrentSpider(filter_config={'min_seeders': 0, 'blocked_keywords': [], 'max_pages': 0})
+    spider.scorer = scorer
+    return spider
+
+
+def main():
+    parser = argparse.ArgumentParser(description='请求优先级模拟基准测试')
+    parser.add_argument('--sources', type=int, default=4, help='搜索来源数量')
+    parser.add_argument('--pages', type=int, default=20, help='每个来源的页数')
+    parser.add_argument('--rows', type=int, default=25, help='每页行数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.sources, args.pages, args.rows, random.Random(args.seed))
+    scorer = ExpectedValueScorer(now=NOW.timestamp())
+
+    results = {}
+    for label, spider in [('默认优先级', make_spider(None)), ('ExpectedValueScorer', make_spider(scorer))]:
+        start = time.perf_counter()
+        curve, total = simulate(spider, catalog, args.pages, args.rows)
+        results[label] = (curve, time.perf_counter() - start)
+    requests = len(curve)
+    results['理想顺序(上界)'] = (ideal_curve(catalog, requests), None)
+
+    print(f"{args.sources} 个来源 x {args.pages} 页 x {args.rows} 行，共 {requests} 个请求，总价值 {total}")
+    checkpoints = [0.05, 0.1, 0.25, 0.5, 0.75, 1.0]
+    print(f"{'':<22}" + ''.join(f"{f'{p:.0%}请求':>10}" for p in checkpoints) + f"{'曲线面积':>10}")
+    for label, (curve, elapsed) in results.items():
+        cells = ''.join(f"{curve[max(int(requests * p) - 1, 0)] / total:>12.1%}" for p in checkpoints)
+        area = sum(curve) / (total * requests)
+        timing = f"  解析+调度 {elapsed:.2f} s" if elapsed is not None else ''
+        print(f"{label:<22}{cells}{area:>12.3f}{timing}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+站点路由基准测试
+
+1. 路由开销：对比原来逐个站点做子串判断的 if 链与 SiteRouter（按域名缓存）在
+   注册不同数量站点时每个响应的分派耗时
+2. 单个站点配置的解析耗时：用固定页面单独测量某个配置的列表页和详情页解析方法
+
+使用方法:
+    python benchmarks/bench_router.py [--responses 50000] [--sites 1,10,100]
+    python benchmarks/bench_router.py --profile rarbg [--rounds 200]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapy.http import HtmlResponse, Request
+
+from torrent_spider.profiles import SiteProfile, SiteRouter, SITE_PROFILES, GENERIC_PROFILE
+from torrent_spider.spiders.torrent_spider import TorrentSpider
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# 每个站点配置的固定页面：(URL, 文件名, 解析方法)，解析方法为None时由路由决定
+PROFILE_FIXTURES = {
+    'rarbg': [
+        ('https://rarbg.to/search/?search=show', 'rarbg_search.html', None),
+        ('https://rarbg.to/torrent/b7d8f6c', 'rarbg_detail.html', None),
+    ],
+    'generic': [
+        ('https://example.org/browse/all', 'generic_index.html', None),
+        # 通用站点的详情页通过列表页请求的回调进入
+        ('https://example.org/details/1/Ubuntu', 'generic_detail.html', 'parse_detail'),
+    ],
+}
+
+
+def make_profiles(count):
+    """注册 count 个站点：内置配置加上按需生成的虚拟站点"""
+    profiles = list(SITE_PROFILES)
+    for i in range(len(profiles), count):
+        profiles.append(SiteProfile(
+            f'site{i}',
+            host_pattern=rf'site{i}\.example',
+            routes=[(r'/torrent/', 'parse_detail'), (r'/search/', 'parse_generic')],
+        ))
+    return profiles[:max(count, len(SITE_PROFILES))]
+
+
+def legacy_route(url, keywords):
+    """原实现：每个站点一组子串判断"""
+    lowered = url.lower()
+    for keyword in keywords:
+        if keyword in lowered and '/torrent/' in url:
+            return keyword, 'detail'
+        if keyword in lowered and '/search/' in url:
+            return keyword, 'list'
+    return None, 'generic'
+
+
+def make_urls(count, profiles, seed=42):
+    """按站点均匀生成URL，其中三成来自未注册的通用站点"""
+    rng = random.Random(seed)
+    hosts = ['rarbg.to'] + [f'www.site{i}.example' for i in range(1, len(profiles))]
+    generic = [f'www.generic{i}.org' for i in range(20)]
+    urls = []
+    for i in range(count):
+        host = rng.choice(generic) if rng.random() < 0.3 else rng.choice(hosts)
+        path = rng.choice(['/torrent/abc{}', '/search/{}/?search=x', '/browse/{}'])
+        urls.append(f'https://{host}{path.format(i)}')
+    return urls
+
+
+def bench_routing(responses, sites):
+    for count in sites:
+        profiles = make_profiles(count)
+        keywords = [p.host_pattern.replace('\\', '') for p in profiles]
+        urls = make_urls(responses, profiles)
+
+        start = time.perf_counter()
+        for url in urls:
+            legacy_route(url, keywords)
+        legacy_time = (time.perf_counter() - start) / responses
+
+        start = time.perf_counter()
+        router = SiteRouter(profiles, GENERIC_PROFILE)
+        compile_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for url in urls:
+            router.route(url)
+        router_time = (time.perf_counter() - start) / responses
+
+        print(f"{len(profiles):>4} 个站点  子串if链 {legacy_time * 1e6:6.2f} us/响应  "
+              f"SiteRouter {router_time * 1e6:6.2f} us/响应  (编译 {compile_time * 1000:.2f} ms)")
+
+
+def bench_profile(name, rounds):
+    spider = TorrentSpider(urls=','.join(url for url, _, _ in PROFILE_FIXTURES[name]))
+    for url, filename, handler in PROFILE_FIXTURES[name]:
+        with open(os.path.join(FIXTURE_DIR, filename), 'rb') as f:
+            body = f.read()
+        profile, routed = spider.router.route(url)
+        handler = handler or routed
+        callback = getattr(spider, handler)
+
+        request = Request(url, meta={'source_url': url})
+        results = list(callback(HtmlResponse(url, body=body, encoding='utf-8', request=request), profile))
+        start = time.perf_counter()
+        for _ in range(rounds):
+            # 每轮使用新的响应对象，避免复用已解析的DOM
+            list(callback(HtmlResponse(url, body=body, encoding='utf-8', request=request), profile))
+        elapsed = (time.perf_counter() - start) / rounds
+
+        print(f"{profile.name}.{handler} ({filename}, {len(body)} bytes): "
+              f"{elapsed * 1000:.3f} ms/页, 产出 {len(results)} 个item/请求")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='站点路由基准测试')
+    parser.add_argument('--responses', type=int, default=50000, help='路由测试的响应数量')
+    parser.add_argument('--sites', type=str, default='1,10,100', help='注册的站点数量，逗号分隔')
+    parser.add_argument('--profile', choices=sorted(PROFILE_FIXTURES), help='单独测量某个站点配置的解析耗时')
+    parser.add_argument('--rounds', type=int, default=200, help='每个页面的重复次数')
+    args = parser.parse_args()
+
+    if args.profile:
+        bench_profile(args.profile, args.rounds)
+    else:
+        bench_routing(args.responses, [int(n) for n in args.sites.split(',')])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全文搜索基准测试 - 对比 LIKE '%词%' 全表扫描与 FTS5 索引在大表上的查询延迟
+
+使用方法:
+    python benchmarks/bench_search.py [--rows 1000000] [--repeat 5]
+
+生成 rows 个中英文混合名称的种子（使用 SqlitePipeline 的表结构、UPSERT语句和
+全文索引触发器），然后对不同选择性的查询词查询做种数最多的前20条结果：LIKE
+沿做种数索引逐行匹配名称，search_torrents 分别按做种数和按相关度排序。报告平均
+耗时、FTS5是否达到50ms的目标，以及建表时的写入速度。
+"""
+
+import os
+import sys
+import time
+import random
+import itertools
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from torrent_spider.normalize import parse_size
+from torrent_spider.pipelines import SqlitePipeline, migrate_torrents_table
+from torrent_spider.search import match_expression, search_text, search_torrents
+
+TARGET_MS = 50
+
+WORDS = ('ubuntu', 'debian', 'ocean', 'planet', 'night', 'city', 'dragon', 'winter', 'story', 'legacy',
+         'shadow', 'river', 'empire', 'galaxy', 'hunter', 'secret', 'garden', 'storm', 'king', 'machine')
+TAGS = ('1080p', '720p', '2160p', 'WEB-DL', 'BluRay', 'x264', 'x265', 'HEVC', 'AAC', 'DDP5.1')
+CJK_WORDS = ('流浪', '地球', '中文', '字幕', '电影', '英雄', '三体', '星际', '穿越', '纪录片', '动画', '日本語')
+CATEGORIES = ('Movies', 'TV', 'Games', 'Music', 'Software', 'Anime', 'Books', 'XXX')
+
+# (说明, 查询词, LIKE 使用的子串, 过滤条件)
+QUERIES = (
+    ('罕见词', 'zyxwvut', 'zyxwvut', {}),
+    ('两个词', 'ubuntu legacy', 'ubuntu%legacy', {}),
+    ('常见词', '1080p', '1080p', {}),
+    ('中文词', '字幕', '字幕', {}),
+    ('中文短语', '流浪地球', '流浪地球', {}),
+    ('单个汉字', '三', '三', {}),
+    ('前缀', 'ubu*', 'ubu', {}),
+    ('两个词+过滤', 'ubuntu legacy', 'ubuntu%legacy', {'min_size': '50GB', 'category': 'Movies'}),
+    ('常见词+过滤', '1080p', '1080p', {'min_seeders': 1000, 'min_size': '4GB'}),
+    ('中文+过滤', '中文', '中文', {'min_size': '50GB', 'category': 'Movies'}),
+)
+
+
+def make_rows(count, seed=1):
+    """逐行生成（百万行以上的表不一次性放在内存中）"""
+    rng = random.Random(seed)
+    for number in range(count):
+        parts = [rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.3:
+            parts.insert(rng.randint(0, len(parts)), ''.join(rng.sample(CJK_WORDS, rng.randint(1, 3))))
+        parts += rng.sample(TAGS, 3)
+        if number % 200000 == 7:
+            parts.append('zyxwvut')
+        name = '.'.join(parts)
+        category = CATEGORIES[number % len(CATEGORIES)]
+        size_bytes = rng.randint(1 << 20, 60 << 30)
+        infohash = f'{number:040x}'
+        yield (
+            name, f'https://example.com/download.php?id={number}', f'magnet:?xt=urn:btih:{infohash}',
+            f'{size_bytes / 1073741824:.2f} GB', rng.randint(0, 5000), rng.randint(0, 500), '', category, '',
+            '', 'https://example.com', '', size_bytes, 1600000000 + number, 1700000000, infohash, 1700000000,
+            search_text(name, category),
+        )
+
+
+def timed(function, repeat):
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat * 1000, len(result)
+
+
+def like_search(connection, pattern, min_seeders=0, min_size=None, category=''):
+    size = parse_size(min_size) if min_size else 0
+
+    def run():
+        return connection.execute(
+            "SELECT id, name FROM torrents WHERE name LIKE ? AND seeders >= ? AND size_bytes >= ? "
+            "AND category LIKE ? ORDER BY seeders DESC LIMIT 20",
+            (f'%{pattern}%', min_seeders, size, category + '%')).fetchall()
+    return run
+
+
+def fts_search(connection, query, order, **filters):
+    def run():
+        return search_torrents(connection, query, order=order, limit=20, **filters)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全文搜索基准测试')
+    parser.add_argument('--rows', type=int, default=1000000, help='种子数')
+    parser.add_argument('--repeat', type=int, default=5, help='每个查询的重复次数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'search.db')
+        connection = sqlite3.connect(filename)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        migrate_torrents_table(connection)
+
+        rows = make_rows(args.rows)
+        generated = written = 0.0
+        while True:
+            start = time.perf_counter()
+            batch = list(itertools.islice(rows, 10000))
+            generated += time.perf_counter() - start
+            if not batch:
+                break
+            start = time.perf_counter()
+            with connection:
+                connection.executemany(SqlitePipeline.upsert_by_infohash, batch)
+            written += time.perf_counter() - start
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        print(f"{args.rows} 行（生成 {generated:.1f}s，写入含全文索引 {written:.1f}s，"
+              f"{args.rows / written:.0f} 行/s），数据库 {os.path.getsize(filename) / 1048576:.0f}MB")
+
+        print(f"{'查询':<12}{'命中':>8}{'LIKE':>12}{'FTS5按做种数':>14}{'FTS5按相关度':>14}  目标 {TARGET_MS}ms")
+        for label, query, pattern, filters in QUERIES:
+            matches = connection.execute('SELECT COUNT(*) FROM torrents_fts WHERE torrents_fts MATCH ?',
+                                         (match_expression(query),)).fetchone()[0]
+            like_ms, _ = timed(like_search(connection, pattern, **filters), args.repeat)
+            seeders_ms, _ = timed(fts_search(connection, query, 'seeders', **filters), args.repeat)
+            rank_ms, _ = timed(fts_search(connection, query, 'rank', **filters), args.repeat)
+            status = '达标' if max(seeders_ms, rank_ms) <= TARGET_MS else '超出'
+            print(f"{label:<10}{matches:>10}{like_ms:>12.2f}ms{seeders_ms:>12.2f}ms{rank_ms:>12.2f}ms  {status}")
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
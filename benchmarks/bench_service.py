@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查询服务压测 - 对只读HTTP查询服务发起混合请求，报告各接口的p50/p99延迟和每秒请求数
+
+使用方法:
+    python benchmarks/bench_service.py [--rows 200000] [--clients 8] [--duration 10]
+    python benchmarks/bench_service.py --db output/torrents.db
+    python benchmarks/bench_service.py --url http://127.0.0.1:8080 --db output/torrents.db
+
+未指定 --url 时在子进程中启动服务（QueryServer）；未指定 --db 时先生成 rows 行的
+测试数据库（与 bench_search.py 相同的数据）。clients 个线程各用一个保持连接的
+HTTP连接循环发送请求：全文搜索（热门查询重复出现，部分带过滤条件或继续翻页）、
+按infohash查找和按分类的做种数排行。依次在关闭缓存和开启缓存时各压测 duration 秒；
+--commit-interval 大于0时另有线程按该间隔向数据库提交更新，使缓存不断失效。
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+import http.client
+import multiprocessing
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_search import make_rows, CATEGORIES
+from torrent_spider.pipelines import SqlitePipeline, migrate_torrents_table
+from torrent_spider.service import QueryServer
+
+QUERIES = ('ubuntu', '1080p', '中文', '字幕', '流浪地球', 'dragon winter', 'ubuntu legacy', 'ocean 2160p',
+           '三体', 'ubu*', 'hunter -720p', '"night city"', 'galaxy', '纪录片', 'storm king', 'zyxwvut')
+SORTS = ('rank', 'rank', 'rank', 'seeders', 'newest', 'size')
+
+
+def build_database(filename, rows):
+    connection = sqlite3.connect(filename)
+    connection.execute('PRAGMA journal_mode=WAL')
+    migrate_torrents_table(connection)
+    batch = []
+    for row in make_rows(rows):
+        batch.append(row)
+        if len(batch) == 10000:
+            with connection:
+                connection.executemany(SqlitePipeline.upsert_by_infohash, batch)
+            batch = []
+    with connection:
+        connection.executemany(SqlitePipeline.upsert_by_infohash, batch)
+    connection.close()
+
+
+def run_server(filename, port, cache_size, ready):
+    server = QueryServer(filename, '127.0.0.1', port, pool_size=4, cache_size=cache_size)
+    ready.set()
+    server.serve_forever()
+
+
+def zipf_choice(rng, items, s=1.1):
+    """按Zipf分布选择（排在前面的更常被选中），模拟热门查询"""
+    weights = [1 / (rank + 1) ** s for rank in range(len(items))]
+    return rng.choices(items, weights)[0]
+
+
+def client(host, port, hashes, deadline, seed, samples, errors):
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    next_cursor = None
+    while time.perf_counter() < deadline:
+        kind = rng.choices(('search', 'page', 'lookup', 'top'), (50, 15, 20, 15))[0]
+        if kind == 'page' and next_cursor:
+            path = next_cursor
+        elif kind == 'lookup':
+            path = f'/torrents/{zipf_choice(rng, hashes, 0.8)}'
+        elif kind == 'top':
+            path = f'/top?limit=20&category={rng.choice(CATEGORIES)}'
+        else:
+            kind = 'search'
+            path = (f'/search?q={quote(zipf_choice(rng, QUERIES))}&sort={rng.choice(SORTS)}&limit=20'
+                    + (f'&min_seeders={rng.choice((10, 100, 1000))}' if rng.random() < 0.3 else ''))
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        elapsed = time.perf_counter() - start
+        if response.status != 200:
+            errors.append(f'{response.status} {path}')
+            continue
+        samples.append((kind, elapsed, response.getheader('X-Cache') == 'HIT'))
+        if kind in ('search', 'top', 'page'):
+            cursor = json.loads(body)['next_cursor']
+            base = path.split('&cursor=')[0]
+            next_cursor = f'{base}&cursor={cursor}' if cursor else None
+    connection.close()
+
+
+def committer(filename, interval, deadline):
+    connection = sqlite3.connect(filename, timeout=30)
+    count = 0
+    while time.perf_counter() < deadline:
+        with connection:
+            connection.execute('UPDATE torrents SET seeders = seeders + 1 WHERE id = ?', (count % 1000 + 1,))
+        count += 1
+        time.sleep(interval)
+    connection.close()
+    return count
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def report(label, samples, errors, duration):
+    print(f"{label}: {len(samples)} 个请求，{len(samples) / duration:.0f} 请求/秒，错误 {len(errors)}")
+    print(f"  {'接口':<10}{'请求数':>8}{'缓存命中':>10}{'p50':>10}{'p99':>10}")
+    for kind in ('search', 'page', 'lookup', 'top', None):
+        selected = [sample for sample in samples if kind is None or sample[0] == kind]
+        if not selected:
+            continue
+        latencies = sorted(elapsed * 1000 for _, elapsed, _ in selected)
+        hits = sum(1 for *_, hit in selected if hit)
+        print(f"  {kind or '全部':<10}{len(selected):>8}{hits / len(selected):>10.0%}"
+              f"{percentile(latencies, 0.5):>8.2f}ms{percentile(latencies, 0.99):>8.2f}ms")
+    for error in errors[:5]:
+        print(f"  错误: {error}")
+
+
+def load_test(host, port, hashes, clients, duration, db_file, commit_interval):
+    samples, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=client, args=(host, port, hashes, deadline, seed, samples, errors))
+               for seed in range(clients)]
+    if commit_interval > 0:
+        threads.append(threading.Thread(target=committer, args=(db_file, commit_interval, deadline)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查询服务压测')
+    parser.add_argument('--db', type=str, help='数据库文件（默认生成测试数据）')
+    parser.add_argument('--rows', type=int, default=200000, help='生成的测试数据行数')
+    parser.add_argument('--url', type=str, help='压测已运行的服务（需同时指定 --db，用于读取infohash）')
+    parser.add_argument('--clients', type=int, default=8, help='并发客户端数')
+    parser.add_argument('--duration', type=float, default=10, help='每轮压测秒数')
+    parser.add_argument('--cache-size', type=int, default=1024, help='开启缓存时的缓存条数')
+    parser.add_argument('--commit-interval', type=float, default=0, help='压测期间提交更新的间隔秒数（0为不提交）')
+    args = parser.parse_args()
+    if args.url and not args.db:
+        parser.error('--url 需要同时指定 --db')
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = args.db
+        if db_file is None:
+            db_file = os.path.join(directory, 'service.db')
+            start = time.perf_counter()
+            build_database(db_file, args.rows)
+            print(f"生成 {args.rows} 行测试数据 {time.perf_counter() - start:.1f}s")
+        connection = sqlite3.connect(f'file:{db_file}?mode=ro', uri=True)
+        hashes = [infohash for (infohash,) in connection.execute(
+            'SELECT infohash FROM torrents WHERE infohash IS NOT NULL ORDER BY random() LIMIT 1000')]
+        connection.close()
+
+        if args.url:
+            url = urlsplit(args.url)
+            samples, errors = load_test(url.hostname, url.port or 80, hashes, args.clients, args.duration,
+                                        db_file, args.commit_interval)
+            report(args.url, samples, errors, args.duration)
+            return
+
+        for label, cache_size in (('关闭缓存', 0), (f'开启缓存（{args.cache_size} 条）', args.cache_size)):
+            port = 18000 + random.randrange(1000)
+            ready = multiprocessing.Event()
+            server = multiprocessing.Process(target=run_server, args=(db_file, port, cache_size, ready), daemon=True)
+            server.start()
+            ready.wait(30)
+            time.sleep(0.2)
+            try:
+                samples, errors = load_test('127.0.0.1', port, hashes, args.clients, args.duration,
+                                            db_file, args.commit_interval)
+            finally:
+                server.terminate()
+                server.join()
+            report(label, samples, errors, args.duration)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite写入基准测试 - 对比逐条提交与批量WAL写入的吞吐量（行/秒）
+
+使用方法:
+    python benchmarks/bench_sqlite.py [--rows 5000] [--batch-size 500]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from twisted.internet import defer, task
+
+from torrent_spider.items import TorrentItem
+from torrent_spider.pipelines import SqlitePipeline
+
+
+class BenchSpider:
+    """基准测试用的最小spider对象，只提供管道需要的属性"""
+
+    def __init__(self, sqlite_file):
+        self.sqlite_file = sqlite_file
+        self.logger = logging.getLogger('bench')
+
+
+def make_items(count):
+    items = []
+    for i in range(count):
+        item = TorrentItem()
+        item['name'] = f'Some.Release.{i}.1080p.WEB-DL.x264'
+        item['torrent_url'] = f'https://example.com/download.php?id={i}'
+        item['magnet_url'] = f'magnet:?xt=urn:btih:{i:040x}&dn=release{i}'
+        item['size'] = '1.4 GB'
+        item['seeders'] = i % 500
+        item['leechers'] = i % 70
+        item['upload_time'] = '2023-10-18 14:30:25'
+        item['category'] = 'Movies'
+        item['duration'] = '01:52:14'
+        item['description'] = 'benchmark row'
+        item['source_url'] = 'https://example.com'
+        item['crawl_time'] = datetime.now().isoformat()
+        items.append(item)
+    return items
+
+
+@defer.inlineCallbacks
+def run(pipeline, items, directory, label):
+    # 写入在后台写入线程中进行，需要运行中的反应器处理队列满时的等待和关闭
+    spider = BenchSpider(os.path.join(directory, f'{label}.db'))
+    pipeline.open_spider(spider)
+    start = time.perf_counter()
+    for item in items:
+        result = pipeline.process_item(item, spider)
+        if isinstance(result, defer.Deferred):
+            yield result
+    yield pipeline.close_spider(spider)
+    elapsed = time.perf_counter() - start
+    return len(items) / elapsed
+
+
+@defer.inlineCallbacks
+def main(reactor):
+    parser = argparse.ArgumentParser(description='SQLite写入基准测试')
+    parser.add_argument('--rows', type=int, default=5000, help='写入行数')
+    parser.add_argument('--batch-size', type=int, default=500, help='批量模式每批行数')
+    args = parser.parse_args()
+
+    items = make_items(args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        # 原行为：默认日志模式、FULL同步、每条提交
+        before = yield run(SqlitePipeline(batch_size=1, journal_mode=None, synchronous=None, cache_size=0),
+                     items, directory, 'per_item')
+        after = yield run(SqlitePipeline(batch_size=args.batch_size), items, directory, 'batched')
+
+    print(f"写入 {args.rows} 行")
+    print(f"  逐条提交: {before:,.0f} 行/秒")
+    print(f"  批量WAL:  {after:,.0f} 行/秒 (batch_size={args.batch_size})")
+    print(f"  提升:     {after / before:.1f}x")
+
+
+if __name__ == '__main__':
+    task.react(main)
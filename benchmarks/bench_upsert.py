@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite UPSERT基准测试 - 对比只追加的旧表与按infohash UPSERT的表在多次每日运行后的大小和查询延迟
+
+使用方法:
+    python benchmarks/bench_upsert.py [--rows 20000] [--days 7] [--new-ratio 0.1]
+
+模拟每天爬取一次：每次运行抓取 rows 个种子，其中 new-ratio 比例是新种子，其余
+是之前见过的种子（做种数变化）。旧表（无唯一键、无索引）每次追加全部行；新表
+使用 SqlitePipeline 的表结构和UPSERT语句。每次运行后记录行数、文件大小，以及
+按infohash查找单个种子、按分类取做种数最多的前50个种子的平均耗时。
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from torrent_spider.pipelines import SqlitePipeline, TORRENT_COLUMNS, migrate_torrents_table
+from torrent_spider.search import search_text
+
+CATEGORIES = ('Movies', 'TV', 'Games', 'Music', 'Software', 'Anime', 'Books', 'XXX')
+
+LEGACY_TABLE_SQL = '''
+    CREATE TABLE torrents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT, torrent_url TEXT, magnet_url TEXT, size TEXT, seeders INTEGER, leechers INTEGER,
+        upload_time TEXT, category TEXT, duration TEXT, description TEXT, source_url TEXT, crawl_time TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, size_bytes INTEGER, upload_ts INTEGER, crawl_ts INTEGER
+    )
+'''
+# 旧表只有前15列（到 crawl_ts 为止）
+LEGACY_COLUMNS = TORRENT_COLUMNS[:TORRENT_COLUMNS.index('crawl_ts') + 1]
+LEGACY_INSERT_SQL = (f"INSERT INTO torrents ({', '.join(LEGACY_COLUMNS)}) "
+                     f"VALUES ({', '.join('?' for _ in LEGACY_COLUMNS)})")
+INFOHASH = TORRENT_COLUMNS.index('infohash')
+
+
+def make_rows(day, rows, new_ratio):
+    """第 day 天抓取到的行：种子编号从 day * rows * new_ratio 开始连续 rows 个"""
+    first = int(day * rows * new_ratio)
+    crawl_ts = 1700000000 + day * 86400
+    result = []
+    for number in range(first, first + rows):
+        infohash = f'{number:040x}'
+        result.append((
+            f'Some.Release.{number}.1080p.WEB-DL.x264', f'https://example.com/download.php?id={number}',
+            f'magnet:?xt=urn:btih:{infohash}&dn=release{number}', '1.4 GB', (number * 7 + day) % 500,
+            (number + day) % 70, '2023-10-18 14:30:25', CATEGORIES[number % len(CATEGORIES)], '',
+            'benchmark row', 'https://example.com', '', 1503238553, 1697639425, crawl_ts,
+            infohash, crawl_ts, search_text(f'Some.Release.{number}.1080p.WEB-DL.x264',
+                                            CATEGORIES[number % len(CATEGORIES)], 'benchmark row'),
+        ))
+    return result
+
+
+def timed(connection, sql, params_list):
+    start = time.perf_counter()
+    for params in params_list:
+        connection.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / len(params_list) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite UPSERT基准测试')
+    parser.add_argument('--rows', type=int, default=20000, help='每次运行抓取的种子数')
+    parser.add_argument('--days', type=int, default=7, help='模拟的运行次数')
+    parser.add_argument('--new-ratio', type=float, default=0.1, help='每次运行中新种子的比例')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_file = os.path.join(directory, 'legacy.db')
+        upsert_file = os.path.join(directory, 'upsert.db')
+        legacy = sqlite3.connect(legacy_file)
+        legacy.execute(LEGACY_TABLE_SQL)
+        upsert = sqlite3.connect(upsert_file)
+        migrate_torrents_table(upsert)
+
+        print(f"每次运行 {args.rows} 个种子，新种子 {args.new_ratio:.0%}")
+        print(f"{'运行':>4}{'旧表行数':>10}{'新表行数':>10}{'旧表MB':>9}{'新表MB':>9}"
+              f"{'旧hash查找':>12}{'新hash查找':>12}{'旧分类前50':>12}{'新分类前50':>12}")
+        for day in range(args.days):
+            rows = make_rows(day, args.rows, args.new_ratio)
+            with legacy:
+                legacy.executemany(LEGACY_INSERT_SQL, [row[:len(LEGACY_COLUMNS)] for row in rows])
+            with upsert:
+                upsert.executemany(SqlitePipeline.upsert_by_infohash, rows)
+
+            hashes = [(row[INFOHASH],) for row in rows[::max(1, args.rows // 50)]]
+            legacy_lookup = timed(legacy, "SELECT * FROM torrents WHERE magnet_url LIKE '%' || ? || '%' "
+                                          "ORDER BY id DESC LIMIT 1", hashes)
+            upsert_lookup = timed(upsert, 'SELECT * FROM torrents WHERE infohash = ?', hashes)
+            categories = [(category,) for category in CATEGORIES]
+            # 旧表中同一种子有多行，取每个种子最新的一行
+            legacy_top = timed(legacy, 'SELECT * FROM torrents WHERE id IN (SELECT MAX(id) FROM torrents '
+                                       'WHERE category = ? GROUP BY magnet_url) ORDER BY seeders DESC LIMIT 50',
+                               categories)
+            upsert_top = timed(upsert, 'SELECT * FROM torrents WHERE category = ? ORDER BY seeders DESC LIMIT 50',
+                               categories)
+            legacy_rows = legacy.execute('SELECT COUNT(*) FROM torrents').fetchone()[0]
+            upsert_rows = upsert.execute('SELECT COUNT(*) FROM torrents').fetchone()[0]
+            print(f"{day + 1:>6}{legacy_rows:>12}{upsert_rows:>12}"
+                  f"{os.path.getsize(legacy_file) / 1048576:>11.1f}{os.path.getsize(upsert_file) / 1048576:>11.1f}"
+                  f"{legacy_lookup:>12.3f}ms{upsert_lookup:>12.3f}ms{legacy_top:>12.3f}ms{upsert_top:>12.3f}ms")
+        legacy.close()
+        upsert.close()
+
+
+if __name__ == '__main__':
+    main()
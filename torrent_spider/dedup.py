@@ -0,0 +1,291 @@
+# 去重工具
+#
+# 以规范化的20字节BTIH infohash作为种子的唯一标识，同一种子即使磁力链接中的
+# tracker列表或dn不同也能识别为重复；索引保存在SQLite文件中，跨运行持久有效。
+
+import os
+import re
+import json
+import math
+import time
+import base64
+import hashlib
+import sqlite3
+from urllib.parse import unquote, urlparse, parse_qs
+
+_BTIH_PATTERN = re.compile(r'xt=urn:btih:([A-Za-z0-9]+)', re.IGNORECASE)
+_HEX_PATTERN = re.compile(r'[0-9a-fA-F]{40}')
+_BASE32_PATTERN = re.compile(r'[A-Za-z2-7]{32}')
+# 种子文件URL中独立出现的infohash（如 /torrent/<40位十六进制>.torrent）
+_URL_INFOHASH_PATTERN = re.compile(r'(?<![0-9A-Za-z])([0-9a-fA-F]{40}|[A-Z2-7]{32})(?![0-9A-Za-z])')
+_NAME_KEY_PATTERN = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_infohash(value):
+    """将40位十六进制或32位base32形式的infohash规范化为20字节，无法识别返回None"""
+    if not value:
+        return None
+    value = value.strip()
+    if len(value) == 40 and _HEX_PATTERN.fullmatch(value):
+        return bytes.fromhex(value)
+    if len(value) == 32 and _BASE32_PATTERN.fullmatch(value):
+        return base64.b32decode(value.upper())
+    return None
+
+
+def extract_infohash(magnet_url):
+    """从磁力链接中提取规范化的20字节infohash"""
+    if not magnet_url or not magnet_url.startswith('magnet:'):
+        return None
+    for match in _BTIH_PATTERN.finditer(magnet_url):
+        digest = normalize_infohash(match.group(1))
+        if digest:
+            return digest
+    # xt参数被百分号编码时解码后再试
+    if '%' in magnet_url:
+        decoded = unquote(magnet_url)
+        if decoded != magnet_url:
+            return extract_infohash(decoded)
+    return None
+
+
+def infohash_from_url(url):
+    """从种子文件URL的路径中找出infohash（很多站点以infohash命名种子文件），没有返回None"""
+    if not url:
+        return None
+    match = _URL_INFOHASH_PATTERN.search(unquote(urlparse(url).path))
+    return normalize_infohash(match.group(1)) if match else None
+
+
+def release_name_key(name):
+    """发布名称的比较键：去掉 .torrent 后缀，只保留小写字母和数字"""
+    if not name:
+        return ''
+    name = unquote(name).lower()
+    if name.endswith('.torrent'):
+        name = name[:-len('.torrent')]
+    return _NAME_KEY_PATTERN.sub('', name)
+
+
+def pair_release_links(torrent_urls, magnet_urls):
+    """把同一发布的种子文件链接和磁力链接配对，返回 (torrent_url, magnet_url) 列表
+
+    种子文件URL中带有infohash时按infohash配对，否则按文件名与磁力链接的dn配对；
+    仍未配对的恰好是一个种子文件和一个磁力链接时视为同一发布。同一infohash的
+    多个磁力链接只保留第一个，未配对的链接单独成对（另一项为None）。
+    """
+    magnets = {}
+    for magnet_url in magnet_urls:
+        magnets.setdefault(extract_infohash(magnet_url) or magnet_url, magnet_url)
+    names = {}
+    for key, magnet_url in magnets.items():
+        dn = parse_qs(urlparse(magnet_url).query).get('dn')
+        name = release_name_key(dn[0]) if dn else ''
+        if name:
+            names.setdefault(name, key)
+
+    pairs = []
+    for torrent_url in dict.fromkeys(torrent_urls):
+        key = infohash_from_url(torrent_url)
+        if key not in magnets:
+            key = names.get(release_name_key(urlparse(torrent_url).path.rsplit('/', 1)[-1]))
+        pairs.append((torrent_url, magnets.pop(key, None)))
+
+    unpaired = [index for index, (_, magnet_url) in enumerate(pairs) if magnet_url is None]
+    if len(unpaired) == 1 and len(magnets) == 1:
+        pairs[unpaired[0]] = (pairs[unpaired[0]][0], magnets.popitem()[1])
+    pairs.extend((None, magnet_url) for magnet_url in magnets.values())
+    return pairs
+
+
+def url_key(url):
+    """没有infohash的链接使用URL的SHA-1摘要作为键，避免在索引中保存完整字符串"""
+    return hashlib.sha1(url.encode('utf-8')).digest()
+
+
+class InfohashIndex:
+    """基于SQLite的持久化去重索引
+
+    键为20字节摘要，存储在 WITHOUT ROWID 表中；打开即可使用，无需在启动时
+    把历史数据加载到内存。新增的键在同一连接的事务内立即可见，每
+    commit_interval 条提交一次（为0时只在调用 commit 时提交，用于可恢复任务：
+    去重键与任务检查点在同一事务中提交）。
+    """
+
+    def __init__(self, filename, commit_interval=1000):
+        self.filename = filename
+        self.commit_interval = max(0, commit_interval)
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        # 去重管道在打开后只在它的写入线程中使用索引，连接不限定创建它的线程
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        for table in ('infohashes', 'urls'):
+            self.connection.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key BLOB PRIMARY KEY
+                ) WITHOUT ROWID
+            ''')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                job_id TEXT PRIMARY KEY,
+                state TEXT,
+                updated REAL
+            )
+        ''')
+        self.connection.commit()
+        self.pending = 0
+
+    def _add(self, table, key):
+        cursor = self.connection.execute(f'INSERT OR IGNORE INTO {table} (key) VALUES (?)', (key,))
+        if cursor.rowcount:
+            self.pending += 1
+            if self.commit_interval and self.pending >= self.commit_interval:
+                self.commit()
+            return True
+        return False
+
+    def _contains(self, table, key):
+        cursor = self.connection.execute(f'SELECT 1 FROM {table} WHERE key = ?', (key,))
+        return cursor.fetchone() is not None
+
+    def add_infohash(self, digest):
+        """记录infohash，已存在时返回False"""
+        return self._add('infohashes', digest)
+
+    def has_infohash(self, digest):
+        return self._contains('infohashes', digest)
+
+    def add_url(self, url):
+        """记录链接，已存在时返回False"""
+        return self._add('urls', url_key(url))
+
+    def has_url(self, url):
+        return self._contains('urls', url_key(url))
+
+    def commit(self, checkpoint=None):
+        """提交新增的键；checkpoint 为 (任务ID, 状态JSON) 时一并保存任务检查点"""
+        if checkpoint is not None:
+            job_id, state = checkpoint
+            self.connection.execute(
+                'INSERT OR REPLACE INTO checkpoints (job_id, state, updated) VALUES (?, ?, ?)',
+                (job_id, state, time.time()))
+        self.connection.commit()
+        self.pending = 0
+
+    def load_checkpoint(self, job_id):
+        """读取任务上次提交的检查点状态，没有时返回None"""
+        row = self.connection.execute(
+            'SELECT state FROM checkpoints WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+
+class BloomFilter:
+    """固定内存的布隆过滤器
+
+    按预期容量和误判率计算位数组大小，超过 max_bytes 时截断到预算内（误判率
+    相应上升）。键必须是均匀分布的摘要（如infohash或SHA-1），直接从键中取出
+    两个64位整数做双重哈希，不再额外计算哈希。
+    """
+
+    def __init__(self, capacity, error_rate=0.001, max_bytes=None):
+        capacity = max(1, capacity)
+        bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        if max_bytes:
+            bits = min(bits, max_bytes * 8)
+        self.size = max(64, bits)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        h1 = int.from_bytes(key[:8], 'little')
+        h2 = int.from_bytes(key[8:16], 'little') | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hash_count)]
+
+    def __contains__(self, key):
+        bits = self.bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def add(self, key):
+        """加入键，返回该键此前是否可能已存在"""
+        bits = self.bits
+        present = True
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                present = False
+        if not present:
+            self.count += 1
+        return present
+
+    @property
+    def memory_bytes(self):
+        return len(self.bits)
+
+
+class BloomInfohashIndex(InfohashIndex):
+    """布隆过滤器前置的去重索引
+
+    过滤器判定为新的键直接缓存并批量写入SQLite，不查询数据库；只有过滤器
+    命中时才到SQLite和待写缓冲中做精确确认，误判不会导致误删。启动时从
+    索引文件流式重建过滤器，内存占用固定。
+    """
+
+    def __init__(self, filename, commit_interval=1000, capacity=10000000,
+                 error_rate=0.001, max_bytes=None):
+        super().__init__(filename, commit_interval)
+        self.bloom = BloomFilter(capacity, error_rate, max_bytes)
+        self.buffers = {'infohashes': {}, 'urls': {}}
+        for table in self.buffers:
+            for (key,) in self.connection.execute(f'SELECT key FROM {table}'):
+                self.bloom.add(key)
+
+    def _add(self, table, key):
+        # 过滤器未命中说明一定是新键；命中时再精确确认
+        if self.bloom.add(key) and self._contains(table, key):
+            return False
+        self.buffers[table][key] = None
+        self.pending += 1
+        if self.commit_interval and self.pending >= self.commit_interval:
+            self.commit()
+        return True
+
+    def _contains(self, table, key):
+        if key in self.buffers[table]:
+            return True
+        return super()._contains(table, key)
+
+    def has_infohash(self, digest):
+        return digest in self.bloom and self._contains('infohashes', digest)
+
+    def has_url(self, url):
+        key = url_key(url)
+        return key in self.bloom and self._contains('urls', key)
+
+    def commit(self, checkpoint=None):
+        for table, buffer in self.buffers.items():
+            if buffer:
+                self.connection.executemany(
+                    f'INSERT OR IGNORE INTO {table} (key) VALUES (?)',
+                    ((key,) for key in buffer))
+                buffer.clear()
+        super().commit(checkpoint)
+
+
+def open_dedup_index(filename, backend='sqlite', **options):
+    """按后端名称创建去重索引：sqlite为精确索引，bloom为布隆过滤器前置索引"""
+    if backend == 'bloom':
+        return BloomInfohashIndex(filename, **options)
+    if backend == 'sqlite':
+        return InfohashIndex(filename, options.get('commit_interval', 1000))
+    raise ValueError(f"Unknown dedup backend: {backend}")
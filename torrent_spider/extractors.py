@@ -0,0 +1,122 @@
+# 页面元数据提取引擎
+#
+# 所有模式在导入时预编译。提取时只构造一次小写副本，用 str.find 定位各模式的
+# 前导关键字，正则仅在候选位置做锚定匹配；没有前导关键字的兜底模式只在
+# 字段内更高优先级的模式全部落空时才执行。结果与逐个 re.search 完全一致。
+
+import re
+
+# 可直接作为前导关键字的字面量前缀（遇到正则元字符即停止）
+_LITERAL_PREFIX = re.compile(r'[^\\\[\](){}.*+?|^$]+')
+
+# 在 IGNORECASE 下会与 ASCII 字母互相匹配、但 str.lower() 不能等价处理的字符
+_CASE_SPECIALS = re.compile('[İıſK]')
+
+
+def _to_int(value):
+    return int(value)
+
+
+def _strip(value):
+    return value.strip()
+
+
+def _leading_keyword(pattern):
+    """返回模式的小写前导关键字，没有则返回None"""
+    match = _LITERAL_PREFIX.match(pattern)
+    if not match:
+        return None
+    keyword = match.group(0)
+    # 紧跟量词时最后一个字符不是必需的
+    if pattern[match.end():match.end() + 1] in ('*', '+', '?', '{'):
+        keyword = keyword[:-1]
+    return keyword.lower() or None
+
+
+class PageMetadataExtractor:
+    """预编译的页面元数据提取器
+
+    fields 为有序的 (字段名, 模式列表, 转换函数) 列表。每个模式必须恰好包含
+    一个捕获组；同一字段内靠前的模式优先。
+    """
+
+    def __init__(self, fields, flags=re.IGNORECASE):
+        self.fields = []
+        for name, patterns, convert in fields:
+            compiled = []
+            for pattern in patterns:
+                regex = re.compile(pattern, flags)
+                if regex.groups != 1:
+                    raise ValueError(f"Pattern must have exactly one group: {pattern}")
+                compiled.append((regex, _leading_keyword(pattern)))
+            self.fields.append((name, compiled, convert))
+
+    def extract(self, text):
+        """提取页面文本中的字段，返回 {字段名: 值}，未匹配的字段不出现在结果中"""
+        lowered = None
+        if not _CASE_SPECIALS.search(text):
+            lowered = text.lower()
+            if len(lowered) != len(text):
+                lowered = None
+
+        result = {}
+        for name, compiled, convert in self.fields:
+            for regex, keyword in compiled:
+                if keyword and lowered is not None:
+                    match = self._anchored_search(regex, keyword, text, lowered)
+                else:
+                    match = regex.search(text)
+                if match:
+                    value = match.group(1)
+                    result[name] = convert(value) if convert else value
+                    break
+        return result
+
+    @staticmethod
+    def _anchored_search(regex, keyword, text, lowered):
+        """只在关键字出现的位置尝试匹配，等价于 regex.search(text)"""
+        pos = lowered.find(keyword)
+        while pos != -1:
+            match = regex.match(text, pos)
+            if match:
+                return match
+            pos = lowered.find(keyword, pos + 1)
+        return None
+
+
+# RARBG详情页字段（顺序与优先级同 parse_rarbg_detail 原逐条匹配逻辑）
+RARBG_DETAIL_FIELDS = [
+    ('size', [r'Size[:\s]*([0-9.]+\s*[KMGT]?B)'], None),
+    ('seeders', [r'Seeders[:\s]*([0-9]+)'], _to_int),
+    ('leechers', [r'Leechers[:\s]*([0-9]+)'], _to_int),
+    ('upload_time', [r'Uploaded[:\s]*([^<\n]+)'], _strip),
+    ('category', [r'Category[:\s]*([^<\n]+)'], _strip),
+    ('duration', [
+        r'Duration[:\s]*([0-9]+:[0-9]+)',         # Duration: MM:SS格式 (优先)
+        r'Duration[:\s]*([0-9]+:[0-9]+:[0-9]+)',  # Duration: HH:MM:SS格式
+        r'Runtime[:\s]*([0-9]+:[0-9]+:[0-9]+)',   # Runtime: HH:MM:SS
+        r'Runtime[:\s]*([0-9]+:[0-9]+)',          # Runtime: MM:SS
+        r'Length[:\s]*([0-9]+:[0-9]+:[0-9]+)',    # Length: HH:MM:SS
+        r'Length[:\s]*([0-9]+:[0-9]+)',           # Length: MM:SS
+        r'Time[:\s]*([0-9]+:[0-9]+:[0-9]+)',      # Time: HH:MM:SS
+        r'Time[:\s]*([0-9]+:[0-9]+)',             # Time: MM:SS
+        r'([0-9]+:[0-9]+:[0-9]+)',                # 直接匹配HH:MM:SS格式
+        r'Duration[:\s]*([0-9]+\s*min)',          # Duration: XX min
+        r'Runtime[:\s]*([0-9]+\s*min)',           # Runtime: XX min
+        r'([0-9]+\s*min\s*[0-9]*\s*sec)',        # XX min XX sec格式
+    ], _strip),
+]
+
+# 通用详情页字段（顺序与优先级同 create_detailed_torrent_item 原逐条匹配逻辑）
+GENERIC_DETAIL_FIELDS = [
+    ('size', [
+        r'Size[:\s]*([0-9.]+\s*[KMGT]?B)',
+        r'大小[:\s]*([0-9.]+\s*[KMGT]?B)',
+        r'([0-9.]+\s*[KMGT]B)',
+    ], None),
+    ('seeders', [r'Seed[ers]*[:\s]*([0-9]+)'], _to_int),
+    ('leechers', [r'Leech[ers]*[:\s]*([0-9]+)'], _to_int),
+]
+
+RARBG_DETAIL_EXTRACTOR = PageMetadataExtractor(RARBG_DETAIL_FIELDS)
+GENERIC_DETAIL_EXTRACTOR = PageMetadataExtractor(GENERIC_DETAIL_FIELDS)
@@ -0,0 +1,210 @@
+# 过滤规则
+#
+# filter_config 中的 min_seeders 和屏蔽词规则由 ItemFilter 统一实现，
+# FilterPipeline 用它过滤完整的item，爬虫在列表页用同一规则提前丢弃不需要的
+# 行，避免为注定被过滤的结果发起详情页请求。
+#
+# 屏蔽词规则在加载时编译为一个组合正则：子串和整词分别构造成前缀树形式的
+# 正则（共享前缀只比较一次，匹配耗时与规则数量基本无关），与正则规则合并后
+# 对名称、描述和分类只扫描一遍。
+
+import os
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCKED_KEYWORDS = ['spam', 'fake', 'virus']
+DEFAULT_BLOCKED_FIELDS = ['name', 'description', 'category']
+
+WORD_PREFIX = 'word:'
+REGEX_PREFIX = 're:'
+
+
+def _trie_pattern(words, prune):
+    """把一组小写字面量构造成前缀树形式的正则
+
+    prune 为True时（子串匹配）一个词的所有延伸词都可以省略：包含 foobar 的
+    文本必然包含 foo。
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+            if prune and '' in node:
+                break
+        else:
+            node[''] = None
+            if prune:
+                node.clear()
+                node[''] = None
+
+    def build(node):
+        optional = '' in node
+        children = [(char, child) for char, child in sorted(node.items()) if char != '']
+        if not children:
+            return ''
+        # 只剩一个字符即结束的分支合并为字符类
+        leaves = [char for char, child in children if list(child) == ['']]
+        branches = [re.escape(char) + build(child) for char, child in children if list(child) != ['']]
+        if len(leaves) == 1:
+            branches.append(re.escape(leaves[0]))
+        elif leaves:
+            branches.append('[' + ''.join(re.escape(char) for char in leaves) + ']')
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if optional:
+            if len(branches) == 1 and len(body) > 1 and not body.startswith('(?:'):
+                body = '(?:' + body + ')'
+            body += '?'
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """屏蔽词匹配器
+
+    规则为字符串：普通字符串按子串匹配，"word:" 前缀按整词匹配，"re:" 前缀
+    为正则表达式；均不区分大小写。所有规则编译为一个正则，search 只扫描一遍文本。
+    以全局标志（如 (?s)）开头等不能嵌入组合正则的正则规则单独编译，另外扫描。
+    """
+
+    def __init__(self, rules):
+        substrings, words, regexes = set(), set(), []
+        for rule in rules:
+            rule = rule.strip() if isinstance(rule, str) else ''
+            if not rule:
+                continue
+            if rule.startswith(REGEX_PREFIX):
+                regexes.append(rule[len(REGEX_PREFIX):])
+            elif rule.startswith(WORD_PREFIX):
+                words.add(rule[len(WORD_PREFIX):].strip().lower())
+            else:
+                substrings.add(rule.lower())
+        words.discard('')
+
+        self.rule_count = len(substrings) + len(words) + len(regexes)
+        self.regex_rules = regexes
+        # 单独扫描的正则规则 [(规则序号, 编译后的正则)]
+        self.separate = []
+        parts = []
+        if substrings:
+            parts.append(f'(?P<_keyword>{_trie_pattern(substrings, prune=True)})')
+        if words:
+            parts.append(rf'\b(?P<_word>{_trie_pattern(words, prune=False)})\b')
+        embedded, regex_parts = [], []
+        for i, pattern in enumerate(regexes):
+            # 单独编译一次，出错时能指出是哪条规则
+            try:
+                compiled = re.compile(pattern, re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"Invalid blocklist regex {pattern!r}: {e}") from e
+            # 全局标志只能出现在整个正则的开头，放进 (?i:...) 后无法编译
+            try:
+                re.compile(f'(?i:{pattern})')
+            except re.error:
+                self.separate.append((i, compiled))
+                continue
+            embedded.append((i, compiled))
+            regex_parts.append(f'(?P<_re{i}>(?i:{pattern}))')
+        try:
+            self.regex = re.compile('|'.join(parts + regex_parts)) if parts or regex_parts else None
+        except re.error:
+            # 正则规则之间冲突（如同名的分组）时全部单独扫描
+            self.regex = re.compile('|'.join(parts)) if parts else None
+            self.separate = sorted(self.separate + embedded, key=lambda rule: rule[0])
+
+    def search(self, text):
+        """返回命中的规则（子串/整词为命中的词，正则为 "re:" 规则），未命中返回None"""
+        if not text:
+            return None
+        text = text.lower()
+        match = self.regex.search(text) if self.regex is not None else None
+        if match is not None:
+            group = match.lastgroup
+            if group is not None and group.startswith('_re'):
+                return REGEX_PREFIX + self.regex_rules[int(group[3:])]
+            return match.group(0)
+        for i, regex in self.separate:
+            if regex.search(text):
+                return REGEX_PREFIX + self.regex_rules[i]
+        return None
+
+
+def read_rules_file(filename):
+    """读取规则文件：每行一条规则，忽略空行和 # 开头的注释"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+class ItemFilter:
+    """按 filter_config 判断item是否应被过滤
+
+    屏蔽词来自 blocked_keywords 和 blocked_keywords_file（规则文件），检查
+    blocked_fields 中的字段。规则文件修改后在下一次检查时自动重新加载
+    （最多每 RELOAD_INTERVAL 秒检查一次修改时间），无需重启爬虫。
+    """
+
+    RELOAD_INTERVAL = 5.0
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.min_seeders = config.get('min_seeders', 0)
+        self.blocked_keywords = config.get('blocked_keywords', DEFAULT_BLOCKED_KEYWORDS)
+        self.blocked_keywords_file = config.get('blocked_keywords_file') or None
+        self.blocked_fields = config.get('blocked_fields', DEFAULT_BLOCKED_FIELDS)
+        self.file_mtime = None
+        self.last_reload_check = time.monotonic()
+        try:
+            self.matcher = self.build_matcher()
+        except OSError as e:
+            # 规则文件不存在或不可读时只使用 blocked_keywords，文件出现后自动加载
+            logger.warning(f"Failed to load blocklist {self.blocked_keywords_file}: {e}")
+            self.matcher = KeywordMatcher(self.blocked_keywords)
+
+    def build_matcher(self):
+        rules = list(self.blocked_keywords)
+        if self.blocked_keywords_file:
+            mtime = os.stat(self.blocked_keywords_file).st_mtime
+            rules.extend(read_rules_file(self.blocked_keywords_file))
+            self.file_mtime = mtime
+        return KeywordMatcher(rules)
+
+    def maybe_reload(self):
+        """规则文件修改后重新编译；文件不可读或规则无效时继续使用原规则"""
+        now = time.monotonic()
+        if now - self.last_reload_check < self.RELOAD_INTERVAL:
+            return
+        self.last_reload_check = now
+        try:
+            if os.stat(self.blocked_keywords_file).st_mtime == self.file_mtime:
+                return
+            self.matcher = self.build_matcher()
+            logger.info(f"Reloaded {self.matcher.rule_count} blocklist rules from {self.blocked_keywords_file}")
+        except FileNotFoundError as e:
+            # 启动时就不存在的文件已经警告过，不再重复记录
+            if self.file_mtime is not None:
+                logger.error(f"Failed to reload blocklist {self.blocked_keywords_file}: {e}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to reload blocklist {self.blocked_keywords_file}: {e}")
+
+    def reject_reason(self, item):
+        """返回过滤原因，保留时返回None；item 为任意支持 get 的映射"""
+        # 过滤种子数太少的项目
+        seeders = item.get('seeders', 0)
+        if isinstance(seeders, int) and seeders < self.min_seeders:
+            return f"low seeders: {seeders}"
+
+        # 过滤包含屏蔽关键词的项目，名称、描述和分类合并后只扫描一次
+        if self.blocked_keywords_file:
+            self.maybe_reload()
+        text = '\n'.join(value for value in (item.get(field) for field in self.blocked_fields)
+                         if isinstance(value, str) and value)
+        keyword = self.matcher.search(text)
+        if keyword:
+            name = (item.get('name') or '').lower()
+            return f"blocked keyword '{keyword}': {name}"
+
+        return None
@@ -0,0 +1,255 @@
+# 共享的磁盘爬取队列（frontier）
+#
+# 请求保存在SQLite文件中，多个爬虫进程（或共享同一文件的多台机器）可以同时从中
+# 领取请求：按请求指纹去重，领取时加租约，处理完成后确认；进程崩溃后租约到期，
+# 请求会被其他进程重新领取。
+#
+# 可恢复任务（spider.job）中请求完成后先不确认，等任务检查点提交了对应的输出
+# 之后再统一确认；进程被杀死时未确认的请求在恢复后重新抓取。
+
+import os
+import time
+import pickle
+import socket
+import sqlite3
+
+from scrapy.utils.request import request_from_dict
+
+QUEUED = 0
+LEASED = 1
+DONE = 2
+
+
+class SqliteFrontier:
+    """基于SQLite的租约式请求队列"""
+
+    def __init__(self, filename, lease_seconds=300, max_attempts=3, timeout=30.0):
+        self.filename = filename
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        # 手动管理事务，领取请求时使用 BEGIN IMMEDIATE 避免多个进程领取同一请求
+        self.connection = sqlite3.connect(filename, timeout=timeout, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS frontier (
+                fingerprint BLOB PRIMARY KEY,
+                state INTEGER NOT NULL DEFAULT 0,
+                priority INTEGER NOT NULL DEFAULT 0,
+                seq INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                data BLOB
+            ) WITHOUT ROWID
+        ''')
+        self.connection.execute('''
+            CREATE INDEX IF NOT EXISTS idx_frontier_ready
+            ON frontier (state, priority DESC, seq)
+        ''')
+        # push 用 MAX(seq) 取下一个序号，没有这个索引时每次加入都要扫描全表
+        self.connection.execute('CREATE INDEX IF NOT EXISTS idx_frontier_seq ON frontier (seq)')
+
+    def push(self, fingerprint, data, priority=0):
+        """加入请求，指纹已存在（无论是否已完成）时返回False"""
+        cursor = self.connection.execute(
+            'INSERT OR IGNORE INTO frontier (fingerprint, priority, seq, data) '
+            'VALUES (?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM frontier), ?)',
+            (fingerprint, priority, data))
+        return cursor.rowcount > 0
+
+    def lease(self, owner):
+        """领取优先级最高的待处理请求（包括租约已过期的），返回 (指纹, 数据) 或None"""
+        now = time.time()
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            # 超过最大尝试次数的过期租约直接标记完成，避免无法完成的请求反复被领取
+            self.connection.execute(
+                'UPDATE frontier SET state = ?, data = NULL '
+                'WHERE state = ? AND lease_expires < ? AND attempts >= ?',
+                (DONE, LEASED, now, self.max_attempts))
+            row = self.connection.execute(
+                'SELECT fingerprint, data FROM frontier '
+                'WHERE state = ? OR (state = ? AND lease_expires < ?) '
+                'ORDER BY state, priority DESC, seq LIMIT 1',
+                (QUEUED, LEASED, now)).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    'UPDATE frontier SET state = ?, lease_owner = ?, lease_expires = ?, '
+                    'attempts = attempts + 1 WHERE fingerprint = ?',
+                    (LEASED, owner, now + self.lease_seconds, row[0]))
+            self.connection.execute('COMMIT')
+        except Exception:
+            self.connection.execute('ROLLBACK')
+            raise
+        return row
+
+    def ack(self, fingerprint):
+        """确认请求已处理完成；保留指纹用于去重，释放请求数据"""
+        self.connection.execute(
+            'UPDATE frontier SET state = ?, data = NULL, lease_owner = NULL WHERE fingerprint = ?',
+            (DONE, fingerprint))
+
+    def release(self, owner=None):
+        """归还某个进程持有的全部租约（正常关闭时调用），使其他进程可以立即领取；
+        owner 为None时归还所有租约（用于任务私有的队列文件，恢复时收回上次的租约）"""
+        if owner is None:
+            self.connection.execute(
+                'UPDATE frontier SET state = ?, lease_owner = NULL, lease_expires = NULL, '
+                'attempts = attempts - 1 WHERE state = ?',
+                (QUEUED, LEASED))
+            return
+        self.connection.execute(
+            'UPDATE frontier SET state = ?, lease_owner = NULL, lease_expires = NULL, '
+            'attempts = attempts - 1 WHERE state = ? AND lease_owner = ?',
+            (QUEUED, LEASED, owner))
+
+    def has_pending(self):
+        """是否还有待处理的请求、可重新领取的过期租约或仍在有效期内的租约
+        （持有租约的其他进程可能继续产生新请求）"""
+        row = self.connection.execute(
+            'SELECT 1 FROM frontier WHERE state = ? '
+            'OR (state = ? AND (lease_expires >= ? OR attempts < ?)) LIMIT 1',
+            (QUEUED, LEASED, time.time(), self.max_attempts)).fetchone()
+        return row is not None
+
+    def has_queued(self):
+        return self.connection.execute(
+            'SELECT 1 FROM frontier WHERE state = ? LIMIT 1', (QUEUED,)).fetchone() is not None
+
+    def count(self, state):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM frontier WHERE state = ?', (state,)).fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+class FrontierScheduler:
+    """使用共享 SqliteFrontier 的Scrapy调度器
+
+    在设置中指定 SCHEDULER = 'torrent_spider.frontier.FrontierScheduler' 并设置
+    FRONTIER_FILE 即可启用。所有指向同一文件的爬虫进程共同消费同一个队列。
+    """
+
+    # 队列为空时两次查询之间的最小间隔，避免引擎空转时频繁访问数据库
+    EMPTY_POLL_INTERVAL = 0.5
+
+    def __init__(self, crawler, frontier):
+        self.crawler = crawler
+        self.frontier = frontier
+        self.stats = crawler.stats
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self.last_empty_poll = 0.0
+        # 本进程已领取、尚未确认的请求：指纹 -> 请求
+        self.in_flight = {}
+        # 可恢复任务中已处理完、等待检查点提交后确认的请求指纹
+        self.finished = []
+        self.job = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        frontier = SqliteFrontier(
+            settings.get('FRONTIER_FILE', 'frontier.db'),
+            lease_seconds=settings.getfloat('FRONTIER_LEASE_SECONDS', 300),
+            max_attempts=settings.getint('FRONTIER_MAX_ATTEMPTS', 3),
+        )
+        if settings.getbool('FRONTIER_RECLAIM_LEASES'):
+            frontier.release()
+        return cls(crawler, frontier)
+
+    def open(self, spider):
+        self.spider = spider
+        self.job = getattr(spider, 'job', None)
+        if self.job is not None:
+            self.job.on_commit(self.take_finished)
+
+    def close(self, reason):
+        # 输出管道没有做最终检查点时（未启用去重管道）在这里做，确认已完成的请求
+        if self.job is not None and not self.job.closed:
+            return self.job.save(final=True).addBoth(self.release_leases)
+        self.release_leases()
+
+    def release_leases(self, _=None):
+        # 未确认的请求（包括等待检查点的）归还到队列中
+        self.frontier.release(self.owner)
+        self.frontier.close()
+
+    def has_pending_requests(self):
+        self.ack_processed()
+        # 队列已空时等待检查点的请求仍是租约状态，立即做检查点以便爬取正常结束
+        if self.finished and not self.in_flight and not self.frontier.has_queued():
+            self.job.save()
+        return self.frontier.has_pending()
+
+    def enqueue_request(self, request):
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request)
+        # 队列的目的是同一页面只抓取一次，因此 dont_filter 的请求（如起始URL）同样去重；
+        # 重试请求的原请求此时已确认完成，按重试次数区分
+        retry_times = request.meta.get('retry_times')
+        if retry_times:
+            fingerprint += b'#%d' % retry_times
+        data = pickle.dumps(request.to_dict(spider=self.spider), protocol=pickle.HIGHEST_PROTOCOL)
+        if not self.frontier.push(fingerprint, data, request.priority):
+            self.stats.inc_value('frontier/filtered')
+            return False
+        self.stats.inc_value('frontier/enqueued')
+        return True
+
+    def next_request(self):
+        self.ack_processed()
+        now = time.monotonic()
+        if now - self.last_empty_poll < self.EMPTY_POLL_INTERVAL:
+            return None
+        row = self.frontier.lease(self.owner)
+        if row is None:
+            self.last_empty_poll = now
+            return None
+        fingerprint, data = row
+        request = request_from_dict(pickle.loads(data), spider=self.spider)
+        request.meta['frontier_fingerprint'] = fingerprint
+        self.in_flight[fingerprint] = request
+        self.stats.inc_value('frontier/leased')
+        return request
+
+    def is_processing(self, request):
+        """请求仍在下载（包括下载中间件）或者结果仍在由回调和管道处理
+
+        下载器在下载中间件处理完之后才把请求移出 active，引擎在同一调用链中把结果
+        （响应或失败）交给scraper，直到回调产生的请求都已加入队列、项目都已处理完
+        才从scraper中移除，中间没有空隙。重定向等由下载中间件返回的新请求在移出
+        下载器之前已经加入队列。
+        """
+        engine = self.crawler.engine
+        if request in engine.downloader.active:
+            return True
+        slot = engine.scraper.slot
+        return slot is not None and (request in slot.active
+                                     or any(queued is request for _, queued, _ in slot.queue))
+
+    def ack_processed(self):
+        """确认已处理完的请求；只在回调的输出都处理完之后确认，进程在下载和解析
+        之间崩溃时请求会被重新领取，不会丢失它本应产生的后续请求"""
+        done = [fingerprint for fingerprint, request in self.in_flight.items()
+                if not self.is_processing(request)]
+        for fingerprint in done:
+            del self.in_flight[fingerprint]
+            if self.job is not None:
+                self.finished.append(fingerprint)
+            else:
+                self.frontier.ack(fingerprint)
+        if done and self.job is None:
+            self.stats.inc_value('frontier/acked', len(done))
+
+    def take_finished(self):
+        """任务检查点开始时取出已处理完的请求，返回在检查点提交后确认它们的操作"""
+        finished, self.finished = self.finished, []
+
+        def ack_finished():
+            for fingerprint in finished:
+                self.frontier.ack(fingerprint)
+            self.stats.inc_value('frontier/acked', len(finished))
+
+        return ack_finished
@@ -0,0 +1,211 @@
+# 做种数/下载数的时间序列
+#
+# 每次抓取到带infohash的种子时记录一个观测点 (时间, 做种数, 下载数)。原始观测按
+# (infohash, 天) 分块保存：块内每个点相对前一个点做差分（第一个点相对当天零点和0），
+# 以zigzag varint编码追加到块的BLOB中；与该种子上一次记录的值相同的观测不再写入，
+# 查询时视为保持不变（阶梯函数）。按小时和按天的汇总在查询时由阶梯函数计算，
+# 不为每个种子的每个时段单独存一行——每天只爬取几次时，按小时预先汇总的行数
+# 与原始观测相当，会抵消差分编码节省的空间。
+
+import os
+import time
+import sqlite3
+
+from torrent_spider.dedup import normalize_infohash
+
+HOUR = 3600
+DAY = 86400
+PERIODS = {'hour': HOUR, 'day': DAY}
+
+
+def encode_varints(values):
+    """把整数序列编码为zigzag varint字节串（差分值可能为负）"""
+    output = bytearray()
+    for value in values:
+        value = (value << 1) ^ (value >> 63)
+        while value > 0x7f:
+            output.append((value & 0x7f) | 0x80)
+            value >>= 7
+        output.append(value)
+    return bytes(output)
+
+
+def decode_varints(data):
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append((value >> 1) ^ -(value & 1))
+        value = shift = 0
+    return values
+
+
+def infohash_bytes(infohash):
+    """接受20字节infohash或十六进制/base32文本"""
+    if isinstance(infohash, bytes) and len(infohash) == 20:
+        return infohash
+    digest = normalize_infohash(infohash)
+    if digest is None:
+        raise ValueError(f'无效的infohash: {infohash!r}')
+    return digest
+
+
+class SwarmHistory:
+    """做种数/下载数时间序列（SQLite文件），多个进程可以共用同一文件
+
+    record 可以在后台写入线程等其他线程中调用（连接不限定创建它的线程），但同一时间只能有一个调用。
+    """
+
+    # 批量查询最近记录时每条语句的infohash数量
+    LOOKUP_BATCH = 500
+
+    def __init__(self, filename, timeout=30.0):
+        self.filename = filename
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(filename, timeout=timeout, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        # 同一种子的块按天连续存放，查询一个种子的历史只需一次范围扫描
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS series (
+                infohash BLOB NOT NULL,
+                day INTEGER NOT NULL,
+                last_ts INTEGER NOT NULL,
+                last_seeders INTEGER NOT NULL,
+                last_leechers INTEGER NOT NULL,
+                points INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (infohash, day)
+            ) WITHOUT ROWID
+        ''')
+        self.connection.commit()
+
+    def last_points(self, infohashes):
+        """各种子最近一次记录的 {infohash: (天, 时间, 做种数, 下载数)}"""
+        result = {}
+        infohashes = list(infohashes)
+        for start in range(0, len(infohashes), self.LOOKUP_BATCH):
+            batch = infohashes[start:start + self.LOOKUP_BATCH]
+            # MAX 聚合时其余列取自 day 最大的那一行
+            for infohash, *point in self.connection.execute(
+                    'SELECT infohash, MAX(day), last_ts, last_seeders, last_leechers FROM series '
+                    f'WHERE infohash IN ({", ".join("?" for _ in batch)}) GROUP BY infohash', batch):
+                result[infohash] = tuple(point)
+        return result
+
+    def record(self, observations):
+        """在一个事务内写入一批观测 [(infohash, 时间戳, 做种数, 下载数)]，返回写入的点数
+
+        与该种子上一次记录相同的值、以及早于上一次记录的观测不写入。
+        """
+        chunks = {}
+        observations = sorted((infohash_bytes(infohash), int(ts), int(seeders), int(leechers or 0))
+                              for infohash, ts, seeders, leechers in observations)
+        with self.connection:
+            # 先取得写锁再读取最近记录，否则两个进程可能基于同一个点各自追加差分
+            self.connection.execute('BEGIN IMMEDIATE')
+            latest = self.last_points({observation[0] for observation in observations})
+            for infohash, ts, seeders, leechers in observations:
+                last = latest.get(infohash)
+                if last is not None and (ts <= last[1] or (seeders, leechers) == last[2:]):
+                    continue
+                day = ts // DAY
+                # 块内第一个点相对当天零点和0，其余相对前一个点
+                base = last[1:] if last is not None and last[0] == day else (day * DAY, 0, 0)
+                chunk = chunks.setdefault((infohash, day), [bytearray(), 0])
+                chunk[0] += encode_varints((ts - base[0], seeders - base[1], leechers - base[2]))
+                chunk[1] += 1
+                latest[infohash] = (day, ts, seeders, leechers)
+            self.connection.executemany('''
+                INSERT INTO series (infohash, day, last_ts, last_seeders, last_leechers, points, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (infohash, day) DO UPDATE SET
+                    last_ts = excluded.last_ts, last_seeders = excluded.last_seeders,
+                    last_leechers = excluded.last_leechers, points = points + excluded.points,
+                    data = CAST(data || excluded.data AS BLOB)
+            ''', [(infohash, day) + latest[infohash][1:] + (points, bytes(data))
+                  for (infohash, day), (data, points) in chunks.items()])
+        return sum(points for _, points in chunks.values())
+
+    def history(self, infohash, since=None, until=None):
+        """种子在 [since, until] 内的观测 [(时间戳, 做种数, 下载数)]，按时间排序
+
+        只包含值发生变化的点，两点之间的值等于前一个点。指定 since 时结果的第一个
+        点是 since 时刻有效的值（可能早于 since）。
+        """
+        infohash = infohash_bytes(infohash)
+        since = 0 if since is None else int(since)
+        until = 2 ** 62 if until is None else int(until)
+        # 从 since 当天或之前最近的一块开始，以便得到 since 时刻的值
+        first_day = self.connection.execute(
+            'SELECT MAX(day) FROM series WHERE infohash = ? AND day <= ?', (infohash, since // DAY)).fetchone()[0]
+        points = []
+        for day, data in self.connection.execute(
+                'SELECT day, data FROM series WHERE infohash = ? AND day BETWEEN ? AND ? ORDER BY day',
+                (infohash, since // DAY if first_day is None else first_day, until // DAY)):
+            ts, seeders, leechers = day * DAY, 0, 0
+            values = decode_varints(data)
+            for i in range(0, len(values), 3):
+                ts += values[i]
+                seeders += values[i + 1]
+                leechers += values[i + 2]
+                if ts > until:
+                    break
+                points.append((ts, seeders, leechers))
+        # since 之前的点只保留最后一个
+        index = 0
+        while index + 1 < len(points) and points[index + 1][0] <= since:
+            index += 1
+        return points[index:]
+
+    def rollup(self, infohash, period='day', since=None, until=None):
+        """种子按小时（period='hour'）或按天的汇总，返回按时间排序的字典列表
+
+        由 history 的阶梯函数计算：每个时段内做种数/下载数的最小值、最大值和按
+        时间加权的平均值，以及时段内值发生变化的次数。最后一个点的值持续到 until
+        （默认为当前时间）。
+        """
+        size = PERIODS[period]
+        until = int(time.time()) if until is None else int(until)
+        points = self.history(infohash, since, until)
+        if not points:
+            return []
+        start = max(points[0][0], 0 if since is None else int(since))
+        buckets = []
+        for index, (ts, seeders, leechers) in enumerate(points):
+            segment_end = points[index + 1][0] if index + 1 < len(points) else until
+            segment_start = max(ts, start)
+            changed = ts >= start
+            while segment_start < segment_end or changed:
+                bucket = segment_start - segment_start % size
+                if not buckets or buckets[-1]['start'] != bucket:
+                    buckets.append({'start': bucket, 'changes': 0, 'seconds': 0,
+                                    'seeders_min': seeders, 'seeders_max': seeders, 'seeders_total': 0,
+                                    'leechers_min': leechers, 'leechers_max': leechers, 'leechers_total': 0})
+                row = buckets[-1]
+                if changed:
+                    row['changes'] += 1
+                    changed = False
+                end = min(segment_end, bucket + size)
+                seconds = max(0, end - segment_start)
+                row['seconds'] += seconds
+                row['seeders_min'] = min(row['seeders_min'], seeders)
+                row['seeders_max'] = max(row['seeders_max'], seeders)
+                row['seeders_total'] += seeders * seconds
+                row['leechers_min'] = min(row['leechers_min'], leechers)
+                row['leechers_max'] = max(row['leechers_max'], leechers)
+                row['leechers_total'] += leechers * seconds
+                segment_start = end
+        for row in buckets:
+            # 只有一个点落在 until 上的时段没有持续时间，平均值取该点的值
+            seconds = row.pop('seconds')
+            seeders_total, leechers_total = row.pop('seeders_total'), row.pop('leechers_total')
+            row['seeders_avg'] = seeders_total / seconds if seconds else row['seeders_max']
+            row['leechers_avg'] = leechers_total / seconds if seconds else row['leechers_max']
+        return buckets
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,183 @@
+# 增量爬取
+#
+# 记录每个来源已见过的种子（详情页URL或infohash的摘要）和列表页的HTTP校验值
+# （ETag / Last-Modified）。再次运行时列表页以条件请求发出，未修改（304）的页面
+# 直接跳过；解析列表页时如果页面上的种子全部已经见过，则不再跟踪下一页。列表按
+# 时间倒序排列的站点，定时刷新只需抓取最前面几页。
+
+import os
+import time
+import sqlite3
+
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+
+from torrent_spider.dedup import extract_infohash, url_key
+
+
+def link_key(url):
+    """种子链接的键：磁力链接为infohash，其余为URL摘要（均为20字节）"""
+    return extract_infohash(url) or url_key(url)
+
+
+class IncrementalState:
+    """增量爬取状态（SQLite文件），多个进程可以共用同一文件
+
+    新记录先放在内存中（查询时一并检查），每 commit_interval 条写入并提交一次。
+    commit_interval 为0时只在调用 commit 时写入；可恢复任务在检查点开始时用
+    snapshot 取出到此为止的记录，检查点提交后再写入，之后的记录属于下一个检查点。
+    """
+
+    def __init__(self, filename, commit_interval=500, timeout=30.0):
+        self.filename = filename
+        self.commit_interval = max(0, commit_interval)
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(filename, timeout=timeout)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS seen (
+                key BLOB PRIMARY KEY,
+                source TEXT,
+                first_seen REAL
+            ) WITHOUT ROWID
+        ''')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                updated REAL
+            )
+        ''')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS sources (
+                source TEXT PRIMARY KEY,
+                last_run REAL,
+                new_items INTEGER,
+                newest_name TEXT
+            )
+        ''')
+        self.connection.commit()
+        # 尚未写入的记录：种子键 -> (来源, 首次见到的时间)，URL -> (etag, last_modified, 时间)
+        self.seen = {}
+        self.validators = {}
+        # snapshot 取出、等待检查点提交后写入的记录
+        self.snapshots = []
+        # 本次运行每个来源新见到的种子数和最新一条的名称
+        self.new_items = {}
+        self.newest_names = {}
+
+    def is_known(self, key):
+        if key in self.seen or any(key in seen for seen, _ in self.snapshots):
+            return True
+        return self.connection.execute('SELECT 1 FROM seen WHERE key = ?', (key,)).fetchone() is not None
+
+    def remember(self, key, source, name=None):
+        """记录见过的种子，新种子返回True"""
+        if self.is_known(key):
+            return False
+        self.seen[key] = (source, time.time())
+        self.new_items[source] = self.new_items.get(source, 0) + 1
+        # 列表按时间倒序时，每个来源第一条新种子即为最新的
+        if name and source not in self.newest_names:
+            self.newest_names[source] = name
+        self.maybe_commit()
+        return True
+
+    def get_validators(self, url):
+        """返回 (etag, last_modified)，没有记录时返回 (None, None)"""
+        for validators in [self.validators] + [validators for _, validators in reversed(self.snapshots)]:
+            if url in validators:
+                return validators[url][:2]
+        row = self.connection.execute(
+            'SELECT etag, last_modified FROM validators WHERE url = ?', (url,)).fetchone()
+        return row or (None, None)
+
+    def set_validators(self, url, etag, last_modified):
+        self.validators[url] = (etag, last_modified, time.time())
+        self.maybe_commit()
+
+    def maybe_commit(self):
+        if self.commit_interval and len(self.seen) + len(self.validators) >= self.commit_interval:
+            self.commit()
+
+    def snapshot(self):
+        """取出尚未写入的记录，返回写入并提交它们的操作（可恢复任务检查点提交后执行）"""
+        records = (self.seen, self.validators)
+        self.seen, self.validators = {}, {}
+        self.snapshots.append(records)
+        return lambda: self.write(records)
+
+    def write(self, records):
+        seen, validators = records
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO seen (key, source, first_seen) VALUES (?, ?, ?)',
+            [(key, source, first_seen) for key, (source, first_seen) in seen.items()])
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO validators (url, etag, last_modified, updated) VALUES (?, ?, ?, ?)',
+            [(url,) + values for url, values in validators.items()])
+        self.connection.commit()
+        self.snapshots = [snapshot for snapshot in self.snapshots if snapshot is not records]
+
+    def commit(self):
+        """立即写入并提交尚未写入的记录"""
+        self.snapshot()()
+
+    def close(self):
+        now = time.time()
+        for source in set(self.new_items) | set(self.newest_names):
+            self.connection.execute('''
+                INSERT INTO sources (source, last_run, new_items, newest_name) VALUES (?, ?, ?, ?)
+                ON CONFLICT(source) DO UPDATE SET last_run = excluded.last_run,
+                    new_items = excluded.new_items,
+                    newest_name = COALESCE(excluded.newest_name, sources.newest_name)
+            ''', (source, now, self.new_items.get(source, 0), self.newest_names.get(source)))
+        self.commit()
+        self.connection.close()
+
+
+class IncrementalMiddleware:
+    """列表页条件请求的下载中间件
+
+    对 meta['list_page'] 为True的请求带上上次记录的 If-None-Match /
+    If-Modified-Since；304 响应说明页面未变化，忽略该请求（其后的分页也不会
+    被跟踪），200 响应记录新的校验值。增量状态由爬虫的 incremental_state 提供。
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('INCREMENTAL_ENABLED'):
+            raise NotConfigured
+        return cls(crawler.stats)
+
+    def process_request(self, request, spider):
+        state = getattr(spider, 'incremental_state', None)
+        if state is None or not request.meta.get('list_page'):
+            return None
+        etag, last_modified = state.get_validators(request.url)
+        if etag and b'If-None-Match' not in request.headers:
+            request.headers['If-None-Match'] = etag
+        if last_modified and b'If-Modified-Since' not in request.headers:
+            request.headers['If-Modified-Since'] = last_modified
+        if etag or last_modified:
+            self.stats.inc_value('incremental/conditional_requests')
+        return None
+
+    def process_response(self, request, response, spider):
+        state = getattr(spider, 'incremental_state', None)
+        if state is None or not request.meta.get('list_page'):
+            return response
+        if response.status == 304:
+            self.stats.inc_value('incremental/not_modified')
+            raise IgnoreRequest(f"List page not modified: {request.url}")
+        if response.status == 200:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                state.set_validators(request.url,
+                                     etag.decode('latin-1') if etag else None,
+                                     last_modified.decode('latin-1') if last_modified else None)
+        return response
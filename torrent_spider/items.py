@@ -3,7 +3,13 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
+from collections import namedtuple
+from collections.abc import KeysView
+from types import MappingProxyType
+
 import scrapy
+from itemadapter import ItemAdapter
+from itemadapter.adapter import AdapterInterface
 
 
 class TorrentItem(scrapy.Item):
@@ -31,4 +37,152 @@ class TorrentItem(scrapy.Item):
     # 来源网站
     source_url = scrapy.Field()
     # 爬取时间
-    crawl_time = scrapy.Field()
\ No newline at end of file
+    crawl_time = scrapy.Field()
+    # 规范化的数值字段（见 normalize.py）：文件大小（字节）、上传时间和爬取时间（Unix时间戳）
+    size_bytes = scrapy.Field()
+    upload_ts = scrapy.Field()
+    crawl_ts = scrapy.Field()
+
+
+# TorrentRecord 的字段（与 TorrentItem 相同，顺序即输出顺序）
+TORRENT_FIELDS = (
+    'name', 'torrent_url', 'magnet_url', 'size', 'seeders', 'leechers', 'upload_time',
+    'category', 'duration', 'description', 'source_url', 'crawl_time',
+    'size_bytes', 'upload_ts', 'crawl_ts',
+)
+
+
+class TorrentRecord:
+    """紧凑的种子记录，爬虫实际产生的item类型
+
+    字段固定、使用 __slots__，没有每个实例的字典；用法与 TorrentItem 相同
+    （record['name']、get、update），未设置的字段视为不存在，不会出现在输出中。
+    通过 TorrentRecordAdapter 被 ItemAdapter 和Scrapy识别为item。
+    """
+
+    __slots__ = TORRENT_FIELDS
+    fields = TORRENT_FIELDS
+
+    def __init__(self, values=None, **kwargs):
+        if values:
+            self.update(values)
+        if kwargs:
+            self.update(kwargs)
+
+    def __getitem__(self, key):
+        # 只查找字段，record['update']、record['fields'] 等方法和类属性不是字段
+        if key not in TORRENT_FIELDS:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in TORRENT_FIELDS:
+            raise KeyError(f"TorrentRecord does not support field: {key}")
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in TORRENT_FIELDS:
+            raise KeyError(key)
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in TORRENT_FIELDS and hasattr(self, key)
+
+    def __iter__(self):
+        return (field for field in TORRENT_FIELDS if hasattr(self, field))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __eq__(self, other):
+        if not isinstance(other, TorrentRecord):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __repr__(self):
+        return f"TorrentRecord({dict(self.items())!r})"
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in TORRENT_FIELDS else default
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(field, getattr(self, field)) for field in self]
+
+    def update(self, values):
+        for key, value in (values.items() if hasattr(values, 'items') else values):
+            self[key] = value
+
+    def copy(self):
+        return TorrentRecord(self.items())
+
+
+class TorrentRecordAdapter(AdapterInterface):
+    """让 ItemAdapter（以及所有管道）像处理 scrapy.Item 一样处理 TorrentRecord"""
+
+    @classmethod
+    def is_item(cls, item):
+        return isinstance(item, TorrentRecord)
+
+    @classmethod
+    def is_item_class(cls, item_class):
+        return isinstance(item_class, type) and issubclass(item_class, TorrentRecord)
+
+    @classmethod
+    def get_field_meta_from_class(cls, item_class, field_name):
+        if field_name not in TORRENT_FIELDS:
+            raise KeyError(f"{item_class.__name__} does not support field: {field_name}")
+        return MappingProxyType({})
+
+    @classmethod
+    def get_field_names_from_class(cls, item_class):
+        return list(TORRENT_FIELDS)
+
+    def field_names(self):
+        return KeysView(dict.fromkeys(TORRENT_FIELDS))
+
+    def __getitem__(self, field_name):
+        return self.item[field_name]
+
+    def __setitem__(self, field_name, value):
+        self.item[field_name] = value
+
+    def __delitem__(self, field_name):
+        del self.item[field_name]
+
+    def __iter__(self):
+        return iter(self.item)
+
+    def __len__(self):
+        return len(self.item)
+
+
+ItemAdapter.ADAPTER_CLASSES.appendleft(TorrentRecordAdapter)
+
+
+# 搜索页传给详情页请求的列表行信息（Request.meta['base_item']），请求排队期间
+# 只占用一个元组；详情页返回后由 record() 转为 TorrentRecord
+SearchRow = namedtuple('SearchRow', [
+    'name', 'source_url', 'crawl_time', 'size', 'seeders', 'leechers',
+    'upload_time', 'category', 'magnet_url', 'torrent_url',
+])
+SearchRow.__new__.__defaults__ = (None,) * len(SearchRow._fields)
+
+
+def search_row(record):
+    """用列表行生成的记录创建 SearchRow"""
+    return SearchRow(*(record.get(field) for field in SearchRow._fields))
+
+
+def row_record(row):
+    """把 SearchRow 转为 TorrentRecord（值为None的字段不设置）"""
+    return TorrentRecord((field, value) for field, value in zip(SearchRow._fields, row)
+                         if value is not None)
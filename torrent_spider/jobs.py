@@ -0,0 +1,222 @@
+# 可恢复的爬取任务
+#
+# app.py --resume <job-id> 为任务建立目录（job.json 保存起始URL和确定的输出文件名），
+# 请求队列使用任务私有的 SqliteFrontier 文件。JobState 定期做检查点：
+#
+#   1. 等待正在解析的响应处理完（scraper空闲），各输出管道在写入队列中放入读取
+#      文件位置的操作，调度器和增量爬取状态取出到此为止的变更
+#   2. 各写入线程写到该位置后，文件位置与去重索引中新增的键在去重索引的写入线程
+#      中同一个SQLite事务里提交
+#   3. 提交后再确认第1步取出的已完成请求、写入增量爬取状态
+#
+# 整个过程不阻塞反应器线程，第1步之后爬取照常进行：之后的项目排在位置操作之后
+# 写入，去重键排在提交操作之后记录，都属于下一个检查点。请求队列和增量爬取状态
+# 仍在反应器线程中读写（调度器和解析回调需要立即得到结果），只是把检查点相关的
+# 确认和提交推迟到检查点提交之后。
+#
+# 进程被杀死后重新运行同一任务：输出文件截断到检查点位置（之后写入的行对应的请求
+# 尚未确认，会被重新抓取），因此不会丢失也不会重复记录。
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import Future
+
+from scrapy import signals
+from twisted.internet import defer, task
+
+from torrent_spider.writer import BackgroundWriter
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'job.json'
+CHECKPOINT_FILE = 'checkpoint.json'
+
+
+def load_manifest(job_dir):
+    """读取任务清单，任务不存在时返回None"""
+    path = os.path.join(job_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(job_dir, manifest):
+    os.makedirs(job_dir, exist_ok=True)
+    write_json_atomic(os.path.join(job_dir, MANIFEST_FILE), manifest)
+
+
+def write_json_atomic(path, data):
+    """先写临时文件再替换，进程在写入过程中被杀死也不会留下损坏的文件"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def reopen_output(filename, offset, mode, **kwargs):
+    """打开输出文件：offset 为None时新建（mode 为写模式），否则截断到检查点位置后追加"""
+    if offset is None or not os.path.exists(filename):
+        return open(filename, mode, **kwargs), False
+    os.truncate(filename, offset)
+    return open(filename, mode.replace('w', 'a'), **kwargs), True
+
+
+def flushed_size(file):
+    """刷新缓冲区后返回文件大小（输出文件只追加写入，即当前写入位置）"""
+    file.flush()
+    return os.fstat(file.fileno()).st_size
+
+
+class JobState:
+    """任务检查点协调器，由爬虫在设置了 JOB_ID 时创建（spider.job）
+
+    输出管道用 register 注册返回可恢复位置（或以位置触发的Deferred）的函数，并在
+    打开时用 restore 取回上次检查点的位置；去重管道用 set_store 提供去重索引和使用
+    它的写入线程，检查点随索引一起提交；调度器等用 on_commit 注册检查点开始时调用
+    的函数，它取出到此为止的变更，返回提交后执行的操作。
+    """
+
+    # 检查点到期后等待scraper空闲时的检查间隔（秒）
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, crawler, job_id, job_dir, interval=30.0):
+        self.crawler = crawler
+        self.job_id = job_id
+        self.job_dir = job_dir
+        self.interval = interval
+        self.participants = {}
+        self.callbacks = []
+        self.store = None
+        self.writer = None
+        self.saved = None
+        self.saving = None
+        self.last_save = time.monotonic()
+        self.closed = False
+        self.task = None
+        os.makedirs(job_dir, exist_ok=True)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        job = cls(
+            crawler,
+            settings['JOB_ID'],
+            settings.get('JOB_DIR') or os.path.join('jobs', settings['JOB_ID']),
+            interval=settings.getfloat('JOB_CHECKPOINT_INTERVAL', 30.0),
+        )
+        crawler.signals.connect(job.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(job.spider_closed, signal=signals.spider_closed)
+        return job
+
+    def register(self, name, checkpoint):
+        self.participants[name] = checkpoint
+
+    def on_commit(self, prepare):
+        self.callbacks.append(prepare)
+
+    def set_store(self, store, writer=None):
+        """检查点随 store 在 writer 线程中提交；打开时先读取上次的检查点，
+        之后 store 只在 writer 线程中使用"""
+        if store is not None and self.saved is None:
+            self.saved = store.load_checkpoint(self.job_id) or {}
+        self.store = store
+        self.writer = writer
+
+    def restore(self, name):
+        """返回上次检查点中 name 的状态，新任务返回None"""
+        # 有去重索引时 set_store 已经读取了检查点
+        if self.saved is None:
+            path = os.path.join(self.job_dir, CHECKPOINT_FILE)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.saved = json.load(f)
+            else:
+                self.saved = {}
+        return self.saved.get(name)
+
+    def is_quiescent(self):
+        """没有正在解析的响应和正在处理的item时才能做检查点"""
+        engine = getattr(self.crawler, 'engine', None)
+        slot = getattr(getattr(engine, 'scraper', None), 'slot', None)
+        return slot is None or slot.is_idle()
+
+    def save(self, final=False):
+        """开始一次检查点，返回提交后以是否做了检查点触发的Deferred
+
+        scraper忙、上一次检查点还没有提交时不做（final为True时不检查scraper，
+        等上一次提交后再做，用于关闭时）。
+        """
+        if self.closed:
+            return defer.succeed(False)
+        if self.saving is not None:
+            if not final:
+                return defer.succeed(False)
+            result = defer.Deferred()
+            self.saving.addCallback(lambda _: self.save(final=True).chainDeferred(result))
+            return result
+        if not final and not self.is_quiescent():
+            return defer.succeed(False)
+        if final:
+            self.closed = True
+        actions = [prepare() for prepare in self.callbacks]
+        names = list(self.participants)
+        positions = defer.gatherResults(
+            [defer.maybeDeferred(self.participants[name]) for name in names], consumeErrors=True)
+        # 提交操作现在就放入队列，在写入线程中等待各位置确定
+        state = Future()
+        positions.addCallbacks(lambda values: state.set_result(dict(zip(names, values))),
+                               lambda failure: state.set_exception(failure.value.subFailure.value))
+        if self.writer is None:
+            self.writer = BackgroundWriter('job', 1, logger, self.crawler.stats)
+        self.saving = self.writer.call(self.commit, self.store, state, count=False)
+        self.saving.addCallbacks(self.committed, self.failed, callbackArgs=(actions,))
+        self.saving.addBoth(self.saved_checkpoint)
+        result = defer.Deferred()
+        self.saving.addCallback(lambda saved: result.callback(saved))
+        return result
+
+    def commit(self, store, state):
+        """在写入线程中提交检查点"""
+        state = state.result()
+        if store is not None:
+            store.commit(checkpoint=(self.job_id, json.dumps(state)))
+        else:
+            write_json_atomic(os.path.join(self.job_dir, CHECKPOINT_FILE), state)
+
+    def committed(self, _, actions):
+        for action in actions:
+            if action is not None:
+                action()
+        self.crawler.stats.inc_value('job/checkpoints')
+        return True
+
+    def failed(self, failure):
+        logger.error(f"Failed to save checkpoint for job {self.job_id}: {failure.getErrorMessage()}")
+        self.crawler.stats.inc_value('job/checkpoint_errors')
+        return False
+
+    def saved_checkpoint(self, saved):
+        self.saving = None
+        self.last_save = time.monotonic()
+        return saved
+
+    def tick(self):
+        if time.monotonic() - self.last_save >= self.interval:
+            self.save()
+
+    def spider_opened(self, spider):
+        if self.interval > 0:
+            self.task = task.LoopingCall(self.tick)
+            self.task.start(self.POLL_INTERVAL, now=False)
+
+    def spider_closed(self, spider):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        # 没有去重索引时检查点文件在任务自己的写入线程中写入
+        if self.writer is not None and self.store is None:
+            return self.writer.close()
@@ -0,0 +1,288 @@
+# 多进程分片爬取的辅助工具
+#
+# 负责把起始URL分配到各个工作进程、为每个分片生成独立的输出文件名，并在所有
+# 工作进程结束后把各分片的JSON/JSON Lines/CSV/SQLite结果合并到配置的输出文件，
+# 合并时按infohash（没有则按链接）跨分片去重。
+
+import os
+import csv
+import gzip
+import json
+import shutil
+import logging
+import sqlite3
+from urllib.parse import urlparse
+
+from torrent_spider.dedup import InfohashIndex, extract_infohash
+from torrent_spider.pipelines import (TORRENT_COLUMNS, TORRENT_KEYS, migrate_torrents_table, torrent_infohash,
+                                      torrent_key, upsert_sql)
+from torrent_spider.search import search_text
+
+logger = logging.getLogger(__name__)
+
+SHARDED_OUTPUT_KEYS = ('json_file', 'jsonl_file', 'csv_file', 'sqlite_file', 'dedup_file')
+
+
+def split_urls(urls, workers):
+    """把URL分配给工作进程
+
+    域名数不少于进程数时按域名整体分配（同一站点只由一个进程爬取，保持
+    礼貌的访问频率），按URL数量从多到少依次分给当前最空闲的进程；域名数
+    不足时按URL轮流分配。
+    """
+    workers = max(1, min(workers, len(urls)))
+    groups = {}
+    for url in urls:
+        groups.setdefault(urlparse(url).netloc, []).append(url)
+
+    shards = [[] for _ in range(workers)]
+    if len(groups) >= workers:
+        for group in sorted(groups.values(), key=len, reverse=True):
+            min(shards, key=len).extend(group)
+    else:
+        for i, url in enumerate(urls):
+            shards[i % workers].append(url)
+    return [shard for shard in shards if shard]
+
+
+def shard_filename(filename, index):
+    """在扩展名前插入分片编号：torrents.json -> torrents.shard0.json"""
+    root, ext = os.path.splitext(filename)
+    return f'{root}.shard{index}{ext}'
+
+
+def shard_output_settings(output_settings, index):
+    """生成分片的输出配置；去重索引从主索引复制，使分片也能跳过历史数据"""
+    settings = dict(output_settings)
+    for key in SHARDED_OUTPUT_KEYS:
+        if settings.get(key):
+            settings[key] = shard_filename(settings[key], index)
+    dedup_file = output_settings.get('dedup_file')
+    if dedup_file and os.path.exists(dedup_file):
+        shutil.copyfile(dedup_file, settings['dedup_file'])
+    return settings
+
+
+def jsonl_path(filename, compress):
+    """JsonLinesWriterPipeline 在启用gzip时会追加 .gz 后缀"""
+    if compress and not filename.endswith('.gz'):
+        return filename + '.gz'
+    return filename
+
+
+def record_key(record):
+    """跨分片去重使用的键"""
+    infohash = extract_infohash(record.get('magnet_url'))
+    if infohash:
+        return infohash
+    return record.get('torrent_url') or record.get('magnet_url') or None
+
+
+class _SeenKeys:
+    def __init__(self):
+        self.keys = set()
+
+    def is_new(self, record):
+        key = record_key(record)
+        if key is None:
+            return True
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+
+def read_json_records(filename, read_size=1 << 20):
+    """逐条读取JSON数组分片
+
+    按 read_size 个字符分块读取，已解析的部分随时丢弃，内存占用只与单条记录的
+    大小有关。工作进程中断时文件没有结尾的 ]，最后一条记录也可能不完整；逐条
+    解析，保留全部完整的记录，遇到无法解析的位置时记录警告并停止。
+    """
+    decoder = json.JSONDecoder()
+    with open(filename, 'r', encoding='utf-8') as f:
+        buffer, position, eof = '', 0, False
+
+        def read():
+            nonlocal buffer, position, eof
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+
+        def skip(characters):
+            """跳过 characters 中的字符，返回下一个字符（文件结束时为空字符串）"""
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position] in characters:
+                    position += 1
+                if position < len(buffer) or eof:
+                    return buffer[position:position + 1]
+                read()
+
+        if skip(' \t\r\n') != '[':
+            logger.warning(f"Skipping shard {filename}: not a JSON array")
+            return
+        position += 1
+        count = 0
+        while True:
+            char = skip(' \t\r\n,')
+            if not char:
+                logger.warning(f"Shard {filename} is unterminated, kept {count} complete records")
+                return
+            if char == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except ValueError as e:
+                if eof:
+                    logger.warning(f"Shard {filename} is truncated, kept {count} complete records: {e}")
+                    return
+                # 记录跨越了块的边界，读入下一块后重新解析
+                read()
+                continue
+            if end == len(buffer) and not eof:
+                # 正好在块末尾结束的值（如数字）可能还没有读完
+                read()
+                continue
+            position = end
+            count += 1
+            yield record
+
+
+def merge_json(shard_files, output_file):
+    """合并JSON数组分片，输出格式与 JsonWriterPipeline 相同"""
+    seen = _SeenKeys()
+    count = 0
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as out:
+        out.write('[\r\n')
+        for filename in shard_files:
+            if not os.path.exists(filename):
+                continue
+            for record in read_json_records(filename):
+                if seen.is_new(record):
+                    if count:
+                        out.write(',\r\n')
+                    out.write(json.dumps(record, ensure_ascii=False, indent=2))
+                    count += 1
+        out.write('\r\n]')
+    return count
+
+
+def _open_jsonl(filename, mode):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode + 't', encoding='utf-8')
+    return open(filename, mode, encoding='utf-8')
+
+
+def merge_jsonl(shard_files, output_file):
+    """逐行合并JSON Lines分片（支持gzip）"""
+    seen = _SeenKeys()
+    count = 0
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    with _open_jsonl(output_file, 'w') as out:
+        for filename in shard_files:
+            if not os.path.exists(filename):
+                continue
+            with _open_jsonl(filename, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 进程中断时最后一行可能不完整
+                        continue
+                    if seen.is_new(record):
+                        out.write(line + '\n')
+                        count += 1
+    return count
+
+
+def merge_csv(shard_files, output_file):
+    """合并CSV分片，表头取第一个存在的分片"""
+    seen = _SeenKeys()
+    count = 0
+    writer = None
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    with open(output_file, 'w', newline='', encoding='utf-8') as out:
+        for filename in shard_files:
+            if not os.path.exists(filename):
+                continue
+            with open(filename, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                if writer is None:
+                    writer = csv.DictWriter(out, fieldnames=reader.fieldnames)
+                    writer.writeheader()
+                for row in reader:
+                    if seen.is_new(row):
+                        writer.writerow(row)
+                        count += 1
+    return count
+
+
+def merge_sqlite(shard_files, output_file):
+    """合并SQLite分片：按插入顺序把各分片的行UPSERT到输出数据库，同一种子合并为一行
+
+    输出数据库中旧版本的表先升级；分片也可以是旧版本的数据库（缺少的infohash、
+    最后出现时间和搜索文本在合并时补齐），因此同样用于把历史上的多个数据库合并为一个。
+    """
+    count = 0
+    columns = TORRENT_COLUMNS + ('created_at',)
+    statements = {key: upsert_sql(key, columns) for _, key, _ in TORRENT_KEYS}
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    connection = sqlite3.connect(output_file)
+    try:
+        migrate_torrents_table(connection)
+        for filename in shard_files:
+            if not os.path.exists(filename):
+                continue
+            shard = sqlite3.connect(filename)
+            shard.row_factory = sqlite3.Row
+            try:
+                if not shard.execute("SELECT 1 FROM sqlite_master WHERE name = 'torrents'").fetchone():
+                    continue
+                with connection:
+                    for row in shard.execute('SELECT * FROM torrents ORDER BY id'):
+                        record = dict.fromkeys(columns)
+                        record.update((key, row[key]) for key in row.keys() if key in record)
+                        if record['infohash'] is None:
+                            record['infohash'] = torrent_infohash(record['magnet_url'], record['torrent_url'])
+                        if record['last_seen'] is None:
+                            record['last_seen'] = record['crawl_ts']
+                        if record['search_text'] is None:
+                            record['search_text'] = search_text(
+                                record['name'], record['category'], record['description'])
+                        key = torrent_key(record['infohash'], record['torrent_url'], record['magnet_url'])
+                        connection.execute(statements[key], tuple(record[column] for column in columns))
+                        count += 1
+            finally:
+                shard.close()
+    finally:
+        connection.close()
+    return count
+
+
+def merge_dedup_indexes(shard_files, output_file):
+    """把各分片新增的去重键合并回主索引"""
+    index = InfohashIndex(output_file)
+    try:
+        for i, filename in enumerate(shard_files):
+            if not os.path.exists(filename):
+                continue
+            index.connection.execute(f'ATTACH DATABASE ? AS shard{i}', (filename,))
+            for table in ('infohashes', 'urls'):
+                index.connection.execute(
+                    f'INSERT OR IGNORE INTO {table} (key) SELECT key FROM shard{i}.{table}')
+            index.commit()
+            index.connection.execute(f'DETACH DATABASE shard{i}')
+    finally:
+        index.close()
+
+
+def remove_shard_files(filenames):
+    for filename in filenames:
+        for path in (filename, filename + '-wal', filename + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,344 @@
+# Define here the models for your spider and downloader middlewares
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
+
+import time
+import logging
+
+from scrapy import signals, Request
+from scrapy.exceptions import NotConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class DomainConcurrencyState:
+    """单个域名的自适应并发状态"""
+
+    def __init__(self, concurrency, min_concurrency, max_concurrency, base_delay):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency = min(max(concurrency, min_concurrency), max_concurrency)
+        self.base_delay = base_delay
+        self.delay = base_delay
+        self.latency = None
+        self.error_rate = 0.0
+        self.successes = 0
+        self.throttled = 0
+
+
+class AdaptiveConcurrencyMiddleware:
+    """按域名自适应调整并发数的下载中间件
+
+    根据响应延迟、错误率和429/503响应调整每个域名下载槽的并发数：连续成功且
+    延迟低于目标时逐步加一（加性增），被限流时减半并加大延迟（乘性减），
+    错误率或延迟过高时减一。每个域名的并发上下限和延迟来自 ADAPTIVE_CONCURRENCY_DOMAINS，
+    未配置的域名使用 ADAPTIVE_CONCURRENCY_DEFAULT。
+
+    下载槽的延迟大于0时每个延迟周期只发出一个请求，只提高并发数不会加快爬取，
+    因此本中间件同时设置槽的延迟：域名的延迟是每个并发连接上两次请求的间隔，
+    槽的延迟为它除以并发数，请求速率随并发数增减。槽的延迟完全由本中间件决定，
+    不能与 AutoThrottle 同时使用（settings.py 默认关闭 AutoThrottle）。
+
+    下载槽在请求经过本中间件之后才创建，新域名的第一个请求到来时把它的并发数和
+    延迟写入下载器的 DOWNLOAD_SLOTS 表，第一批请求就按配置的上下限发出。
+    """
+
+    THROTTLE_CODES = (429, 503)
+    # 错误率和延迟的指数移动平均系数
+    SMOOTHING = 0.2
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        if not settings.getbool('ADAPTIVE_CONCURRENCY_ENABLED'):
+            raise NotConfigured
+        self.crawler = crawler
+        self.start_concurrency = settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN', 1)
+        self.base_delay = settings.getfloat('DOWNLOAD_DELAY', 0)
+        self.max_delay = settings.getfloat('ADAPTIVE_CONCURRENCY_MAX_DELAY', 60.0)
+        self.target_latency = settings.getfloat('ADAPTIVE_CONCURRENCY_TARGET_LATENCY', 2.0)
+        self.error_threshold = settings.getfloat('ADAPTIVE_CONCURRENCY_ERROR_THRESHOLD', 0.2)
+        self.default_limits = settings.getdict('ADAPTIVE_CONCURRENCY_DEFAULT', {'min': 1, 'max': 4})
+        self.domain_limits = settings.getdict('ADAPTIVE_CONCURRENCY_DOMAINS', {})
+        self.states = {}
+        if settings.getbool('AUTOTHROTTLE_ENABLED'):
+            logger.warning("AutoThrottle overrides the download delays set by AdaptiveConcurrencyMiddleware; "
+                           "set AUTOTHROTTLE_ENABLED = False")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def limits_for(self, hostname):
+        """查找域名的并发上下限，支持按父域名匹配（example.com 覆盖 www.example.com）"""
+        parts = (hostname or '').split('.')
+        for i in range(len(parts)):
+            limits = self.domain_limits.get('.'.join(parts[i:]))
+            if limits:
+                return {**self.default_limits, **limits}
+        return self.default_limits
+
+    def get_state(self, key):
+        state = self.states.get(key)
+        if state is None:
+            limits = self.limits_for(key)
+            state = DomainConcurrencyState(
+                self.start_concurrency,
+                int(limits.get('min', 1)),
+                int(limits.get('max', self.start_concurrency)),
+                float(limits.get('delay', self.base_delay)),
+            )
+            self.states[key] = state
+        return state
+
+    def get_slot(self, request):
+        key = request.meta.get('download_slot')
+        if key is None or self.crawler.engine is None:
+            return None, None
+        return key, self.crawler.engine.downloader.slots.get(key)
+
+    def process_request(self, request, spider):
+        if self.crawler.engine is None:
+            return None
+        downloader = self.crawler.engine.downloader
+        key = downloader.get_slot_key(request)
+        state = self.get_state(key)
+        slot = downloader.slots.get(key)
+        if slot is None:
+            downloader.per_slot_settings[key] = {
+                **downloader.per_slot_settings.get(key, {}),
+                'concurrency': state.concurrency,
+                'delay': state.delay / state.concurrency,
+            }
+        else:
+            # 空闲的槽会被回收后重建，重建的槽也要用当前的状态
+            self.apply(key, slot, state, spider)
+        return None
+
+    def process_response(self, request, response, spider):
+        key, slot = self.get_slot(request)
+        if slot is None:
+            return response
+        state = self.get_state(key)
+
+        if response.status in self.THROTTLE_CODES:
+            self.on_throttled(state, response)
+        elif response.status >= 500:
+            self.on_error(state)
+        else:
+            self.on_success(state, request.meta.get('download_latency'))
+
+        self.apply(key, slot, state, spider)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        key, slot = self.get_slot(request)
+        if slot is not None:
+            state = self.get_state(key)
+            self.on_error(state)
+            self.apply(key, slot, state, spider)
+
+    def on_throttled(self, state, response):
+        """被限流：并发减半，延迟加倍（或按Retry-After）"""
+        state.throttled += 1
+        state.successes = 0
+        state.concurrency = max(state.min_concurrency, state.concurrency // 2)
+        retry_after = self.parse_retry_after(response.headers.get('Retry-After'))
+        # 槽的延迟为 delay / 并发数，Retry-After 是下一个请求之前的等待时间
+        delay = max(state.delay * 2, state.base_delay, 1.0, (retry_after or 0) * state.concurrency)
+        state.delay = min(self.max_delay, delay)
+
+    def on_error(self, state):
+        state.successes = 0
+        state.error_rate += self.SMOOTHING * (1 - state.error_rate)
+        if state.error_rate > self.error_threshold:
+            state.concurrency = max(state.min_concurrency, state.concurrency - 1)
+
+    def on_success(self, state, latency):
+        state.error_rate *= (1 - self.SMOOTHING)
+        if latency is not None:
+            if state.latency is None:
+                state.latency = latency
+            else:
+                state.latency += self.SMOOTHING * (latency - state.latency)
+
+        # 延迟明显超过目标时减一，避免压垮响应变慢的站点
+        if state.latency is not None and state.latency > self.target_latency * 2:
+            state.concurrency = max(state.min_concurrency, state.concurrency - 1)
+            state.successes = 0
+            return
+
+        state.successes += 1
+        # 每完成一轮（并发数个）成功请求且状态健康时加一
+        if state.successes >= state.concurrency:
+            state.successes = 0
+            healthy = (state.error_rate < self.error_threshold / 2
+                       and (state.latency is None or state.latency <= self.target_latency))
+            if healthy:
+                state.concurrency = min(state.max_concurrency, state.concurrency + 1)
+                # 逐步恢复限流时加大的延迟
+                state.delay = max(state.base_delay, state.delay * 0.75)
+                if state.delay - state.base_delay < 0.1:
+                    state.delay = state.base_delay
+
+    def apply(self, key, slot, state, spider):
+        if slot.concurrency != state.concurrency:
+            spider.logger.debug(f"Adaptive concurrency for {key}: {slot.concurrency} -> {state.concurrency}")
+            slot.concurrency = state.concurrency
+        # 并发数个连接共用槽的延迟，速率为 并发数 / 域名延迟
+        slot.delay = state.delay / state.concurrency
+        stats = self.crawler.stats
+        stats.set_value(f'adaptive_concurrency/{key}/concurrency', state.concurrency)
+        stats.set_value(f'adaptive_concurrency/{key}/delay', round(slot.delay, 3))
+        stats.max_value(f'adaptive_concurrency/{key}/max_concurrency', state.concurrency)
+
+    def spider_closed(self, spider):
+        for key, state in self.states.items():
+            self.crawler.stats.set_value(f'adaptive_concurrency/{key}/throttled', state.throttled)
+
+    @staticmethod
+    def parse_retry_after(value):
+        if not value:
+            return None
+        try:
+            return float(value.decode('latin-1') if isinstance(value, bytes) else value)
+        except ValueError:
+            return None
+
+
+class SourceBudget:
+    """单个来源（source_url）的爬取预算消耗"""
+
+    def __init__(self):
+        self.requests = 0
+        self.pages = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self.finished = self.started
+        self.dropped = 0
+        self.deprioritized = 0
+        self.exhausted = None
+
+    @property
+    def elapsed(self):
+        return self.finished - self.started
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'pages': self.pages,
+            'bytes': self.bytes,
+            'seconds': round(self.elapsed, 1),
+            'dropped': self.dropped,
+            'deprioritized': self.deprioritized,
+            'exhausted': self.exhausted,
+        }
+
+
+class CrawlBudgetMiddleware:
+    """按来源限制爬取预算的爬虫中间件
+
+    以请求的 meta['source_url']（起始URL）为来源，统计发出的请求数、已下载的
+    页面数、字节数和从第一个请求开始的耗时。请求数在请求经过中间件时即计入，
+    一个页面产生的大量请求不会在调度前全部越过预算。任一项超过 CRAWL_BUDGET_MAX_* 的
+    限制（0为不限制）后，该来源后续产生的请求按 CRAWL_BUDGET_ACTION 丢弃（stop）
+    或降低优先级（deprioritize），避免单个大站点占满整个多站点爬取。各来源的
+    消耗在爬虫结束时写入统计 budget/sources。
+    """
+
+    ACTIONS = ('stop', 'deprioritize')
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.max_requests = settings.getint('CRAWL_BUDGET_MAX_REQUESTS', 0)
+        self.max_bytes = settings.getint('CRAWL_BUDGET_MAX_BYTES', 0)
+        self.max_seconds = settings.getfloat('CRAWL_BUDGET_MAX_SECONDS', 0)
+        self.action = settings.get('CRAWL_BUDGET_ACTION', 'stop')
+        if self.action not in self.ACTIONS:
+            raise NotConfigured(f"CRAWL_BUDGET_ACTION must be one of {self.ACTIONS}")
+        self.priority_step = settings.getint('CRAWL_BUDGET_PRIORITY_STEP', 100)
+        self.sources = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.response_received, signal=signals.response_received)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    @staticmethod
+    def source_of(request):
+        return request.meta.get('source_url') or request.url
+
+    def get_budget(self, source):
+        budget = self.sources.get(source)
+        if budget is None:
+            budget = self.sources[source] = SourceBudget()
+        return budget
+
+    def process_start_requests(self, start_requests, spider):
+        for request in start_requests:
+            self.get_budget(self.source_of(request)).requests += 1
+            yield request
+
+    async def process_start(self, start):
+        async for request in start:
+            if isinstance(request, Request):
+                self.get_budget(self.source_of(request)).requests += 1
+            yield request
+
+    def response_received(self, response, request, spider):
+        budget = self.get_budget(self.source_of(request))
+        budget.pages += 1
+        budget.bytes += len(response.body)
+        budget.finished = time.monotonic()
+
+    def exhausted_reason(self, budget):
+        if self.max_requests and budget.requests >= self.max_requests:
+            return 'requests'
+        if self.max_bytes and budget.bytes >= self.max_bytes:
+            return 'bytes'
+        if self.max_seconds and time.monotonic() - budget.started >= self.max_seconds:
+            return 'time'
+        return None
+
+    def process_request_output(self, request, spider):
+        """对回调产生的请求应用预算，返回处理后的请求或None（丢弃）"""
+        budget = self.get_budget(self.source_of(request))
+        if budget.exhausted is None:
+            budget.exhausted = self.exhausted_reason(budget)
+            if budget.exhausted is None:
+                budget.requests += 1
+                return request
+            spider.logger.info(f"Crawl budget ({budget.exhausted}) exhausted for {self.source_of(request)}")
+        if self.action == 'stop':
+            budget.dropped += 1
+            self.crawler.stats.inc_value('budget/dropped')
+            return None
+        budget.requests += 1
+        budget.deprioritized += 1
+        self.crawler.stats.inc_value('budget/deprioritized')
+        return request.replace(priority=request.priority - self.priority_step)
+
+    def process_spider_output(self, response, result, spider):
+        for output in result:
+            if isinstance(output, Request):
+                output = self.process_request_output(output, spider)
+                if output is None:
+                    continue
+            yield output
+
+    async def process_spider_output_async(self, response, result, spider):
+        async for output in result:
+            if isinstance(output, Request):
+                output = self.process_request_output(output, spider)
+                if output is None:
+                    continue
+            yield output
+
+    def spider_closed(self, spider):
+        self.crawler.stats.set_value(
+            'budget/sources', {source: budget.as_dict() for source, budget in self.sources.items()})
@@ -0,0 +1,106 @@
+# 字段规范化
+#
+# 页面上的文件大小和时间都是展示用的文本（"1.4 GB"、"2 hours ago"、"3天前"），
+# 这里把它们转换为整数：size_bytes 为字节数，upload_ts / crawl_ts 为Unix时间戳
+# （秒）。原始文本字段保留不变，数值字段写入SQLite的整数列和CSV，便于排序和
+# 范围查询。无法识别的值为None。
+
+import re
+import time
+from datetime import datetime, timedelta
+
+# 种子站点的 KB/MB/GB 普遍按1024进制计算，KiB 等写法同样按1024处理
+SIZE_UNITS = {
+    'b': 1, 'byte': 1, 'bytes': 1, '字节': 1,
+    'k': 1024, 'kb': 1024, 'kib': 1024, '千字节': 1024,
+    'm': 1024 ** 2, 'mb': 1024 ** 2, 'mib': 1024 ** 2, '兆': 1024 ** 2, '兆字节': 1024 ** 2,
+    'g': 1024 ** 3, 'gb': 1024 ** 3, 'gib': 1024 ** 3, '吉字节': 1024 ** 3,
+    't': 1024 ** 4, 'tb': 1024 ** 4, 'tib': 1024 ** 4, '太字节': 1024 ** 4,
+    'p': 1024 ** 5, 'pb': 1024 ** 5, 'pib': 1024 ** 5,
+}
+SIZE_REGEX = re.compile(
+    r'(\d+(?:[.,]\d+)*)\s*(千字节|兆字节|吉字节|太字节|字节|兆|[KMGTP]i?B|[KMGTP]|bytes?|B)(?![A-Za-z])', re.I)
+
+UNIT_SECONDS = {
+    'second': 1, 'sec': 1, 'minute': 60, 'min': 60, 'hour': 3600, 'day': 86400,
+    'week': 7 * 86400, 'month': 30 * 86400, 'year': 365 * 86400,
+    '秒': 1, '秒钟': 1, '分': 60, '分钟': 60, '小时': 3600, '个小时': 3600, '天': 86400, '日': 86400,
+    '周': 7 * 86400, '星期': 7 * 86400, '个星期': 7 * 86400, '月': 30 * 86400, '个月': 30 * 86400,
+    '年': 365 * 86400,
+}
+RELATIVE_TIME_REGEX = re.compile(
+    r'(\d+(?:\.\d+)?)\s*(second|sec|minute|min|hour|day|week|month|year)s?\s+ago', re.I)
+CHINESE_RELATIVE_TIME_REGEX = re.compile(
+    r'(\d+(?:\.\d+)?)\s*(秒钟|秒|分钟|分|个小时|小时|天|日|个星期|星期|周|个月|月|年)\s*(?:前|以前|之前)')
+DAY_WORDS = {'今天': 0, 'today': 0, '昨天': 1, 'yesterday': 1, 'y-day': 1, '前天': 2}
+DAY_WORD_REGEX = re.compile(r'(今天|昨天|前天|today|yesterday|y-day)(?:\s*(\d{1,2})[:：](\d{2}))?', re.I)
+JUST_NOW_REGEX = re.compile(r'刚刚|just now', re.I)
+# 2023-10-01 00:15:00、2023/10/01、2023年10月1日 12:30、ISO格式的 2023-10-01T00:15:00.123456
+ABSOLUTE_TIME_REGEX = re.compile(
+    r'(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*日?'
+    r'(?:[T\s]*(\d{1,2})\s*[:：时]\s*(\d{2})(?:\s*[:：分]\s*(\d{2}))?)?')
+
+
+def parse_size(text):
+    """把文件大小文本（"1.4 GB"、"700MiB"、"1,024 KB"、"3.5兆"）解析为字节数，无法识别时返回None"""
+    if isinstance(text, int):
+        return text
+    if not text:
+        return None
+    match = SIZE_REGEX.search(text)
+    if not match:
+        return None
+    number = match.group(1)
+    # 逗号后恰好三位数字视为千分位，否则视为小数点
+    number = re.sub(r',(?=\d{3}(?!\d))', '', number).replace(',', '.')
+    try:
+        value = float(number)
+    except ValueError:
+        return None
+    return int(round(value * SIZE_UNITS[match.group(2).lower()]))
+
+
+def parse_timestamp(text, now=None):
+    """把时间文本解析为Unix时间戳（秒），无法识别时返回None
+
+    支持 "2023-10-01 00:15:00"、"2023年10月1日"、ISO格式，"3 days ago"、"2小时前"，
+    以及 "今天 12:30"、"昨天"、"yesterday" 和 "刚刚"；不带时区的时间按本地时间处理。
+    """
+    if not text:
+        return None
+    now = time.time() if now is None else now
+    match = RELATIVE_TIME_REGEX.search(text)
+    if match:
+        return int(now - float(match.group(1)) * UNIT_SECONDS[match.group(2).lower()])
+    match = CHINESE_RELATIVE_TIME_REGEX.search(text)
+    if match:
+        return int(now - float(match.group(1)) * UNIT_SECONDS[match.group(2)])
+    match = ABSOLUTE_TIME_REGEX.search(text)
+    if match:
+        try:
+            return int(datetime(*(int(value or 0) for value in match.groups())).timestamp())
+        except ValueError:
+            return None
+    match = DAY_WORD_REGEX.search(text)
+    if match:
+        days = DAY_WORDS[match.group(1).lower()]
+        if match.group(2) is None:
+            return int(now - days * 86400)
+        day = datetime.fromtimestamp(now).date() - timedelta(days=days)
+        try:
+            return int(datetime(day.year, day.month, day.day,
+                                int(match.group(2)), int(match.group(3))).timestamp())
+        except ValueError:
+            return None
+    if JUST_NOW_REGEX.search(text):
+        return int(now)
+    return None
+
+
+def normalize_item(adapter, now=None):
+    """为item（ItemAdapter）填写 size_bytes、upload_ts 和 crawl_ts"""
+    adapter['size_bytes'] = parse_size(adapter.get('size'))
+    adapter['crawl_ts'] = parse_timestamp(adapter.get('crawl_time'), now)
+    # 相对时间以爬取时间为基准
+    adapter['upload_ts'] = parse_timestamp(adapter.get('upload_time'), adapter['crawl_ts'] or now)
+    return adapter
@@ -5,10 +5,21 @@
 
 import json
 import csv
+import gzip
 import sqlite3
 import os
+import time
 from datetime import datetime
 from itemadapter import ItemAdapter
+from twisted.internet import task
+
+from torrent_spider.dedup import extract_infohash, infohash_from_url, open_dedup_index
+from torrent_spider.filters import ItemFilter
+from torrent_spider.history import SwarmHistory
+from torrent_spider.jobs import flushed_size, reopen_output
+from torrent_spider.normalize import normalize_item
+from torrent_spider.search import ensure_search_index, search_text
+from torrent_spider.writer import BackgroundWriter
 
 
 class TorrentSpiderPipeline:
@@ -30,58 +41,257 @@ class TorrentSpiderPipeline:
         if not adapter.get('crawl_time'):
             adapter['crawl_time'] = datetime.now().isoformat()
         
+        # 文件大小和时间转换为整数（字节数、Unix时间戳）
+        normalize_item(adapter)
+        
         return item
 
 
 class JsonWriterPipeline:
-    """JSON文件输出管道"""
+    """JSON文件输出管道
+
+    项目在反应器线程中序列化，写入文件在后台写入线程中进行（见 writer.py）。
+    """
+    
+    def __init__(self, queue_size=1000, stats=None):
+        self.queue_size = queue_size
+        self.stats = stats
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(queue_size=crawler.settings.getint('WRITER_QUEUE_SIZE', 1000), stats=crawler.stats)
     
     def open_spider(self, spider):
         # 从spider设置中获取文件名，如果没有则使用默认值
         filename = getattr(spider, 'json_file', 'torrents.json')
         # 确保输出目录存在
         os.makedirs(os.path.dirname(filename), exist_ok=True)
-        self.file = open(filename, 'w', encoding='utf-8')
-        self.file.write('[\r\n')
-        self.first_item = True
-        self.items = []
+        # 可恢复任务从上次检查点的位置继续写入
+        self.job = getattr(spider, 'job', None)
+        state = self.job.restore('json') if self.job else None
+        self.file, resumed = reopen_output(filename, state['offset'] if state else None,
+                                           'w', encoding='utf-8')
+        if resumed:
+            self.item_count = state['items']
+        else:
+            self.file.write('[\r\n')
+            self.item_count = 0
+        self.first_item = self.item_count == 0
+        self.final_position = None
+        self.writer = BackgroundWriter('json', self.queue_size, spider.logger, self.stats)
+        if self.job:
+            self.job.register('json', self.checkpoint)
     
     def close_spider(self, spider):
+        # 最终检查点在去重管道关闭时才做，先记下结尾 ] 之前的位置
+        if self.job and not self.job.closed:
+            self.final_position = self.writer.call(self.position, count=False)
+        return self.writer.close(self.finish)
+    
+    def finish(self):
         self.file.write('\r\n]')
         self.file.close()
     
+    def position(self):
+        """结尾 ] 之前的位置和已写入的条数（在写入线程中执行）"""
+        return {'offset': flushed_size(self.file), 'items': self.item_count}
+    
+    def checkpoint(self):
+        """任务检查点：返回在已提交的项目写入后以位置触发的Deferred"""
+        if self.final_position is not None:
+            return self.final_position
+        return self.writer.call(self.position, count=False)
+    
+    def write(self, text):
+        self.file.write(text)
+        self.item_count += 1
+    
     def process_item(self, item, spider):
         if item is None:
             return None
+        # 在反应器线程中序列化，之后的管道修改item不影响写入的内容
+        text = json.dumps(ItemAdapter(item).asdict(), ensure_ascii=False, indent=2)
         if not self.first_item:
-            self.file.write(',\r\n')
+            text = ',\r\n' + text
         else:
             self.first_item = False
+        return self.writer.submit(self.write, text, result=item)
+
+
+class JsonLinesWriterPipeline:
+    """JSON Lines文件输出管道
+
+    每条记录以紧凑JSON写为一行，文件在爬取过程中始终可读。写入在后台写入线程中
+    进行并经过缓冲，每 flush_items 条或每 flush_interval 秒刷新一次；可选gzip压缩。
+    """
+    
+    def __init__(self, compress=False, flush_items=100, flush_interval=5.0, buffer_size=65536,
+                 queue_size=1000, stats=None):
+        self.compress = compress
+        self.flush_items = max(1, flush_items)
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self.stats = stats
+        self.flush_task = None
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            compress=settings.getbool('JSONL_GZIP', False),
+            flush_items=settings.getint('JSONL_FLUSH_ITEMS', 100),
+            flush_interval=settings.getfloat('JSONL_FLUSH_INTERVAL', 5.0),
+            buffer_size=settings.getint('JSONL_BUFFER_SIZE', 65536),
+            queue_size=settings.getint('WRITER_QUEUE_SIZE', 1000),
+            stats=crawler.stats,
+        )
+    
+    def open_spider(self, spider):
+        # 从spider设置中获取文件名，如果没有则使用默认值
+        filename = getattr(spider, 'jsonl_file', 'torrents.jsonl')
+        if self.compress and not filename.endswith('.gz'):
+            filename += '.gz'
+        self.filename = filename
+        # 确保输出目录存在
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        # 可恢复任务从上次检查点的位置继续写入
+        self.job = getattr(spider, 'job', None)
+        state = self.job.restore('jsonl') if self.job else None
+        self.raw_file, _ = reopen_output(filename, state['offset'] if state else None,
+                                         'wb', buffering=self.buffer_size)
+        self.start_member()
+        self.pending = 0
+        self.final_position = None
+        self.writer = BackgroundWriter('jsonl', self.queue_size, spider.logger, self.stats)
+        if self.job:
+            self.job.register('jsonl', self.checkpoint)
+        self.last_flush = time.monotonic()
         
-        line = json.dumps(ItemAdapter(item).asdict(), ensure_ascii=False, indent=2)
+        # 定时刷新，保证爬取间歇期已写入的行也能及时被读取
+        if self.flush_interval > 0:
+            self.flush_task = task.LoopingCall(self.writer.submit, self.flush_if_due, count=False)
+            self.flush_task.start(self.flush_interval, now=False)
+    
+    def close_spider(self, spider):
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        if self.job and not self.job.closed:
+            self.final_position = self.writer.call(self.position, count=False)
+        return self.writer.close(self.finish)
+    
+    def finish(self):
+        if self.compress:
+            self.file.close()
+        self.raw_file.close()
+    
+    def start_member(self):
+        """gzip模式下开始一个新的压缩成员（多个成员连接起来仍是合法的gzip文件）"""
+        self.member_start = self.raw_file.tell()
+        self.member_items = 0
+        if self.compress:
+            self.file = gzip.GzipFile(fileobj=self.raw_file, mode='wb')
+        else:
+            self.file = self.raw_file
+    
+    def position(self):
+        """已完整写入的文件位置（在写入线程中执行）
+
+        gzip模式下结束当前压缩成员，使文件在该位置截断后仍然完整；没有新数据时
+        返回当前成员的起始位置。
+        """
+        if self.compress:
+            if self.member_items:
+                self.file.close()
+                self.start_member()
+            self.raw_file.flush()
+            return {'offset': self.member_start}
+        self.flush()
+        return {'offset': self.raw_file.tell()}
+    
+    def checkpoint(self):
+        """任务检查点：返回在已提交的行写入后以位置触发的Deferred"""
+        if self.final_position is not None:
+            return self.final_position
+        return self.writer.call(self.position, count=False)
+    
+    def flush_if_due(self):
+        if self.pending and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        """刷新缓冲区（gzip模式下同时同步压缩流），使已写入的行对读取方可见"""
+        self.file.flush()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+    
+    def write(self, line):
         self.file.write(line)
-        return item
+        self.pending += 1
+        self.member_items += 1
+        
+        if (self.pending >= self.flush_items
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+    
+    def process_item(self, item, spider):
+        if item is None:
+            return None
+        line = json.dumps(ItemAdapter(item).asdict(), ensure_ascii=False, separators=(',', ':'))
+        return self.writer.submit(self.write, line.encode('utf-8') + b'\n', result=item)
 
 
 class CsvWriterPipeline:
-    """CSV文件输出管道"""
+    """CSV文件输出管道
+
+    字段在反应器线程中取出，写入文件在后台写入线程中进行。
+    """
+    
+    def __init__(self, queue_size=1000, stats=None):
+        self.queue_size = queue_size
+        self.stats = stats
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(queue_size=crawler.settings.getint('WRITER_QUEUE_SIZE', 1000), stats=crawler.stats)
     
     def open_spider(self, spider):
         # 从spider设置中获取文件名，如果没有则使用默认值
         filename = getattr(spider, 'csv_file', 'torrents.csv')
         # 确保输出目录存在
         os.makedirs(os.path.dirname(filename), exist_ok=True)
-        self.file = open(filename, 'w', newline='', encoding='utf-8')
+        # 可恢复任务从上次检查点的位置继续写入，不再重复表头
+        self.job = getattr(spider, 'job', None)
+        state = self.job.restore('csv') if self.job else None
+        self.file, resumed = reopen_output(filename, state['offset'] if state else None,
+                                           'w', newline='', encoding='utf-8')
         self.fieldnames = [
             'name', 'torrent_url', 'magnet_url', 'size', 'seeders', 
             'leechers', 'upload_time', 'category', 'duration', 'description', 
-            'source_url', 'crawl_time'
+            'source_url', 'crawl_time', 'size_bytes', 'upload_ts', 'crawl_ts'
         ]
-        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames)
-        self.writer.writeheader()
+        self.csv_writer = csv.DictWriter(self.file, fieldnames=self.fieldnames)
+        if not resumed:
+            self.csv_writer.writeheader()
+        self.final_position = None
+        self.writer = BackgroundWriter('csv', self.queue_size, spider.logger, self.stats)
+        if self.job:
+            self.job.register('csv', self.checkpoint)
     
     def close_spider(self, spider):
-        self.file.close()
+        if self.job and not self.job.closed:
+            self.final_position = self.writer.call(self.position, count=False)
+        return self.writer.close(self.file.close)
+    
+    def position(self):
+        """已写入的文件位置（在写入线程中执行）"""
+        return {'offset': flushed_size(self.file)}
+    
+    def checkpoint(self):
+        """任务检查点：返回在已提交的行写入后以位置触发的Deferred"""
+        if self.final_position is not None:
+            return self.final_position
+        return self.writer.call(self.position, count=False)
     
     def process_item(self, item, spider):
         if item is None:
@@ -91,105 +301,496 @@ class CsvWriterPipeline:
         row = {}
         for field in self.fieldnames:
             row[field] = adapter.get(field, '')
-        self.writer.writerow(row)
-        return item
+        return self.writer.submit(self.csv_writer.writerow, row, result=item)
+
+
+# torrents 表的结构。每个种子只保存一行：有infohash的按infohash唯一，没有的依次按
+# 种子文件链接、磁力链接唯一，都没有时按名称和来源唯一；再次抓取到同一种子时更新
+# 做种数、下载数和最后出现时间。
+TORRENTS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS torrents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        torrent_url TEXT,
+        magnet_url TEXT,
+        size TEXT,
+        seeders INTEGER,
+        leechers INTEGER,
+        upload_time TEXT,
+        category TEXT,
+        duration TEXT,
+        description TEXT,
+        source_url TEXT,
+        crawl_time TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        size_bytes INTEGER,
+        upload_ts INTEGER,
+        crawl_ts INTEGER,
+        infohash TEXT,
+        last_seen INTEGER,
+        search_text TEXT
+    )
+'''
+
+TORRENT_COLUMNS = (
+    'name', 'torrent_url', 'magnet_url', 'size', 'seeders', 'leechers',
+    'upload_time', 'category', 'duration', 'description', 'source_url', 'crawl_time',
+    'size_bytes', 'upload_ts', 'crawl_ts', 'infohash', 'last_seen', 'search_text',
+)
+
+# 旧版本创建的数据库在打开时补齐的列
+ADDED_COLUMNS = (
+    ('size_bytes', 'INTEGER'), ('upload_ts', 'INTEGER'), ('crawl_ts', 'INTEGER'),
+    ('infohash', 'TEXT'), ('last_seen', 'INTEGER'), ('search_text', 'TEXT'),
+)
+
+# 唯一键：(索引名, 列, 适用的行)，每一行恰好适用其中一个（见 torrent_key）
+TORRENT_KEYS = (
+    ('idx_torrents_infohash', 'infohash', 'infohash IS NOT NULL'),
+    ('idx_torrents_torrent_url', 'torrent_url', "infohash IS NULL AND torrent_url != ''"),
+    ('idx_torrents_magnet_url', 'magnet_url',
+     "infohash IS NULL AND COALESCE(torrent_url, '') = '' AND magnet_url != ''"),
+    ('idx_torrents_name_source', 'name, source_url',
+     "infohash IS NULL AND COALESCE(torrent_url, '') = '' AND COALESCE(magnet_url, '') = ''"),
+)
+
+# 按分类筛选（同一分类内按做种数排序）、按做种数/大小/上传时间排序和范围查询时使用的索引
+QUERY_INDEXES = (
+    ('idx_torrents_category', 'category, seeders'),
+    ('idx_torrents_seeders', 'seeders'),
+    ('idx_torrents_size_bytes', 'size_bytes'),
+    ('idx_torrents_upload_ts', 'upload_ts'),
+)
+
+# 重复出现时总是取最新值的列
+LATEST_COLUMNS = ('seeders', 'leechers', 'last_seen', 'crawl_time', 'crawl_ts', 'source_url')
+# 已有值时保留、为空时用新值补齐的列
+FILL_COLUMNS = ('name', 'torrent_url', 'magnet_url', 'size', 'size_bytes', 'upload_time', 'upload_ts',
+                'category', 'duration', 'description')
+
+
+def torrent_infohash(magnet_url, torrent_url=None):
+    """种子的infohash（小写十六进制），磁力链接优先，其次是以infohash命名的种子文件链接"""
+    infohash = extract_infohash(magnet_url) or infohash_from_url(torrent_url)
+    return infohash.hex() if infohash else None
+
+
+def torrent_key(infohash, torrent_url, magnet_url):
+    """一行适用的唯一键（TORRENT_KEYS 中的列）"""
+    if infohash is not None:
+        return 'infohash'
+    if torrent_url:
+        return 'torrent_url'
+    if magnet_url:
+        return 'magnet_url'
+    return 'name, source_url'
+
+
+def upsert_sql(key, columns=TORRENT_COLUMNS):
+    """按唯一键 key（TORRENT_KEYS 中的列）插入或更新一行的语句"""
+    where = dict((column, condition) for _, column, condition in TORRENT_KEYS)[key]
+    key_columns = key.split(', ')
+    updates = [f'{column} = COALESCE(excluded.{column}, {column})'
+               for column in LATEST_COLUMNS if column in columns and column not in key_columns]
+    updates += [f"{column} = COALESCE(NULLIF({column}, ''), excluded.{column})"
+                for column in FILL_COLUMNS if column in columns and column not in key_columns]
+    # 搜索文本取信息更完整（更长）的一次
+    if 'search_text' in columns:
+        updates.append('search_text = CASE WHEN length(excluded.search_text) > COALESCE(length(search_text), -1) '
+                       'THEN excluded.search_text ELSE search_text END')
+    return (f"INSERT INTO torrents ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT ({key}) WHERE {where} DO UPDATE SET {', '.join(updates)}")
+
+
+def migrate_torrents_table(connection):
+    """创建 torrents 表，或把旧版本的表升级到当前结构，返回合并掉的重复行数
+
+    补齐新增的列；第一次升级时为已有的行填写infohash和最后出现时间，同一种子
+    的多行合并为最早的一行（做种数等取最新一行的值），然后建立唯一索引和查询索引，
+    以及全文搜索索引（见 search.py）。
+    """
+    connection.execute(TORRENTS_TABLE_SQL)
+    existing = {row[1] for row in connection.execute('PRAGMA table_info(torrents)')}
+    for column, column_type in ADDED_COLUMNS:
+        if column not in existing:
+            connection.execute(f'ALTER TABLE torrents ADD COLUMN {column} {column_type}')
+    merged = 0
+    indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    if TORRENT_KEYS[0][0] not in indexes:
+        connection.create_function('torrent_infohash', 2, torrent_infohash, deterministic=True)
+        connection.execute(
+            "UPDATE torrents SET infohash = torrent_infohash(magnet_url, torrent_url), "
+            "last_seen = COALESCE(last_seen, crawl_ts, CAST(strftime('%s', created_at) AS INTEGER)) "
+            "WHERE infohash IS NULL")
+    latest = ', '.join(LATEST_COLUMNS)
+    fill = ', '.join(f"{column} = COALESCE(NULLIF({column}, ''), "
+                     f"(SELECT {column} FROM torrents WHERE id = :latest))" for column in FILL_COLUMNS)
+    merge_sql = (f'UPDATE torrents SET ({latest}) = (SELECT {latest} FROM torrents WHERE id = :latest), '
+                 f'{fill} WHERE id = :keep')
+    # 还没有建立的唯一键（包括后来新增的）先合并重复的行
+    for name, column, condition in TORRENT_KEYS:
+        if name not in indexes:
+            groups = connection.execute(
+                f'SELECT MIN(id) AS keep, MAX(id) AS latest FROM torrents WHERE {condition} '
+                f'GROUP BY {column} HAVING COUNT(*) > 1').fetchall()
+            connection.executemany(merge_sql, [{'keep': keep, 'latest': latest_id} for keep, latest_id in groups])
+            merged += connection.execute(
+                f'DELETE FROM torrents WHERE {condition} AND id NOT IN '
+                f'(SELECT MIN(id) FROM torrents WHERE {condition} GROUP BY {column})').rowcount
+    for name, column, condition in TORRENT_KEYS:
+        connection.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {name} ON torrents ({column}) WHERE {condition}')
+    for name, column in QUERY_INDEXES:
+        connection.execute(f'CREATE INDEX IF NOT EXISTS {name} ON torrents ({column})')
+    ensure_search_index(connection)
+    connection.commit()
+    return merged
 
 
 class SqlitePipeline:
-    """SQLite数据库存储管道"""
+    """SQLite数据库存储管道
+
+    数据先缓存在内存中，每 batch_size 条或每 flush_interval 秒交给后台写入线程，
+    在一个事务内用 executemany 批量写入，close_spider 时写入剩余数据并等待写完。
+    batch_size 为 1 时等同于逐条提交。数据库连接只在写入线程中使用。
+
+    每个种子只占一行：按infohash（没有时依次按种子文件链接、磁力链接、名称和来源）
+    UPSERT，再次抓取到已有的种子时更新做种数、下载数和 last_seen，表的大小不随
+    运行次数增长。
+    """
+    
+    upsert_by_infohash = upsert_sql('infohash')
+    upserts = {column: upsert_sql(column) for _, column, _ in TORRENT_KEYS}
+    key_indexes = tuple(TORRENT_COLUMNS.index(column) for column in ('infohash', 'torrent_url', 'magnet_url'))
+    
+    def __init__(self, batch_size=500, flush_interval=5.0, journal_mode='WAL',
+                 synchronous='NORMAL', cache_size=-20000, queue_size=1000, stats=None):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self.queue_size = queue_size
+        self.stats = stats
+        self.buffer = []
+        self.flush_task = None
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            batch_size=settings.getint('SQLITE_BATCH_SIZE', 500),
+            flush_interval=settings.getfloat('SQLITE_FLUSH_INTERVAL', 5.0),
+            journal_mode=settings.get('SQLITE_JOURNAL_MODE', 'WAL'),
+            synchronous=settings.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+            cache_size=settings.getint('SQLITE_CACHE_SIZE', -20000),
+            queue_size=settings.getint('WRITER_QUEUE_SIZE', 1000),
+            stats=crawler.stats,
+        )
     
     def open_spider(self, spider):
         # 从spider设置中获取文件名，如果没有则使用默认值
         filename = getattr(spider, 'sqlite_file', 'torrents.db')
         # 确保输出目录存在
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        self.connection = sqlite3.connect(filename)
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        # 打开和迁移在反应器线程中进行（爬取开始前），之后只在写入线程中使用
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
         self.cursor = self.connection.cursor()
         
-        # 创建表
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS torrents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                torrent_url TEXT,
-                magnet_url TEXT,
-                size TEXT,
-                seeders INTEGER,
-                leechers INTEGER,
-                upload_time TEXT,
-                category TEXT,
-                duration TEXT,
-                description TEXT,
-                source_url TEXT,
-                crawl_time TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        self.connection.commit()
+        # 配置日志模式、同步级别和页缓存
+        if self.journal_mode:
+            self.cursor.execute(f'PRAGMA journal_mode={self.journal_mode}')
+        if self.synchronous:
+            self.cursor.execute(f'PRAGMA synchronous={self.synchronous}')
+        if self.cache_size:
+            self.cursor.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+        
+        # 创建表，旧版本的表补齐新增的列并合并重复行
+        merged = migrate_torrents_table(self.connection)
+        if merged:
+            spider.logger.info(f"Merged {merged} duplicate rows in {filename}")
+        self.last_flush = time.monotonic()
+        
+        self.job = getattr(spider, 'job', None)
+        self.restored = self.job is None
+        self.final_position = None
+        # 队列长度按项目数计，每个写入操作是一批
+        self.writer = BackgroundWriter('sqlite', max(1, self.queue_size // self.batch_size),
+                                       spider.logger, self.stats)
+        if self.job:
+            self.job.register('sqlite', self.checkpoint)
+        
+        # 定时写入，避免爬取间歇期数据长时间停留在缓冲区
+        if self.batch_size > 1 and self.flush_interval > 0:
+            self.flush_task = task.LoopingCall(self.flush_if_due)
+            self.flush_task.start(self.flush_interval, now=False)
     
     def close_spider(self, spider):
-        self.connection.close()
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        self.flush()
+        if self.job and not self.job.closed:
+            self.final_position = self.writer.call(self.position, count=False)
+        return self.writer.close(self.connection.close)
+    
+    def position(self):
+        """最大的行ID（在写入线程中执行）"""
+        last_id = self.cursor.execute('SELECT COALESCE(MAX(id), 0) FROM torrents').fetchone()[0]
+        return {'last_id': last_id}
+    
+    def checkpoint(self):
+        """任务检查点：写入缓冲区，返回在写完后以最大的行ID触发的Deferred"""
+        if self.final_position is not None:
+            return self.final_position
+        self.flush()
+        return self.writer.call(self.position, count=False)
+    
+    def flush_if_due(self):
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            return self.flush()
+    
+    def restore(self):
+        """可恢复任务：删除上次检查点之后写入的行（对应的请求会重新抓取）
+
+        检查点随去重索引保存，去重管道在本管道之后打开，因此在第一次写入前进行。
+        """
+        state = self.job.restore('sqlite')
+        if state is not None:
+            self.writer.submit(self.delete_after, state['last_id'])
+        self.restored = True
+    
+    def delete_after(self, last_id):
+        with self.connection:
+            self.cursor.execute('DELETE FROM torrents WHERE id > ?', (last_id,))
+    
+    def flush(self, result=None):
+        """把缓冲区中的全部数据交给写入线程，返回值同 BackgroundWriter.submit"""
+        if not self.restored:
+            self.restore()
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return result
+        batch, self.buffer = self.buffer, []
+        # 只有 process_item 等待的批次计入等待次数（检查点、定时写入和关闭时不计）
+        return self.writer.submit(self.write, batch, result=result, count=result is not None)
+    
+    def write(self, batch):
+        """在一个事务内写入一批数据（在写入线程中执行）"""
+        rows = {}
+        for row in batch:
+            key = torrent_key(*(row[index] for index in self.key_indexes))
+            rows.setdefault(key, []).append(row)
+        with self.connection:
+            for key, key_rows in rows.items():
+                self.cursor.executemany(self.upserts[key], key_rows)
     
     def process_item(self, item, spider):
         if item is None:
             return None
         adapter = ItemAdapter(item)
         
-        # 插入数据
-        insert_sql = '''
-            INSERT INTO torrents (
-                name, torrent_url, magnet_url, size, seeders, leechers,
-                upload_time, category, duration, description, source_url, crawl_time
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        '''
-        
+        torrent_url = adapter.get('torrent_url', '')
+        magnet_url = adapter.get('magnet_url', '')
+        # 未知的做种数/下载数写入NULL，更新已有行时不覆盖之前抓取到的值
         values = (
             adapter.get('name', ''),
-            adapter.get('torrent_url', ''),
-            adapter.get('magnet_url', ''),
+            torrent_url,
+            magnet_url,
             adapter.get('size', ''),
-            adapter.get('seeders', 0),
-            adapter.get('leechers', 0),
+            adapter.get('seeders'),
+            adapter.get('leechers'),
             adapter.get('upload_time', ''),
             adapter.get('category', ''),
             adapter.get('duration', ''),
             adapter.get('description', ''),
             adapter.get('source_url', ''),
-            adapter.get('crawl_time', '')
+            adapter.get('crawl_time', ''),
+            adapter.get('size_bytes'),
+            adapter.get('upload_ts'),
+            adapter.get('crawl_ts'),
+            torrent_infohash(magnet_url, torrent_url),
+            adapter.get('crawl_ts') or int(time.time()),
+            search_text(adapter.get('name'), adapter.get('category'), adapter.get('description'))
         )
+        self.buffer.append(values)
         
-        self.cursor.execute(insert_sql, values)
-        self.connection.commit()
+        if (len(self.buffer) >= self.batch_size
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            return self.flush(item)
         
         return item
 
 
+class SwarmHistoryPipeline:
+    """做种数/下载数时间序列管道
+
+    有infohash和做种数的项目记录一个观测点（见 history.py）。process_item 只把
+    观测点放入缓冲区；每 batch_size 条或每 flush_interval 秒把一批交给后台写入线程
+    （队列按项目数计，与其他输出管道一样有上限，写入跟不上时 process_item 等待），
+    不阻塞其他管道的写入；close_spider 等待全部写完。
+    """
+    
+    def __init__(self, filename='swarm_history.db', batch_size=1000, flush_interval=5.0,
+                 queue_size=1000, stats=None):
+        self.filename = filename
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.stats = stats
+        self.buffer = []
+        self.flush_task = None
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            filename=settings.get('HISTORY_FILE', 'swarm_history.db'),
+            batch_size=settings.getint('HISTORY_BATCH_SIZE', 1000),
+            flush_interval=settings.getfloat('HISTORY_FLUSH_INTERVAL', 5.0),
+            queue_size=settings.getint('WRITER_QUEUE_SIZE', 1000),
+            stats=crawler.stats,
+        )
+    
+    def open_spider(self, spider):
+        self.history = SwarmHistory(self.filename)
+        self.last_flush = time.monotonic()
+        self.writer = BackgroundWriter('history', max(1, self.queue_size // self.batch_size),
+                                       spider.logger, self.stats)
+        if self.flush_interval > 0:
+            self.flush_task = task.LoopingCall(self.flush_if_due)
+            self.flush_task.start(self.flush_interval, now=False)
+    
+    def close_spider(self, spider):
+        if self.flush_task is not None and self.flush_task.running:
+            self.flush_task.stop()
+        self.flush()
+        return self.writer.close(self.history.close)
+    
+    def flush_if_due(self):
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            return self.flush()
+    
+    def flush(self, result=None):
+        """把缓冲区中的观测点交给写入线程，返回值同 BackgroundWriter.submit"""
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return result
+        batch, self.buffer = self.buffer, []
+        # 只有 process_item 等待的批次计入等待次数（检查点、定时写入和关闭时不计）
+        return self.writer.submit(self.write, batch, result=result, count=result is not None)
+    
+    def write(self, batch):
+        """写入一批观测点（在写入线程中执行）"""
+        points = self.history.record(batch)
+        self.writer.reactor.callFromThread(self.written, points, len(batch))
+    
+    def written(self, points, observations):
+        if self.stats is not None:
+            self.stats.inc_value('history/observations', observations)
+            self.stats.inc_value('history/points_written', points)
+    
+    def process_item(self, item, spider):
+        if item is None:
+            return None
+        adapter = ItemAdapter(item)
+        seeders = adapter.get('seeders')
+        if seeders is None:
+            return item
+        infohash = extract_infohash(adapter.get('magnet_url')) or infohash_from_url(adapter.get('torrent_url'))
+        if infohash:
+            self.buffer.append((infohash, adapter.get('crawl_ts') or int(time.time()),
+                                seeders, adapter.get('leechers')))
+            if len(self.buffer) >= self.batch_size:
+                return self.flush(item)
+        return item
+
+
 class DuplicatesPipeline:
-    """去重管道"""
+    """去重管道
+
+    有磁力链接的项目按规范化的infohash去重（忽略tracker列表和dn的差异），
+    其余项目按链接去重。去重索引保存在磁盘上，跨运行持久有效；backend 为
+    bloom 时在索引前放置固定内存的布隆过滤器。索引只在后台写入线程中使用，
+    process_item 返回在查询并记录去重键之后触发的Deferred。
+    """
     
-    def __init__(self):
-        self.seen_urls = set()
-        self.seen_magnets = set()
+    def __init__(self, backend='sqlite', bloom_options=None, queue_size=1000, stats=None):
+        self.backend = backend
+        self.bloom_options = bloom_options or {}
+        self.queue_size = queue_size
+        self.stats = stats
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        max_mb = settings.getfloat('DEDUP_BLOOM_MAX_MB', 0)
+        return cls(
+            backend=settings.get('DEDUP_BACKEND', 'sqlite'),
+            bloom_options={
+                'capacity': settings.getint('DEDUP_BLOOM_CAPACITY', 10000000),
+                'error_rate': settings.getfloat('DEDUP_BLOOM_ERROR_RATE', 0.001),
+                'max_bytes': int(max_mb * 1024 * 1024) or None,
+            },
+            queue_size=settings.getint('WRITER_QUEUE_SIZE', 1000),
+            stats=crawler.stats,
+        )
+    
+    def open_spider(self, spider):
+        # 从spider设置中获取索引文件名，如果没有则使用默认值
+        filename = getattr(spider, 'dedup_file', 'torrents_dedup.db')
+        options = dict(self.bloom_options) if self.backend == 'bloom' else {}
+        # 可恢复任务：去重键只随任务检查点一起提交
+        self.job = getattr(spider, 'job', None)
+        if self.job:
+            options['commit_interval'] = 0
+        self.index = open_dedup_index(filename, self.backend, **options)
+        self.writer = BackgroundWriter('dedup', self.queue_size, spider.logger, self.stats)
+        if self.job:
+            self.job.set_store(self.index, self.writer)
+    
+    def close_spider(self, spider):
+        # 文件输出管道先于本管道关闭，已记录最终位置；SQLite管道在检查点中写入缓冲区
+        if not self.job:
+            return self.writer.close(self.index.close)
+        saving = self.job.save(final=True)
+        saving.addBoth(self.close_index)
+        return saving
+    
+    def close_index(self, _):
+        self.job.set_store(None)
+        return self.writer.close(self.index.close)
     
     def process_item(self, item, spider):
+        if item is None:
+            return None
         adapter = ItemAdapter(item)
+        checking = self.writer.call(self.check, adapter.get('torrent_url'), adapter.get('magnet_url'))
+        return checking.addCallback(self.checked, item, spider)
+    
+    def check(self, torrent_url, magnet_url):
+        """查询并记录去重键，重复时返回日志消息（在写入线程中执行）"""
+        # 优先按infohash判断重复
+        infohash = extract_infohash(magnet_url)
+        if infohash:
+            if not self.index.add_infohash(infohash):
+                return f"Duplicate infohash found: {infohash.hex()}"
+            if torrent_url:
+                self.index.add_url(torrent_url)
+            return None
         
         # 检查重复的种子URL
-        torrent_url = adapter.get('torrent_url')
-        if torrent_url and torrent_url in self.seen_urls:
-            spider.logger.info(f"Duplicate torrent URL found: {torrent_url}")
-            return None
-        elif torrent_url:
-            self.seen_urls.add(torrent_url)
+        if torrent_url and not self.index.add_url(torrent_url):
+            return f"Duplicate torrent URL found: {torrent_url}"
         
-        # 检查重复的磁力链接
-        magnet_url = adapter.get('magnet_url')
-        if magnet_url and magnet_url in self.seen_magnets:
-            spider.logger.info(f"Duplicate magnet URL found: {magnet_url}")
-            return None
-        elif magnet_url:
-            self.seen_magnets.add(magnet_url)
+        # 检查无法解析infohash的磁力链接
+        if magnet_url and not self.index.add_url(magnet_url):
+            return f"Duplicate magnet URL found: {magnet_url}"
         
+        return None
+    
+    def checked(self, duplicate, item, spider):
+        if duplicate:
+            spider.logger.info(duplicate)
+            return None
         return item
 
 
@@ -198,30 +799,21 @@ class FilterPipeline:
     
     def __init__(self):
         # 默认过滤条件，会被spider配置覆盖
-        self.min_seeders = 0
-        self.blocked_keywords = ['spam', 'fake', 'virus']
+        self.item_filter = ItemFilter()
     
     def open_spider(self, spider):
         """从spider获取过滤配置"""
         if hasattr(spider, 'filter_config'):
-            config = spider.filter_config
-            self.min_seeders = config.get('min_seeders', 0)
-            self.blocked_keywords = config.get('blocked_keywords', ['spam', 'fake', 'virus'])
+            self.item_filter = ItemFilter(spider.filter_config)
     
     def process_item(self, item, spider):
-        adapter = ItemAdapter(item)
-        
-        # 过滤种子数太少的项目
-        seeders = adapter.get('seeders', 0)
-        if isinstance(seeders, int) and seeders < self.min_seeders:
-            spider.logger.info(f"Filtered item with low seeders: {seeders}")
+        if item is None:
             return None
         
-        # 过滤包含屏蔽关键词的项目
-        name = adapter.get('name', '').lower()
-        for keyword in self.blocked_keywords:
-            if keyword in name:
-                spider.logger.info(f"Filtered item with blocked keyword '{keyword}': {name}")
-                return None
+        # 过滤种子数太少或包含屏蔽关键词的项目
+        reason = self.item_filter.reject_reason(ItemAdapter(item))
+        if reason:
+            spider.logger.info(f"Filtered item with {reason}")
+            return None
         
         return item
\ No newline at end of file
@@ -0,0 +1,77 @@
+# 请求优先级评分
+#
+# 列表页已经知道每个种子的做种数、上传时间和分类，据此估算详情页的价值并设为
+# 请求优先级，价值高的种子先抓取；爬取因预算或超时提前结束时，已收集到的也是
+# 最有价值的结果。一个下一页请求能发现整页的候选结果，其优先级取当前页各行的
+# 最高价值（下一页很可能有同样好的结果）减去页深惩罚，列表越靠后越晚抓取。
+#
+# 评分类由 PRIORITY_SCORER 设置指定，可替换为自定义实现（需提供 from_crawler、
+# score_item 和 score_page）。
+
+import math
+import time
+
+from torrent_spider.normalize import parse_timestamp
+
+
+class ExpectedValueScorer:
+    """按列表页信息估算请求价值的默认评分器
+
+    价值 = 做种数权重 * log(1 + 做种数) + 新近度权重 * 0.5 ^ (发布天数 / 半衰期)
+           + 分类权重（分类名包含配置的关键词，不区分大小写）
+    请求优先级 = (价值 - 页深惩罚 * (页码 - 1)) * PRIORITY_SCALE，取整。
+    """
+
+    def __init__(self, seeders_weight=1.0, recency_weight=2.0, recency_half_life_days=30.0,
+                 category_weights=None, depth_penalty=0.5, scale=100, now=None):
+        self.seeders_weight = seeders_weight
+        self.recency_weight = recency_weight
+        self.recency_half_life = recency_half_life_days * 86400
+        self.category_weights = [(keyword.lower(), weight)
+                                 for keyword, weight in (category_weights or {}).items()]
+        self.depth_penalty = depth_penalty
+        self.scale = scale
+        self.now = now
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            seeders_weight=settings.getfloat('PRIORITY_SEEDERS_WEIGHT', 1.0),
+            recency_weight=settings.getfloat('PRIORITY_RECENCY_WEIGHT', 2.0),
+            recency_half_life_days=settings.getfloat('PRIORITY_RECENCY_HALF_LIFE_DAYS', 30.0),
+            category_weights=settings.getdict('PRIORITY_CATEGORY_WEIGHTS'),
+            depth_penalty=settings.getfloat('PRIORITY_DEPTH_PENALTY', 0.5),
+            scale=settings.getint('PRIORITY_SCALE', 100),
+        )
+
+    def value(self, item):
+        """估算item的价值（未知的信息不计分）"""
+        value = 0.0
+        seeders = item.get('seeders')
+        if isinstance(seeders, int) and seeders > 0:
+            value += self.seeders_weight * math.log1p(seeders)
+        if self.recency_weight and self.recency_half_life > 0:
+            now = time.time() if self.now is None else self.now
+            uploaded = parse_timestamp(item.get('upload_time'), now)
+            if uploaded is not None:
+                age = max(now - uploaded, 0)
+                value += self.recency_weight * 0.5 ** (age / self.recency_half_life)
+        category = (item.get('category') or '').lower()
+        if category:
+            for keyword, weight in self.category_weights:
+                if keyword in category:
+                    value += weight
+                    break
+        return value
+
+    def priority(self, value, page):
+        return int(round((value - self.depth_penalty * (page - 1)) * self.scale))
+
+    def score_item(self, item, page=1):
+        """列表页上某一行的详情页请求优先级"""
+        return self.priority(self.value(item), page)
+
+    def score_page(self, items, page):
+        """第 page 页（即将请求的页码）的优先级：上一页各行的最高价值减去页深惩罚"""
+        return self.priority(max((self.value(item) for item in items), default=0.0), page)
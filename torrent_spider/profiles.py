@@ -0,0 +1,120 @@
+# 站点配置与URL路由
+#
+# 每个站点用一个 SiteProfile 声明：匹配域名的正则、按路径分派到列表页/详情页
+# 解析方法的路由表、页面选择器以及元数据提取器。SiteRouter 在爬虫启动时编译
+# 全部配置，并按域名缓存匹配结果，每个响应只需一次字典查找和少量路径正则即可
+# 确定解析方法，与注册的站点数量无关；不匹配任何站点的响应使用通用配置。
+
+import re
+
+from torrent_spider.extractors import RARBG_DETAIL_EXTRACTOR, GENERIC_DETAIL_EXTRACTOR
+
+
+class SiteProfile:
+    """单个站点的声明式配置
+
+    host_pattern 为匹配域名的正则（为空表示通用配置）；routes 为有序的
+    (路径正则, 爬虫方法名) 列表，都不匹配时使用 default_handler；selectors 中
+    的值为CSS选择器字符串或按优先级排列的选择器列表；patterns 为解析方法使用
+    的正则，编译后保存在 regexes 中。
+    """
+
+    def __init__(self, name, host_pattern=None, routes=(), default_handler='parse_generic',
+                 selectors=None, patterns=None, extractor=None):
+        self.name = name
+        self.host_pattern = host_pattern
+        self.routes = list(routes)
+        self.default_handler = default_handler
+        self.selectors = selectors or {}
+        self.patterns = patterns or {}
+        self.extractor = extractor
+        self.host_regex = None
+        self.compiled_routes = None
+        self.regexes = None
+
+    def compile(self):
+        if self.compiled_routes is None:
+            self.host_regex = re.compile(self.host_pattern, re.IGNORECASE) if self.host_pattern else None
+            self.compiled_routes = [(re.compile(pattern), handler) for pattern, handler in self.routes]
+            self.regexes = {key: re.compile(pattern) for key, pattern in self.patterns.items()}
+        return self
+
+    def matches_host(self, hostname):
+        return self.host_regex is not None and self.host_regex.search(hostname) is not None
+
+    def handler_for(self, path):
+        for regex, handler in self.compiled_routes:
+            if regex.search(path):
+                return handler
+        return self.default_handler
+
+
+class SiteRouter:
+    """把响应分派到所属站点配置的解析方法"""
+
+    def __init__(self, profiles, fallback):
+        self.profiles = [profile.compile() for profile in profiles]
+        self.fallback = fallback.compile()
+        self.by_netloc = {}
+
+    def profile_for(self, netloc):
+        """按域名查找站点配置，结果按 netloc 缓存"""
+        profile = self.by_netloc.get(netloc)
+        if profile is None:
+            hostname = netloc.rpartition('@')[2].partition(':')[0].lower()
+            profile = next((p for p in self.profiles if p.matches_host(hostname)), self.fallback)
+            self.by_netloc[netloc] = profile
+        return profile
+
+    def route(self, url):
+        """返回 (站点配置, 爬虫方法名)"""
+        # 绝对URL形如 scheme://netloc/path?query，直接切分，不做完整的URL解析
+        parts = url.split('/', 3)
+        profile = self.profile_for(parts[2] if len(parts) > 2 else '')
+        return profile, profile.handler_for('/' + parts[3] if len(parts) > 3 else '/')
+
+
+RARBG_PROFILE = SiteProfile(
+    'rarbg',
+    # RARBG及其镜像站（rarbg.to、rarbgproxy.org 等）
+    host_pattern=r'rarbg',
+    routes=[
+        (r'/torrent/', 'parse_rarbg_detail'),
+        (r'/search/', 'parse_rarbg_search'),
+    ],
+    selectors={
+        'title': 'h2::text',
+        'page_title': 'title::text',
+        'download_link': 'a[href*="download.php"]::attr(href)',
+        'magnet_link': 'a[href^="magnet:"]::attr(href)',
+        'rows': 'table tr',
+        'row_link': ['td a[href*="/torrent/"]', 'td:nth-child(2) a'],
+        'next_page': ('a[href*="/search/"]:contains("next"), a[href*="/search/"]:contains("下一页"), '
+                      'a[href*="/search/"]:contains(">")'),
+    },
+    extractor=RARBG_DETAIL_EXTRACTOR,
+)
+
+GENERIC_PROFILE = SiteProfile(
+    'generic',
+    # 列表页的链接按以下规则逐个归类（依次判断，每个链接只归入一类）
+    patterns={
+        # 种子文件：.torrent 结尾或包含download的链接
+        'torrent_file': r'\.torrent$|(?i:download)',
+        # 下一页：href包含page且链接文字为“Next/下一页”，或 class="next"、rel="next"
+        'next_page_href': r'page',
+        'next_page_text': r'Next|下一页',
+        # 详情页
+        'detail_link': r'details|view|torrent/',
+    },
+    selectors={
+        'detail_torrent_links': 'a[href$=".torrent"], a[href*="download"]',
+        'detail_magnet_links': 'a[href^="magnet:"]',
+        'title': ['h1::text', '.title::text', '#title::text', 'title::text'],
+        'description': ['.description::text', '#description::text', '.content::text'],
+    },
+    extractor=GENERIC_DETAIL_EXTRACTOR,
+)
+
+# 按顺序匹配域名，新增站点时在此注册
+SITE_PROFILES = [RARBG_PROFILE]
@@ -0,0 +1,284 @@
+# 全文搜索
+#
+# torrents 表的 search_text 列保存名称、分类和描述经过分词预处理的文本，FTS5虚拟表
+# torrents_fts 以 torrents 为外部内容表对该列建立索引，由触发器保持同步。
+#
+# FTS5内置的 unicode61 分词器按空白和标点切分，中日韩文字没有分隔符，一整段会成为
+# 一个词，搜索其中的词语无法命中。这里把连续的中日韩文字切分为重叠的二元组
+# （"中国电影" -> "中国 国电 电影"），查询时用同样的方式切分并作为短语匹配，
+# 因此任意两个字以上的词语都能命中；单个字按前缀匹配。拉丁字母、数字等仍交给
+# unicode61 处理（忽略大小写和变音符号）。
+
+import re
+import math
+import sqlite3
+
+from torrent_spider.normalize import parse_size
+
+# 中日韩统一表意文字（含扩展A和兼容表意文字）、平假名、片假名和韩文音节
+CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+# 查询中的词：带引号的短语，或不含空白的片段
+QUERY_TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+# unicode61 作为词的一部分的字符：字母和数字（下划线等其余字符都是分隔符）
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+FTS_TABLE_SQL = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS torrents_fts USING fts5(
+        search_text, content='torrents', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+'''
+
+# 外部内容表的同步触发器；UPSERT 没有改变 search_text 时不重写索引
+FTS_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS torrents_fts_insert AFTER INSERT ON torrents BEGIN
+        INSERT INTO torrents_fts (rowid, search_text) VALUES (new.id, new.search_text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS torrents_fts_delete AFTER DELETE ON torrents BEGIN
+        INSERT INTO torrents_fts (torrents_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS torrents_fts_update AFTER UPDATE OF search_text ON torrents
+    WHEN old.search_text IS NOT new.search_text BEGIN
+        INSERT INTO torrents_fts (torrents_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        INSERT INTO torrents_fts (rowid, search_text) VALUES (new.id, new.search_text);
+    END''',
+)
+
+# 按字段排序时使用的列（降序，空值在最后）
+SORT_COLUMNS = {'seeders': 'seeders', 'size': 'size_bytes', 'newest': 'upload_ts'}
+# 并列时按id排序，降序排列的字段与索引的扫描方向一致
+ORDERS = {'rank': 'rank, t.id'}
+ORDERS.update((order, f't.{column} DESC, t.id DESC') for order, column in SORT_COLUMNS.items())
+RESULT_COLUMNS = ('t.id, t.name, t.category, t.size, t.size_bytes, t.seeders, t.leechers, t.upload_time, '
+                  't.upload_ts, t.infohash, t.magnet_url, t.torrent_url, t.source_url, t.last_seen')
+# 按相关度排序需要为每个命中行计算BM25（每行约数微秒），命中超过 RANK_MATCHES 条时
+# 相关度区分也不大，改为按做种数排序
+RANK_MATCHES = 5000
+# 按字段排序需要读取全部命中行（每行约1微秒）；沿排序字段的索引逐行检查是否命中，
+# 取够 limit 条即停止，约需检查 总行数 * limit / 命中数 行，每次检查是一次全文查询，
+# 耗时约为读取一行的 PROBE_COST 倍。命中数超过两者相当的 sqrt(总行数 * limit * PROBE_COST)
+# 时改为逐行检查
+PROBE_COST = 40
+# 前缀查询展开为索引中实际存在的词（OR），超过这个数量时仍按前缀匹配
+PREFIX_TERMS = 64
+# FTS5表达式本身有误时SQLite报告的错误（数据库被锁定等其他 OperationalError 不属于此类）
+MATCH_ERROR_PREFIXES = ('fts5:', 'unterminated string', 'no such column', 'unknown special query')
+
+
+def segment(text):
+    """把文本中连续的中日韩文字替换为以空格分隔的二元组，其余部分不变"""
+    if not text:
+        return ''
+
+    def bigrams(match):
+        run = match.group(0)
+        if len(run) == 1:
+            return f' {run} '
+        return ' ' + ' '.join(run[i:i + 2] for i in range(len(run) - 1)) + ' '
+
+    return CJK_PATTERN.sub(bigrams, text)
+
+
+def search_text(name, category=None, description=None):
+    """写入 search_text 列的文本：名称、分类和描述分词预处理后以换行连接"""
+    return '\n'.join(segment(value) for value in (name, category, description) if value)
+
+
+def fts5_available(connection):
+    return any('ENABLE_FTS5' in option for (option,) in connection.execute('PRAGMA compile_options'))
+
+
+def ensure_search_index(connection):
+    """创建 torrents_fts 和同步触发器，为缺少 search_text 的行补齐并重建索引
+
+    SQLite没有编译FTS5时返回False（搜索不可用，写入不受影响）。调用方负责提交。
+    """
+    if not fts5_available(connection):
+        return False
+    created = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'torrents_fts'").fetchone() is None
+    missing = connection.execute(
+        'SELECT 1 FROM torrents WHERE search_text IS NULL LIMIT 1').fetchone() is not None
+    if missing:
+        connection.create_function('search_text', 3, search_text, deterministic=True)
+        connection.execute('UPDATE torrents SET search_text = search_text(name, category, description) '
+                           'WHERE search_text IS NULL')
+    connection.execute(FTS_TABLE_SQL)
+    for trigger in FTS_TRIGGERS:
+        connection.execute(trigger)
+    if created or missing:
+        connection.execute("INSERT INTO torrents_fts (torrents_fts) VALUES ('rebuild')")
+    return True
+
+
+def match_expression(query, expand=None):
+    """把用户输入的查询转换为FTS5表达式
+
+    各个词之间为AND；带引号的部分和中日韩文字作为短语匹配；以 * 结尾的词按前缀匹配；
+    以 - 开头的词排除。返回None表示查询中没有可搜索的词。expand(前缀) 返回以该前缀
+    开头的词列表时，单个词的前缀匹配改写为这些词的OR（返回None则保留前缀匹配）。
+    """
+    included, excluded = [], []
+    for match in QUERY_TERM_PATTERN.finditer(query or ''):
+        quoted = match.group(1) is not None
+        term = match.group(1) if quoted else match.group(2)
+        negate = not quoted and term.startswith('-') and len(term) > 1
+        if negate:
+            term = term[1:]
+        prefix = term.endswith('*')
+        term_phrases = phrases(term.rstrip('*'), quoted)
+        for index, (tokens, single_cjk) in enumerate(term_phrases):
+            expression = '"' + ' '.join(tokens) + '"'
+            if single_cjk or (prefix and index == len(term_phrases) - 1):
+                terms = expand(tokens[0]) if expand and len(tokens) == 1 else None
+                if terms:
+                    expression = '(' + ' OR '.join(f'"{term}"' for term in terms) + ')'
+                else:
+                    expression += ' *'
+            (excluded if negate else included).append(expression)
+    if not included:
+        return None
+    return ' AND '.join(included) + ''.join(f' NOT {expression}' for expression in excluded)
+
+
+def phrases(term, quoted=False):
+    """查询词切分后的短语 [(词列表, 是否为单个中日韩字)]
+
+    带引号的部分整体作为一个短语；否则中日韩文字与其余字符分开，各自成为短语
+    （"ubuntu中文版" -> "ubuntu" 和 "中文 文版"）。
+    """
+    if quoted:
+        tokens = WORD_PATTERN.findall(segment(term))
+        return [(tokens, False)] if tokens else []
+    result = []
+    position = 0
+    for match in CJK_PATTERN.finditer(term):
+        words = WORD_PATTERN.findall(term[position:match.start()])
+        if words:
+            result.append((words, False))
+        run = match.group(0)
+        if len(run) == 1:
+            result.append(([run], True))
+        else:
+            result.append(([run[i:i + 2] for i in range(len(run) - 1)], False))
+        position = match.end()
+    words = WORD_PATTERN.findall(term[position:])
+    if words:
+        result.append((words, False))
+    return result
+
+
+def prefix_terms(connection, prefix):
+    """索引中以 prefix 开头的词，超过 PREFIX_TERMS 个时返回None"""
+    prefix = prefix.lower()
+    # 词按UTF-8字节排序，与码位顺序一致
+    terms = [term for (term,) in connection.execute(
+        'SELECT term FROM temp.torrents_fts_vocab WHERE term >= ? AND term < ? LIMIT ?',
+        (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1), PREFIX_TERMS + 1))]
+    return terms if len(terms) <= PREFIX_TERMS else None
+
+
+def execute_match(connection, sql, values):
+    """执行含 MATCH 的查询，表达式有误时抛出ValueError"""
+    try:
+        return connection.execute(sql, values)
+    except sqlite3.OperationalError as e:
+        if str(e).startswith(MATCH_ERROR_PREFIXES):
+            raise ValueError(f'无效的查询: {e}') from e
+        raise
+
+
+def search_torrents(connection, query, min_seeders=None, min_size=None, max_size=None, category=None,
+                    order='rank', limit=20, offset=0, after=None):
+    """全文搜索，返回字典列表（按相关度或 order 指定的字段排序）
+
+    min_size / max_size 可以是字节数或 "1.5 GB" 这样的文本；category 按前缀匹配。
+    命中超过 RANK_MATCHES 条时不按相关度而按做种数排序，结果中的 rank 为None。
+    after 为上一页最后一条结果的 cursor_key，从其后继续（键集分页，代替 offset）。
+    """
+    if order not in ORDERS:
+        raise ValueError(f'未知的排序方式: {order}')
+    # 词表建在临时库中，只读连接也可以使用
+    connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.torrents_fts_vocab "
+                       "USING fts5vocab(main, torrents_fts, 'row')")
+    expression = match_expression(query, lambda prefix: prefix_terms(connection, prefix))
+    if expression is None:
+        return []
+    conditions = []
+    params = []
+    if min_seeders:
+        conditions.append('t.seeders >= ?')
+        params.append(int(min_seeders))
+    for value, operator in ((min_size, '>='), (max_size, '<=')):
+        if value:
+            size = parse_size(value) if isinstance(value, str) else int(value)
+            if size is None:
+                raise ValueError(f'无法识别的大小: {value}')
+            conditions.append(f't.size_bytes {operator} ?')
+            params.append(size)
+    if category:
+        conditions.append("t.category LIKE ? ESCAPE '\\'")
+        params.append(category.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+    limit, offset = int(limit), 0 if after is not None else int(offset)
+    total = connection.execute('SELECT MAX(id) FROM torrents').fetchone()[0] or 0
+    common = math.isqrt(total * (limit + offset) * PROBE_COST) + 1
+    matches = execute_match(connection, 'SELECT COUNT(*) FROM (SELECT 1 FROM torrents_fts '
+                            'WHERE torrents_fts MATCH ? LIMIT ?)', (expression, common)).fetchone()[0]
+    if after is not None:
+        # 沿用第一页实际的排序方式
+        order = after[0]
+        if order not in ORDERS:
+            raise ValueError(f'无效的分页位置: {after!r}')
+    elif order == 'rank' and matches >= RANK_MATCHES:
+        order = 'seeders'
+
+    def fetch(extra, extra_params, count):
+        if matches < common or order == 'rank':
+            sql = (f"SELECT {RESULT_COLUMNS}, {'rank' if order == 'rank' else 'NULL AS rank'} "
+                   'FROM torrents_fts JOIN torrents AS t ON t.id = torrents_fts.rowid '
+                   f"WHERE {' AND '.join(['torrents_fts MATCH ?'] + conditions + extra)} "
+                   f'ORDER BY {ORDERS[order]} LIMIT ? OFFSET ?')
+            values = [expression] + params + extra_params
+        else:
+            if '*' in expression:
+                # 前缀查询每次执行都要先合并所有匹配词的列表，不能逐行检查，一次性取出命中的id
+                # （前缀没有展开为具体的词时才会出现）
+                probe = 't.id IN (SELECT rowid FROM torrents_fts WHERE torrents_fts MATCH ?)'
+            else:
+                probe = 'EXISTS (SELECT 1 FROM torrents_fts WHERE torrents_fts MATCH ? AND rowid = t.id)'
+            sql = (f"SELECT {RESULT_COLUMNS}, NULL AS rank FROM torrents AS t "
+                   f"WHERE {' AND '.join(conditions + extra + [probe])} "
+                   f'ORDER BY {ORDERS[order]} LIMIT ? OFFSET ?')
+            values = params + extra_params + [expression]
+        cursor = execute_match(connection, sql, values + [count, offset])
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    if after is None:
+        return fetch([], [], limit)
+    _, value, last_id = after
+    if order == 'rank':
+        return fetch(['(rank, t.id) > (?, ?)'], [value, last_id], limit)
+    column = f't.{SORT_COLUMNS[order]}'
+    if value is None:
+        return fetch([f'{column} IS NULL AND t.id < ?'], [last_id], limit)
+    # 行值比较可以使用索引范围，但不包含空值；排序值为空的行排在最后，不足一页时再取
+    rows = fetch([f'({column}, t.id) < (?, ?)'], [value, last_id], limit)
+    if len(rows) < limit:
+        rows += fetch([f'{column} IS NULL'], [], limit - len(rows))
+    return rows
+
+
+def cursor_key(row, order='rank'):
+    """结果行的分页位置 (实际排序方式, 排序值, id)，作为下一页的 after 传入
+
+    按相关度排序但 rank 为None（命中过多，实际按做种数排序）时返回按做种数的位置。
+    """
+    if order == 'rank' and row['rank'] is None:
+        order = 'seeders'
+    return (order, row['rank' if order == 'rank' else SORT_COLUMNS[order]], row['id'])
+
+
+def open_readonly(filename):
+    """以只读方式打开输出数据库"""
+    return sqlite3.connect(f'file:{filename}?mode=ro', uri=True)
@@ -0,0 +1,281 @@
+# 只读HTTP查询服务
+#
+# 在管道写入的SQLite输出上提供全文搜索、按infohash查找和按做种数排行。数据库以
+# 只读方式打开，连接放在固定大小的连接池中由各请求线程借用；响应按请求路径和参数
+# 缓存在LRU中，爬虫（或其他进程）提交新数据后缓存整体失效：PRAGMA data_version
+# 在其他连接提交后会变化，每个请求检查一次，开销可以忽略。
+#
+# 分页使用键集游标：响应中的 next_cursor 编码了最后一条结果的排序值和id，下一页
+# 从该位置之后继续，翻到很深的页时也不需要跳过前面的行。
+
+import json
+import queue
+import base64
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from torrent_spider.dedup import normalize_infohash
+from torrent_spider.pipelines import TORRENT_COLUMNS
+from torrent_spider.search import ORDERS, cursor_key, search_torrents
+
+logger = logging.getLogger(__name__)
+
+# 按infohash查找时返回的列（不含内部使用的 search_text）
+DETAIL_COLUMNS = ('id',) + tuple(column for column in TORRENT_COLUMNS if column != 'search_text')
+TOP_COLUMNS = ('id, name, category, size, size_bytes, seeders, leechers, upload_time, upload_ts, '
+               'infohash, magnet_url, torrent_url, source_url, last_seen')
+
+
+class ConnectionPool:
+    """固定数量的只读连接，请求线程用 connection() 借用，用完归还"""
+
+    def __init__(self, filename, size=4, timeout=30.0):
+        self.filename = filename
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        for _ in range(size):
+            self.idle.put(None)
+
+    def open(self):
+        connection = sqlite3.connect(f'file:{self.filename}?mode=ro', uri=True,
+                                     timeout=self.timeout, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    @contextmanager
+    def connection(self):
+        # 连接在第一次借用时才打开
+        connection = self.idle.get(timeout=self.timeout)
+        try:
+            if connection is None:
+                connection = self.open()
+            yield connection
+        except sqlite3.DatabaseError:
+            # 出错的连接不再复用
+            if connection is not None:
+                connection.close()
+                connection = None
+            raise
+        finally:
+            self.idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                connection = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            if connection is not None:
+                connection.close()
+
+
+class ResponseCache:
+    """LRU响应缓存，数据库有新的提交时整体失效"""
+
+    def __init__(self, filename, capacity=1024):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.version = None
+        self.hits = self.misses = 0
+        # 只用于读取 data_version 的连接，访问由 lock 保护
+        self.watcher = sqlite3.connect(f'file:{filename}?mode=ro', uri=True, check_same_thread=False)
+
+    def check(self):
+        """其他连接提交过新数据时清空缓存（调用方持有 lock）"""
+        version = self.watcher.execute('PRAGMA data_version').fetchone()[0]
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+
+    def get(self, key):
+        with self.lock:
+            self.check()
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None, self.version
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value, self.version
+
+    def put(self, key, value, version):
+        """保存响应；version 是查询前 get 返回的版本，期间有新的提交时不保存"""
+        if not self.capacity:
+            return
+        with self.lock:
+            self.check()
+            if version != self.version:
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def close(self):
+        self.watcher.close()
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析 next_cursor 为 (排序方式, 排序值, id)，格式不对时抛出ValueError"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError(f'无效的游标: {cursor}')
+    # 排序值和id会直接作为SQL参数，类型不对时SQLite报错，应作为请求错误而不是查询失败
+    if (not isinstance(key, list) or len(key) != 3 or key[0] not in ORDERS
+            or not (key[1] is None or type(key[1]) in (int, float)) or type(key[2]) is not int):
+        raise ValueError(f'无效的游标: {cursor}')
+    return tuple(key)
+
+
+class QueryService:
+    """HTTP服务的查询实现：参数为查询字符串解析后的字典，返回可序列化为JSON的结果"""
+
+    def __init__(self, filename, pool_size=4, cache_size=1024, max_limit=100):
+        self.filename = filename
+        self.max_limit = max_limit
+        self.pool = ConnectionPool(filename, pool_size)
+        self.cache = ResponseCache(filename, cache_size)
+
+    def limit(self, params, default=20):
+        limit = int(params.get('limit', default))
+        if not 1 <= limit <= self.max_limit:
+            raise ValueError(f'limit 应在 1 到 {self.max_limit} 之间')
+        return limit
+
+    def search(self, params):
+        query = params.get('q', '').strip()
+        if not query:
+            raise ValueError('缺少查询参数 q')
+        limit = self.limit(params)
+        order = params.get('sort', 'rank')
+        after = decode_cursor(params['cursor']) if params.get('cursor') else None
+        with self.pool.connection() as connection:
+            rows = search_torrents(connection, query, min_seeders=params.get('min_seeders'),
+                                   min_size=params.get('min_size'), max_size=params.get('max_size'),
+                                   category=params.get('category'), order=order, limit=limit, after=after)
+        results = [dict(row) for row in rows]
+        # 后续页沿用游标中的排序方式（与 sort 参数不同时以游标为准）
+        if after is not None:
+            order = after[0]
+        next_cursor = encode_cursor(cursor_key(results[-1], order)) if len(results) == limit else None
+        return {'results': results, 'next_cursor': next_cursor}
+
+    def lookup(self, infohash):
+        digest = normalize_infohash(infohash)
+        if digest is None:
+            raise ValueError(f'无效的infohash: {infohash}')
+        with self.pool.connection() as connection:
+            row = connection.execute(f"SELECT {', '.join(DETAIL_COLUMNS)} FROM torrents WHERE infohash = ?",
+                                     (digest.hex(),)).fetchone()
+        return dict(row) if row is not None else None
+
+    def top(self, params):
+        """做种数最多的种子（可按分类），按 (seeders, id) 降序的键集分页"""
+        limit = self.limit(params)
+        conditions = ['seeders IS NOT NULL']
+        values = []
+        if params.get('category'):
+            conditions.append('category = ?')
+            values.append(params['category'])
+        if params.get('cursor'):
+            order, seeders, last_id = decode_cursor(params['cursor'])
+            if order != 'seeders' or not isinstance(seeders, int):
+                raise ValueError(f"无效的游标: {params['cursor']}")
+            conditions.append('(seeders, id) < (?, ?)')
+            values += [seeders, last_id]
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                f"SELECT {TOP_COLUMNS} FROM torrents WHERE {' AND '.join(conditions)} "
+                'ORDER BY seeders DESC, id DESC LIMIT ?', values + [limit]).fetchall()
+        results = [dict(row) for row in rows]
+        next_cursor = (encode_cursor(('seeders', results[-1]['seeders'], results[-1]['id']))
+                       if len(results) == limit else None)
+        return {'results': results, 'next_cursor': next_cursor}
+
+    def close(self):
+        self.pool.close()
+        self.cache.close()
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """GET /search、/torrents/<infohash>、/top 返回JSON；响应头 X-Cache 表示是否命中缓存"""
+
+    # 保持连接，客户端可以复用同一个TCP连接；响应头和正文分两次写出，关闭Nagle算法
+    # 以免第二次写出等待对方的延迟确认（约40ms）
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server_version = 'TorrentSpider'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        service = self.server.service
+        key = (url.path, tuple(sorted(params.items())))
+        body, version = service.cache.get(key)
+        if body is not None:
+            self.respond(200, body, 'HIT')
+            return
+        try:
+            if url.path == '/search':
+                result = service.search(params)
+            elif url.path == '/top':
+                result = service.top(params)
+            elif url.path.startswith('/torrents/'):
+                result = service.lookup(unquote(url.path[len('/torrents/'):]))
+                if result is None:
+                    self.respond(404, error_body('未找到该种子'))
+                    return
+            else:
+                self.respond(404, error_body(f'未知的路径: {url.path}'))
+                return
+        except ValueError as e:
+            self.respond(400, error_body(str(e)))
+            return
+        except (sqlite3.Error, queue.Empty) as e:
+            logger.error(f"查询失败 {self.path}: {e}")
+            self.respond(503, error_body(f'查询失败: {e}'))
+            return
+        body = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        service.cache.put(key, body, version)
+        self.respond(200, body, 'MISS')
+
+    def respond(self, status, body, cache=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if cache:
+            self.send_header('X-Cache', cache)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def error_body(message):
+    return json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+
+
+class QueryServer(ThreadingHTTPServer):
+    """每个请求一个线程；调用 serve_forever 开始处理请求，结束后调用 server_close"""
+
+    daemon_threads = True
+
+    def __init__(self, filename, host='127.0.0.1', port=8080, pool_size=4, cache_size=1024, max_limit=100):
+        self.service = QueryService(filename, pool_size, cache_size, max_limit)
+        super().__init__((host, port), QueryRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.service.close()
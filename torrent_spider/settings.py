@@ -20,7 +20,8 @@ ROBOTSTXT_OBEY = False
 # See also autothrottle settings and docs
 DOWNLOAD_DELAY = 1
 # The download delay setting will honor only one of:
-#CONCURRENT_REQUESTS_PER_DOMAIN = 16
+# (with adaptive concurrency enabled this is the starting value per domain)
+CONCURRENT_REQUESTS_PER_DOMAIN = 1
 #CONCURRENT_REQUESTS_PER_IP = 16
 
 # Disable cookies (enabled by default)
@@ -38,15 +39,26 @@ DEFAULT_REQUEST_HEADERS = {
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    'torrent_spider.middlewares.TorrentSpiderSpiderMiddleware': 543,
-#}
+SPIDER_MIDDLEWARES = {
+    'torrent_spider.middlewares.CrawlBudgetMiddleware': 543,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    'torrent_spider.middlewares.TorrentSpiderDownloaderMiddleware': 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    'torrent_spider.incremental.IncrementalMiddleware': 560,
+    'torrent_spider.middlewares.AdaptiveConcurrencyMiddleware': 900,
+}
+
+# Per-domain adaptive concurrency (see AdaptiveConcurrencyMiddleware)
+# Concurrency grows by one per healthy round and halves on 429/503; each domain
+# stays within its own min/max (parent domains match subdomains)
+ADAPTIVE_CONCURRENCY_ENABLED = True
+ADAPTIVE_CONCURRENCY_TARGET_LATENCY = 2.0
+ADAPTIVE_CONCURRENCY_ERROR_THRESHOLD = 0.2
+ADAPTIVE_CONCURRENCY_MAX_DELAY = 60.0
+ADAPTIVE_CONCURRENCY_DEFAULT = {'min': 1, 'max': 4}
+ADAPTIVE_CONCURRENCY_DOMAINS = {}
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -60,9 +72,106 @@ ITEM_PIPELINES = {
    'torrent_spider.pipelines.TorrentSpiderPipeline': 300,
 }
 
+# Search pages (parse_rarbg_search): in list-only mode items are emitted from the
+# table rows; the detail page is fetched only when the row has no magnet link and
+# one of SEARCH_DETAIL_FIELDS (e.g. 'magnet_url', 'duration') is missing
+SEARCH_LIST_ONLY = False
+SEARCH_DETAIL_FIELDS = []
+
+# Request priority from list-page information (see torrent_spider/priority.py)
+# Detail requests are scored from seeders, upload_time recency and category;
+# next-page requests get the best value on the current page minus
+# PRIORITY_DEPTH_PENALTY per page of depth. Higher priority is fetched first
+PRIORITY_ENABLED = True
+PRIORITY_SCORER = 'torrent_spider.priority.ExpectedValueScorer'
+PRIORITY_SEEDERS_WEIGHT = 1.0
+PRIORITY_RECENCY_WEIGHT = 2.0
+PRIORITY_RECENCY_HALF_LIFE_DAYS = 30.0
+# Category keyword -> bonus, e.g. {'movies': 1.0, 'xxx': -5.0}
+PRIORITY_CATEGORY_WEIGHTS = {}
+PRIORITY_DEPTH_PENALTY = 0.5
+PRIORITY_SCALE = 100
+
+# SQLite pipeline: buffered writes and connection pragmas
+# Items are written with executemany in one transaction every SQLITE_BATCH_SIZE
+# items or SQLITE_FLUSH_INTERVAL seconds (set SQLITE_BATCH_SIZE = 1 to commit per item)
+SQLITE_BATCH_SIZE = 500
+SQLITE_FLUSH_INTERVAL = 5.0
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_SYNCHRONOUS = 'NORMAL'
+# Negative values are in KiB (-20000 = ~20MB page cache)
+SQLITE_CACHE_SIZE = -20000
+
+# JSON Lines pipeline: gzip compression and flush policy
+# Buffered lines are flushed every JSONL_FLUSH_ITEMS items or JSONL_FLUSH_INTERVAL seconds
+JSONL_GZIP = False
+JSONL_FLUSH_ITEMS = 100
+JSONL_FLUSH_INTERVAL = 5.0
+JSONL_BUFFER_SIZE = 65536
+
+# Output writers: the JSON, JSON Lines, CSV, SQLite, swarm history and dedup pipelines
+# hand disk work to a dedicated thread through a bounded queue of WRITER_QUEUE_SIZE
+# items (the SQLite and history queues hold WRITER_QUEUE_SIZE / batch size batches).
+# When a queue is full process_item waits for space, which slows the scraper down
+# to the disk's pace
+WRITER_QUEUE_SIZE = 1000
+
+# Dedup backend: 'sqlite' (exact on-disk index) or 'bloom' (fixed-memory Bloom
+# filter in front of the on-disk index; positive hits are confirmed exactly)
+DEDUP_BACKEND = 'sqlite'
+DEDUP_BLOOM_CAPACITY = 10000000
+DEDUP_BLOOM_ERROR_RATE = 0.001
+# Upper bound for the filter's bit array in MB (0 = sized from capacity/error rate)
+DEDUP_BLOOM_MAX_MB = 0
+
+# Incremental crawling (enabled with app.py --incremental)
+# List pages are requested with the ETag/Last-Modified validators stored in
+# INCREMENTAL_FILE (304 responses are skipped), and pagination of a source stops
+# at the first list page whose torrents have all been seen in earlier runs
+INCREMENTAL_ENABLED = False
+INCREMENTAL_FILE = 'incremental.db'
+
+# Swarm history (enabled with app.py --track-history, which adds SwarmHistoryPipeline)
+# Seeder/leecher observations are buffered and written to HISTORY_FILE from a
+# writer thread every HISTORY_BATCH_SIZE items or HISTORY_FLUSH_INTERVAL seconds
+HISTORY_FILE = 'swarm_history.db'
+HISTORY_BATCH_SIZE = 1000
+HISTORY_FLUSH_INTERVAL = 5.0
+
+# Shared crawl frontier (enabled with app.py --frontier PATH, which sets
+# SCHEDULER = 'torrent_spider.frontier.FrontierScheduler')
+# Leased requests not acknowledged within FRONTIER_LEASE_SECONDS are handed to
+# another process; requests leased FRONTIER_MAX_ATTEMPTS times are given up
+FRONTIER_FILE = 'frontier.db'
+FRONTIER_LEASE_SECONDS = 300
+FRONTIER_MAX_ATTEMPTS = 3
+
+# Resumable jobs (enabled with app.py --resume JOB_ID, which sets JOB_ID/JOB_DIR)
+# Every JOB_CHECKPOINT_INTERVAL seconds, once in-flight responses are processed,
+# output file positions are committed together with the dedup index (from the
+# writer threads, without blocking the crawl); requests finished before the
+# checkpoint are acknowledged only after it is committed.
+# Keep the interval well below FRONTIER_LEASE_SECONDS
+JOB_ID = None
+JOB_DIR = None
+JOB_CHECKPOINT_INTERVAL = 30
+
+# Per-source crawl budget (see CrawlBudgetMiddleware); a source is the start URL
+# a request descends from. Once a source has used CRAWL_BUDGET_MAX_REQUESTS
+# scheduled requests, CRAWL_BUDGET_MAX_BYTES downloaded bytes or
+# CRAWL_BUDGET_MAX_SECONDS wall time (0 = unlimited) its new requests are dropped
+# ('stop') or lowered by CRAWL_BUDGET_PRIORITY_STEP ('deprioritize')
+CRAWL_BUDGET_MAX_REQUESTS = 0
+CRAWL_BUDGET_MAX_BYTES = 0
+CRAWL_BUDGET_MAX_SECONDS = 0
+CRAWL_BUDGET_ACTION = 'stop'
+CRAWL_BUDGET_PRIORITY_STEP = 100
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-AUTOTHROTTLE_ENABLED = True
+# AdaptiveConcurrencyMiddleware sets the slot delays itself and AutoThrottle would
+# overwrite them, so it is only enabled by app.py when adaptive concurrency is off
+AUTOTHROTTLE_ENABLED = False
 # The initial download delay
 AUTOTHROTTLE_START_DELAY = 1
 # The maximum download delay to be set in case of high latencies
@@ -1,8 +1,14 @@
 import scrapy
 import re
+from scrapy.utils.misc import load_object
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
-from torrent_spider.items import TorrentItem
+from torrent_spider.items import TorrentRecord, SearchRow, search_row, row_record
+from torrent_spider.profiles import SiteRouter, SITE_PROFILES, RARBG_PROFILE, GENERIC_PROFILE
+from torrent_spider.dedup import extract_infohash, pair_release_links, url_key
+from torrent_spider.incremental import IncrementalState, link_key
+from torrent_spider.jobs import JobState
+from torrent_spider.filters import ItemFilter, DEFAULT_BLOCKED_KEYWORDS
 
 
 class TorrentSpider(scrapy.Spider):
@@ -14,14 +20,26 @@ class TorrentSpider(scrapy.Spider):
         # 'https://example-torrent-site.com',  # 请替换为实际的种子网站
     ]
     
+    # 延迟和并发由项目设置/命令行参数决定，并由 AdaptiveConcurrencyMiddleware 按域名调整
     custom_settings = {
-        'DOWNLOAD_DELAY': 2,
         'RANDOMIZE_DOWNLOAD_DELAY': True,
-        'CONCURRENT_REQUESTS': 1,
-        'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
     }
     
-    def __init__(self, urls=None, json_file=None, csv_file=None, sqlite_file=None, filter_config=None, *args, **kwargs):
+    # 搜索页仅列表模式：直接用表格行生成item，只在行中缺少 detail_fields 中的字段时才请求详情页
+    list_only = False
+    detail_fields = []
+    
+    # 请求优先级评分器（PRIORITY_SCORER），为None时所有请求使用默认优先级
+    scorer = None
+    
+    # 增量爬取状态（INCREMENTAL_ENABLED），为None时每次都完整爬取
+    incremental_state = None
+    
+    # 可恢复任务的检查点协调器（JOB_ID），为None时不做检查点
+    job = None
+    
+    def __init__(self, urls=None, json_file=None, csv_file=None, sqlite_file=None, filter_config=None,
+                 jsonl_file=None, dedup_file=None, *args, **kwargs):
         super(TorrentSpider, self).__init__(*args, **kwargs)
         if urls:
             # 支持通过命令行参数传入URL
@@ -30,13 +48,20 @@ class TorrentSpider(scrapy.Spider):
         # 自动设置allowed_domains
         self.allowed_domains = [urlparse(url).netloc for url in self.start_urls]
         
+        # 编译站点配置，按URL把响应分派到对应站点的解析方法
+        self.router = SiteRouter(SITE_PROFILES, GENERIC_PROFILE)
+        
         # 设置输出文件名
         if json_file:
             self.json_file = json_file
+        if jsonl_file:
+            self.jsonl_file = jsonl_file
         if csv_file:
             self.csv_file = csv_file
         if sqlite_file:
             self.sqlite_file = sqlite_file
+        if dedup_file:
+            self.dedup_file = dedup_file
         
         # 设置过滤配置
         if filter_config:
@@ -44,9 +69,37 @@ class TorrentSpider(scrapy.Spider):
         else:
             self.filter_config = {
                 'min_seeders': 0,
-                'blocked_keywords': ['spam', 'fake', 'virus'],
+                'blocked_keywords': DEFAULT_BLOCKED_KEYWORDS,
                 'max_pages': 10
             }
+        # 与 FilterPipeline 相同的过滤规则，在列表页提前应用
+        self.item_filter = ItemFilter(self.filter_config)
+    
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(TorrentSpider, cls).from_crawler(crawler, *args, **kwargs)
+        spider.list_only = crawler.settings.getbool('SEARCH_LIST_ONLY')
+        spider.detail_fields = crawler.settings.getlist('SEARCH_DETAIL_FIELDS')
+        if crawler.settings.getbool('PRIORITY_ENABLED'):
+            spider.scorer = load_object(crawler.settings['PRIORITY_SCORER']).from_crawler(crawler)
+        if crawler.settings.get('JOB_ID'):
+            spider.job = JobState.from_crawler(crawler)
+        if crawler.settings.getbool('INCREMENTAL_ENABLED'):
+            # 可恢复任务中增量状态只在检查点之后提交，恢复时未提交的种子会重新抓取
+            spider.incremental_state = IncrementalState(crawler.settings['INCREMENTAL_FILE'],
+                                                        commit_interval=0 if spider.job else 500)
+            if spider.job:
+                spider.job.on_commit(spider.incremental_state.snapshot)
+        return spider
+    
+    def closed(self, reason):
+        if self.incremental_state is not None:
+            self.incremental_state.close()
+    
+    async def start(self):
+        """Scrapy 2.13+ 的起始请求入口，复用 start_requests 以带上 source_url"""
+        for request in self.start_requests():
+            yield request
     
     def start_requests(self):
         """生成初始请求"""
@@ -54,78 +107,140 @@ class TorrentSpider(scrapy.Spider):
             yield scrapy.Request(
                 url=url,
                 callback=self.parse,
-                meta={'source_url': url}
+                meta={'source_url': url, 'page': 1, 'list_page': True}
             )
     
     def parse(self, response):
-        """解析主页面，查找种子链接"""
+        """按站点配置把响应分派到对应的解析方法"""
+        profile, handler = self.router.route(response.url)
+        yield from getattr(self, handler)(response, profile)
+    
+    def parse_generic(self, response, profile=GENERIC_PROFILE):
+        """通用解析：单次遍历页面中的链接，每个链接归类为磁力链接、种子文件、下一页或详情页"""
         source_url = response.meta.get('source_url', response.url)
-        
-        # 检查是否是RARBG种子详情页
-        if 'rarbg' in response.url.lower() and '/torrent/' in response.url:
-            # 直接解析RARBG详情页
-            yield from self.parse_rarbg_detail(response)
-            return
-        
-        # 检查是否是RARBG搜索页面
-        if 'rarbg' in response.url.lower() and '/search/' in response.url:
-            # 解析RARBG搜索页面
-            yield from self.parse_rarbg_search(response)
-            return
-        
-        # 通用的种子链接选择器
-        torrent_selectors = [
-            'a[href$=".torrent"]',  # 直接的.torrent文件链接
-            'a[href*="download"]',   # 包含download的链接
-            'a[href*="torrent"]',    # 包含torrent的链接
-            'a[href*="magnet:"]',    # 磁力链接
-        ]
-        
-        # 查找种子链接
-        for selector in torrent_selectors:
-            links = response.css(selector)
-            for link in links:
-                href = link.css('::attr(href)').get()
-                if href:
-                    # 处理相对链接
-                    full_url = urljoin(response.url, href)
-                    
-                    # 如果是磁力链接，直接提取
-                    if href.startswith('magnet:'):
-                        yield self.create_torrent_item(link, response, magnet_url=href, source_url=source_url)
-                    # 如果是.torrent文件
-                    elif href.endswith('.torrent') or 'download' in href.lower():
-                        yield self.create_torrent_item(link, response, torrent_url=full_url, source_url=source_url)
-        
-        # 查找详情页链接进行进一步爬取
-        detail_links = response.css('a[href*="details"], a[href*="view"], a[href*="torrent/"]::attr(href)').getall()
-        for link in detail_links[:10]:  # 限制详情页数量
-            full_url = urljoin(response.url, link)
-            yield scrapy.Request(
-                url=full_url,
-                callback=self.parse_detail,
-                meta={'source_url': source_url}
-            )
-        
-        # 查找分页链接
-        next_page_selectors = [
-            'a[href*="page"]:contains("Next")',
-            'a[href*="page"]:contains("下一页")',
-            'a.next::attr(href)',
-            'a[rel="next"]::attr(href)',
-        ]
-        
-        for selector in next_page_selectors:
-            next_page = response.css(selector).get()
-            if next_page:
+        regexes = profile.regexes
+        
+        page = response.meta.get('page', 1)
+        detail_priority = self.scorer.score_item({}, page) if self.scorer else 0
+        detail_count = 0
+        max_detail_links = self.filter_config.get('max_detail_links', 10)
+        next_page = None
+        next_rank = None
+        # 页面上的种子数和其中以前见过的数量（增量模式）
+        torrent_count = 0
+        known_count = 0
+        
+        for anchor in response.selector.root.iter('a'):
+            href = anchor.get('href')
+            if not href:
+                continue
+            
+            # 磁力链接，直接提取
+            if href.startswith('magnet:'):
+                item = self.create_torrent_item(anchor, response, magnet_url=href, source_url=source_url)
+                torrent_count += 1
+                known_count += self.seen_before(link_key(href), source_url, item['name'])
+                yield item
+                continue
+            
+            # .torrent文件或下载链接
+            if regexes['torrent_file'].search(href):
+                torrent_url = urljoin(response.url, href)
+                item = self.create_torrent_item(anchor, response, torrent_url=torrent_url, source_url=source_url)
+                torrent_count += 1
+                known_count += self.seen_before(link_key(torrent_url), source_url, item['name'])
+                yield item
+                continue
+            
+            # 分页链接：按 文字 > class > rel 的优先级保留一个
+            rank = self.next_page_rank(anchor, href, regexes)
+            if rank is not None:
+                if next_rank is None or rank < next_rank:
+                    next_page, next_rank = href, rank
+                continue
+            
+            # 详情页链接进行进一步爬取
+            # 限制每页的详情页数量（max_detail_links 为0时不限制）
+            if regexes['detail_link'].search(href) and (max_detail_links <= 0 or detail_count < max_detail_links):
+                detail_count += 1
+                detail_url = urljoin(response.url, href)
+                torrent_count += 1
+                # 详情页在解析后才记录，请求失败的详情页下次仍会被抓取
+                if self.seen_before(url_key(detail_url)):
+                    known_count += 1
+                    self.inc_stat('incremental/detail_requests_skipped')
+                    continue
                 yield scrapy.Request(
-                    url=urljoin(response.url, next_page),
-                    callback=self.parse,
-                    meta={'source_url': source_url}
+                    url=detail_url,
+                    callback=self.parse_detail,
+                    priority=detail_priority,
+                    meta={'source_url': source_url, 'page': page}
                 )
-                break  # 只跟踪一个下一页链接
+        
+        # 只跟踪一个下一页链接；增量模式下页面上的种子全部已见过时不再翻页
+        if next_page and not self.all_known(torrent_count, known_count, source_url):
+            request = self.next_page_request(response, urljoin(response.url, next_page), self.parse, source_url)
+            if request is not None:
+                yield request
+    
+    def next_page_request(self, response, url, callback, source_url, items=()):
+        """生成下一页请求；页码超过 filter_config 中的 max_pages（0为不限制）时返回None
+
+        items 为当前页解析出的行，用于估算下一页的优先级。
+        """
+        page = response.meta.get('page', 1) + 1
+        max_pages = self.filter_config.get('max_pages', 0)
+        if max_pages > 0 and page > max_pages:
+            self.logger.info(f"Reached max_pages ({max_pages}) for {source_url}")
+            self.inc_stat('budget/max_pages_reached')
+            return None
+        return scrapy.Request(
+            url=url,
+            callback=callback,
+            priority=self.scorer.score_page(items, page) if self.scorer else 0,
+            meta={'source_url': source_url, 'page': page, 'list_page': True}
+        )
+    
+    def seen_before(self, key, source_url=None, name=None):
+        """增量模式下判断种子是否在以前见过；给出 source_url 时同时记录该种子"""
+        state = self.incremental_state
+        if state is None:
+            return False
+        if source_url is None:
+            return state.is_known(key)
+        if state.remember(key, source_url, name):
+            self.inc_stat('incremental/new_items')
+            return False
+        return True
+    
+    def remember(self, key, source_url, name=None):
+        """增量模式下记录见过的种子"""
+        self.seen_before(key, source_url, name)
     
-    def parse_rarbg_detail(self, response):
+    @staticmethod
+    def request_url(response):
+        """重定向之前的请求URL，即列表页上查询和记录详情页时使用的URL"""
+        return response.meta.get('redirect_urls', [response.url])[0]
+    
+    def all_known(self, torrent_count, known_count, source_url):
+        """增量模式下列表页上的种子是否全部已见过（是则停止跟踪该来源的下一页）"""
+        if self.incremental_state is None or not torrent_count or known_count < torrent_count:
+            return False
+        self.logger.info(f"All {torrent_count} torrents on page already known, stop paging {source_url}")
+        self.inc_stat('incremental/pagination_stopped')
+        return True
+    
+    def next_page_rank(self, anchor, href, regexes):
+        """判断链接是否为下一页，返回优先级（越小越优先），不是则返回None"""
+        if regexes['next_page_href'].search(href) and regexes['next_page_text'].search(anchor.text_content()):
+            return 0
+        if 'next' in (anchor.get('class') or '').split():
+            return 1
+        if anchor.get('rel') == 'next':
+            return 2
+        return None
+    
+    def parse_rarbg_detail(self, response, profile=RARBG_PROFILE):
         """专门解析RARBG详情页面"""
         source_url = response.meta.get('source_url', response.url)
         
@@ -133,15 +248,15 @@ class TorrentSpider(scrapy.Spider):
         base_item = response.meta.get('base_item')
         if base_item:
             # 使用搜索页面的基本信息
-            item = base_item
+            item = row_record(base_item) if isinstance(base_item, SearchRow) else base_item
         else:
             # 创建新的种子项目
-            item = TorrentItem()
+            item = TorrentRecord()
             
             # 提取标题 - RARBG特定选择器
-            title = response.css('h2::text').get()
+            title = response.css(profile.selectors['title']).get()
             if not title:
-                title = response.css('title::text').get()
+                title = response.css(profile.selectors['page_title']).get()
                 if title:
                     title = title.replace(' - RARBG', '').strip()
             
@@ -150,83 +265,44 @@ class TorrentSpider(scrapy.Spider):
             item['crawl_time'] = datetime.now().isoformat()
         
         # 查找下载链接
-        download_link = response.css('a[href*="download.php"]::attr(href)').get()
+        download_link = response.css(profile.selectors['download_link']).get()
         if download_link:
             item['torrent_url'] = urljoin(response.url, download_link)
         
         # 查找磁力链接
-        magnet_link = response.css('a[href^="magnet:"]::attr(href)').get()
+        magnet_link = response.css(profile.selectors['magnet_link']).get()
         if magnet_link:
             item['magnet_url'] = magnet_link
         
-        # 提取页面文本进行信息挖掘
-        page_text = response.text
-        
-        # 提取文件大小
-        size_match = re.search(r'Size[:\s]*([0-9.]+\s*[KMGT]?B)', page_text, re.IGNORECASE)
-        if size_match:
-            item['size'] = size_match.group(1)
-        
-        # 提取种子数和下载数
-        seeders_match = re.search(r'Seeders[:\s]*([0-9]+)', page_text, re.IGNORECASE)
-        if seeders_match:
-            item['seeders'] = int(seeders_match.group(1))
-        
-        leechers_match = re.search(r'Leechers[:\s]*([0-9]+)', page_text, re.IGNORECASE)
-        if leechers_match:
-            item['leechers'] = int(leechers_match.group(1))
-        
-        # 提取上传时间
-        upload_time_match = re.search(r'Uploaded[:\s]*([^<\n]+)', page_text, re.IGNORECASE)
-        if upload_time_match:
-            item['upload_time'] = upload_time_match.group(1).strip()
-        
-        # 提取分类
-        category_match = re.search(r'Category[:\s]*([^<\n]+)', page_text, re.IGNORECASE)
-        if category_match:
-            item['category'] = category_match.group(1).strip()
-        
-        # 提取视频长度/时长
-        duration_patterns = [
-            r'Duration[:\s]*([0-9]+:[0-9]+)',         # Duration: MM:SS格式 (优先)
-            r'Duration[:\s]*([0-9]+:[0-9]+:[0-9]+)',  # Duration: HH:MM:SS格式
-            r'Runtime[:\s]*([0-9]+:[0-9]+:[0-9]+)',   # Runtime: HH:MM:SS
-            r'Runtime[:\s]*([0-9]+:[0-9]+)',          # Runtime: MM:SS
-            r'Length[:\s]*([0-9]+:[0-9]+:[0-9]+)',    # Length: HH:MM:SS
-            r'Length[:\s]*([0-9]+:[0-9]+)',           # Length: MM:SS
-            r'Time[:\s]*([0-9]+:[0-9]+:[0-9]+)',      # Time: HH:MM:SS
-            r'Time[:\s]*([0-9]+:[0-9]+)',             # Time: MM:SS
-            r'([0-9]+:[0-9]+:[0-9]+)',                # 直接匹配HH:MM:SS格式
-            r'Duration[:\s]*([0-9]+\s*min)',          # Duration: XX min
-            r'Runtime[:\s]*([0-9]+\s*min)',           # Runtime: XX min
-            r'([0-9]+\s*min\s*[0-9]*\s*sec)',        # XX min XX sec格式
-        ]
-        
-        for pattern in duration_patterns:
-            duration_match = re.search(pattern, page_text, re.IGNORECASE)
-            if duration_match:
-                item['duration'] = duration_match.group(1).strip()
-                break
+        # 单遍扫描页面文本，提取大小、种子数、上传时间、分类和时长等信息
+        item.update(profile.extractor.extract(response.text))
         
+        self.remember(url_key(item['source_url'] if base_item else self.request_url(response)), source_url,
+                      item.get('name'))
         yield item
     
-    def parse_rarbg_search(self, response):
+    def parse_rarbg_search(self, response, profile=RARBG_PROFILE):
         """解析RARBG搜索页面，批量提取torrent链接"""
         source_url = response.meta.get('source_url', response.url)
         
         # 根据网页结构，RARBG搜索页面的torrent链接在表格中
         # 每一行包含一个torrent的信息
-        torrent_rows = response.css('table tr')
+        torrent_rows = response.css(profile.selectors['rows'])
         
         # 调试：打印页面内容和找到的行数
         self.logger.info(f"Found {len(torrent_rows)} table rows")
+        page = response.meta.get('page', 1)
+        row_items = []
+        torrent_count = 0
+        known_count = 0
         
         for row in torrent_rows[1:]:  # 跳过表头
-            # 提取torrent名称和链接 - 尝试多种选择器
-            name_cell = row.css('td a[href*="/torrent/"]')
-            if not name_cell:
-                # 尝试其他可能的选择器
-                name_cell = row.css('td:nth-child(2) a')
+            # 提取torrent名称和链接 - 按优先级尝试多种选择器
+            name_cell = None
+            for selector in profile.selectors['row_link']:
+                name_cell = row.css(selector)
+                if name_cell:
+                    break
             if not name_cell:
                 continue
                 
@@ -236,6 +312,7 @@ class TorrentSpider(scrapy.Spider):
             if torrent_name and torrent_detail_url:
                 # 构建完整的详情页URL
                 full_detail_url = urljoin(response.url, torrent_detail_url)
+                detail_key = url_key(full_detail_url)
                 
                 # 提取基本信息
                 cells = row.css('td')
@@ -254,7 +331,7 @@ class TorrentSpider(scrapy.Spider):
                         leechers = 0
                     
                     # 创建基本的torrent item
-                    item = TorrentItem()
+                    item = TorrentRecord()
                     item['name'] = self.clean_text(torrent_name)
                     item['source_url'] = full_detail_url
                     item['crawl_time'] = datetime.now().isoformat()
@@ -264,60 +341,110 @@ class TorrentSpider(scrapy.Spider):
                     item['upload_time'] = self.clean_text(upload_time)
                     item['category'] = self.clean_text(category)
                     
+                    # 部分镜像站在列表行中直接给出磁力/下载链接
+                    row_magnet = row.css(profile.selectors['magnet_link']).get()
+                    if row_magnet:
+                        item['magnet_url'] = row_magnet
+                    row_download = row.css(profile.selectors['download_link']).get()
+                    if row_download:
+                        item['torrent_url'] = urljoin(response.url, row_download)
+                    
+                    # 注定被 FilterPipeline 丢弃的行不再生成item或详情页请求
+                    reason = self.item_filter.reject_reason(item)
+                    if reason:
+                        self.logger.debug(f"Skipped search row with {reason}")
+                        self.inc_stat('filter/list_rows_skipped')
+                        if self.needs_detail(item):
+                            self.inc_stat('filter/detail_requests_saved')
+                        torrent_count += 1
+                        known_count += self.seen_before(detail_key, source_url, item['name'])
+                        continue
+                    row_items.append(item)
+                    torrent_count += 1
+                    
+                    if not self.needs_detail(item):
+                        known_count += self.seen_before(detail_key, source_url, item['name'])
+                        yield item
+                        continue
+                    
+                    # 增量模式下以前抓取过详情页的行不再请求
+                    # （详情页在解析后才记录，请求失败的行下次仍会被抓取）
+                    if self.seen_before(detail_key):
+                        known_count += 1
+                        self.inc_stat('incremental/detail_requests_skipped')
+                        continue
+                    
                     # 发起请求获取详细信息（包括磁力链接和duration）
                     yield scrapy.Request(
                         url=full_detail_url,
                         callback=self.parse_rarbg_detail,
+                        # 按列表页已知的做种数、上传时间、分类和页深估算价值，价值高的先抓取
+                        priority=self.scorer.score_item(item, page) if self.scorer else 0,
                         meta={
                             'source_url': source_url,
-                            'base_item': item  # 传递基本信息
+                            'base_item': search_row(item)  # 传递基本信息（紧凑的元组）
                         }
                     )
         
-        # 查找下一页链接
-        next_page_links = response.css('a[href*="/search/"]:contains("next"), a[href*="/search/"]:contains("下一页"), a[href*="/search/"]:contains(">")')
+        # 查找下一页链接；增量模式下页面上的种子全部已见过时不再翻页
+        all_known = self.all_known(torrent_count, known_count, source_url)
+        next_page_links = [] if all_known else response.css(profile.selectors['next_page'])
         for next_link in next_page_links:
             next_url = next_link.css('::attr(href)').get()
             if next_url and 'search' in next_url:
-                full_next_url = urljoin(response.url, next_url)
-                yield scrapy.Request(
-                    url=full_next_url,
-                    callback=self.parse_rarbg_search,
-                    meta={'source_url': source_url}
-                )
+                request = self.next_page_request(response, urljoin(response.url, next_url),
+                                                 self.parse_rarbg_search, source_url, row_items)
+                if request is not None:
+                    yield request
                 break  # 只跟踪一个下一页链接
     
-    def parse_detail(self, response):
-        """解析详情页面"""
+    def needs_detail(self, item):
+        """判断列表行生成的item是否还需要请求详情页
+
+        默认模式下总是请求；仅列表模式下行中已有磁力链接时不请求，否则只在
+        detail_fields 中有字段缺失时请求。
+        """
+        if not self.list_only:
+            return True
+        if item.get('magnet_url'):
+            return False
+        return any(not item.get(field) for field in self.detail_fields)
+    
+    def inc_stat(self, key, count=1):
+        # 直接实例化（如基准测试）时没有crawler
+        crawler = getattr(self, 'crawler', None)
+        if crawler is not None:
+            crawler.stats.inc_value(key, count)
+    
+    def parse_detail(self, response, profile=GENERIC_PROFILE):
+        """解析详情页面：页面信息只提取一次，同一发布的种子文件和磁力链接合并为一条"""
         source_url = response.meta.get('source_url', response.url)
         
-        # 在详情页查找更精确的种子信息
-        torrent_links = response.css('a[href$=".torrent"], a[href*="download"]')
-        magnet_links = response.css('a[href^="magnet:"]')
+        self.remember(url_key(self.request_url(response)), source_url)
         
-        # 提取种子链接
-        for link in torrent_links:
-            href = link.css('::attr(href)').get()
-            if href:
-                full_url = urljoin(response.url, href)
-                item = self.create_detailed_torrent_item(response, torrent_url=full_url, source_url=source_url)
-                if item:
-                    yield item
+        # 在详情页查找更精确的种子信息
+        torrent_urls = [urljoin(response.url, href) for href in
+                        response.css(profile.selectors['detail_torrent_links']).css('::attr(href)').getall()]
+        magnet_urls = response.css(profile.selectors['detail_magnet_links']).css('::attr(href)').getall()
+        if not torrent_urls and not magnet_urls:
+            return
         
-        # 提取磁力链接
-        for link in magnet_links:
-            href = link.css('::attr(href)').get()
-            if href:
-                item = self.create_detailed_torrent_item(response, magnet_url=href, source_url=source_url)
-                if item:
-                    yield item
+        # 标题、大小、种子数和描述等页面级信息由页面上的所有链接共用
+        metadata = self.detail_page_metadata(response, profile)
+        for torrent_url, magnet_url in pair_release_links(torrent_urls, magnet_urls):
+            if torrent_url and magnet_url:
+                self.inc_stat('detail/links_merged')
+            yield self.create_detailed_torrent_item(response, torrent_url=torrent_url, magnet_url=magnet_url,
+                                                    source_url=source_url, profile=profile, metadata=metadata)
     
-    def create_torrent_item(self, link_element, response, torrent_url=None, magnet_url=None, source_url=None):
-        """创建基础的种子项目"""
-        item = TorrentItem()
-        
-        # 提取名称
-        name = link_element.css('::text').get() or link_element.css('::attr(title)').get()
+    def create_torrent_item(self, anchor, response, torrent_url=None, magnet_url=None, source_url=None):
+        """创建基础的种子项目，anchor 为链接的lxml元素"""
+        item = TorrentRecord()
+        
+        # 提取名称：链接的第一个文本节点，没有则使用title属性
+        name = anchor.text
+        if not name:
+            name = next((child.tail for child in anchor if child.tail), None) or anchor.get('title')
         item['name'] = self.clean_text(name) if name else 'Unknown'
         
         item['torrent_url'] = torrent_url
@@ -327,69 +454,40 @@ class TorrentSpider(scrapy.Spider):
         
         return item
     
-    def create_detailed_torrent_item(self, response, torrent_url=None, magnet_url=None, source_url=None):
-        """创建详细的种子项目"""
-        item = TorrentItem()
+    def detail_page_metadata(self, response, profile=GENERIC_PROFILE):
+        """提取详情页的页面级信息（标题、大小、种子数、下载数和描述）"""
+        metadata = {}
         
         # 尝试提取标题
-        title_selectors = [
-            'h1::text',
-            '.title::text',
-            '#title::text',
-            'title::text'
-        ]
-        
         name = None
-        for selector in title_selectors:
+        for selector in profile.selectors['title']:
             name = response.css(selector).get()
             if name:
                 break
+        metadata['name'] = self.clean_text(name) if name else 'Unknown'
         
-        item['name'] = self.clean_text(name) if name else 'Unknown'
-        item['torrent_url'] = torrent_url
-        item['magnet_url'] = magnet_url
-        item['source_url'] = source_url or response.url
-        item['crawl_time'] = datetime.now().isoformat()
-        
-        # 尝试提取文件大小
-        size_patterns = [
-            r'Size[:\s]*([0-9.]+\s*[KMGT]?B)',
-            r'大小[:\s]*([0-9.]+\s*[KMGT]?B)',
-            r'([0-9.]+\s*[KMGT]B)',
-        ]
-        
-        page_text = response.text
-        for pattern in size_patterns:
-            match = re.search(pattern, page_text, re.IGNORECASE)
-            if match:
-                item['size'] = match.group(1)
-                break
-        
-        # 尝试提取种子数和下载数
-        seeders_pattern = r'Seed[ers]*[:\s]*([0-9]+)'
-        leechers_pattern = r'Leech[ers]*[:\s]*([0-9]+)'
-        
-        seeders_match = re.search(seeders_pattern, page_text, re.IGNORECASE)
-        if seeders_match:
-            item['seeders'] = int(seeders_match.group(1))
-        
-        leechers_match = re.search(leechers_pattern, page_text, re.IGNORECASE)
-        if leechers_match:
-            item['leechers'] = int(leechers_match.group(1))
+        # 单遍扫描页面文本，提取文件大小、种子数和下载数
+        metadata.update(profile.extractor.extract(response.text))
         
         # 尝试提取描述
-        description_selectors = [
-            '.description::text',
-            '#description::text',
-            '.content::text',
-        ]
-        
-        for selector in description_selectors:
+        for selector in profile.selectors['description']:
             description = response.css(selector).get()
             if description:
-                item['description'] = self.clean_text(description)
+                metadata['description'] = self.clean_text(description)
                 break
         
+        return metadata
+    
+    def create_detailed_torrent_item(self, response, torrent_url=None, magnet_url=None, source_url=None,
+                                     profile=GENERIC_PROFILE, metadata=None):
+        """创建详细的种子项目，metadata 为已提取的页面级信息（为None时从页面提取）"""
+        if metadata is None:
+            metadata = self.detail_page_metadata(response, profile)
+        item = TorrentRecord(metadata)
+        item['torrent_url'] = torrent_url
+        item['magnet_url'] = magnet_url
+        item['source_url'] = source_url or response.url
+        item['crawl_time'] = datetime.now().isoformat()
         return item
     
     def clean_text(self, text):
@@ -408,9 +506,9 @@ class TorrentSpider(scrapy.Spider):
             if name_match:
                 info['name'] = name_match.group(1).replace('+', ' ')
             
-            # 提取哈希值
-            hash_match = re.search(r'xt=urn:btih:([a-fA-F0-9]+)', magnet_url)
-            if hash_match:
-                info['hash'] = hash_match.group(1)
+            # 提取哈希值（支持十六进制和base32形式，统一为小写十六进制）
+            infohash = extract_infohash(magnet_url)
+            if infohash:
+                info['hash'] = infohash.hex()
         
         return info
\ No newline at end of file
@@ -0,0 +1,142 @@
+# 后台写入线程
+#
+# 输出管道在反应器线程中把项目序列化，写文件、提交事务等可能阻塞在磁盘上的操作
+# 交给 BackgroundWriter：操作放入有界队列，由专用线程按提交顺序执行，同一个文件
+# 或数据库连接只在写入线程中使用，不需要加锁。
+#
+# 队列已满时 submit 返回一个Deferred，操作放入队列后才触发。process_item 返回它，
+# Scrapy 等它触发后再把项目交给下一个管道；正在处理的项目多了以后scraper不再接收
+# 新的响应，磁盘跟不上时下载也随之放慢，内存中积压的数据有上限。
+#
+# 需要结果的操作（任务检查点读取写入位置、去重管道查询索引）用 call 提交，返回的
+# Deferred 在操作执行完后触发，反应器线程不等待队列写完。
+#
+# 写入线程中的异常回到反应器线程记录日志和统计，不中断后续的写入；close 返回的
+# Deferred 在队列中的操作全部执行完、线程结束后触发。
+
+import queue
+import threading
+from collections import deque
+
+from twisted.internet import defer
+
+# 队列中表示写入线程结束的标记
+STOP = object()
+
+
+class BackgroundWriter:
+    """在专用线程中按顺序执行写入操作的有界队列
+
+    submit、call、close 只在反应器线程中调用。name 用于线程名、日志和统计
+    writer/<name>/errors、writer/<name>/backpressure。count 为False的操作和 close
+    放入的操作不计入等待次数。
+    """
+
+    def __init__(self, name, queue_size=1000, logger=None, stats=None):
+        from twisted.internet import reactor
+        self.reactor = reactor
+        self.name = name
+        self.queue = queue.Queue(max(1, queue_size))
+        self.logger = logger
+        self.stats = stats
+        # 队列已满时等待放入队列的 (操作, Deferred)，保持提交顺序
+        self.waiting = deque()
+        self.resuming = False
+        self.closing = None
+        self.thread = threading.Thread(target=self.run, name=f'writer-{name}', daemon=True)
+        self.thread.start()
+
+    def submit(self, function, *args, result=None, count=True):
+        """提交写入操作，返回 result；队列已满时返回操作放入队列后以 result 触发的Deferred"""
+        waiter = self.put((function, args, None), count)
+        if waiter is None:
+            return result
+        return waiter.addCallback(lambda _: result)
+
+    def put(self, operation, count=True):
+        if not self.waiting:
+            try:
+                self.queue.put_nowait(operation)
+                return None
+            except queue.Full:
+                pass
+        # 队列满时其中还有未执行的操作，写入线程取走它们后看到 waiting 不为空会调用 resume
+        waiter = defer.Deferred()
+        self.waiting.append((operation, waiter))
+        # 写入线程可能在 put_nowait 失败之后、append 之前就取空了队列并阻塞在 get 上，
+        # 不会再调用 resume，所以放入 waiting 后自己再试一次
+        self.resume()
+        if waiter.called:
+            return None
+        if count and self.stats is not None:
+            self.stats.inc_value(f'writer/{self.name}/backpressure')
+        return waiter
+
+    def resume(self):
+        """写入线程取走操作后，把等待中的操作依次放入队列并触发对应的Deferred"""
+        self.resuming = False
+        while self.waiting:
+            operation, waiter = self.waiting[0]
+            try:
+                self.queue.put_nowait(operation)
+            except queue.Full:
+                return
+            self.waiting.popleft()
+            waiter.callback(None)
+
+    def call(self, function, *args, count=True):
+        """在写入线程中执行 function，返回以其结果触发的Deferred（异常时errback）
+
+        之前提交的操作先执行完，因此返回的写入位置包含了此前提交的全部数据。
+        count 为False的操作（如检查点读取写入位置）队列已满时不计入等待次数。
+        """
+        if self.closing is not None:
+            return defer.fail(RuntimeError(f'{self.name} writer is closed'))
+        result = defer.Deferred()
+        self.put((function, args, lambda value: self.reactor.callFromThread(self.fire, result, value)), count)
+        return result
+
+    def fire(self, result, value):
+        if isinstance(value, Exception):
+            result.errback(value)
+        else:
+            result.callback(value)
+
+    def close(self, finish=None):
+        """执行完队列中的操作和 finish（如关闭文件）后结束写入线程，
+        返回在线程结束后触发的Deferred"""
+        if self.closing is None:
+            self.closing = defer.Deferred()
+            if finish is not None:
+                self.put((finish, (), None), count=False)
+            self.put(STOP, count=False)
+        return self.closing
+
+    def run(self):
+        while True:
+            operation = self.queue.get()
+            if operation is STOP:
+                break
+            function, args, finished = operation
+            try:
+                result = function(*args)
+            except Exception as e:
+                result = e
+                if finished is None:
+                    self.reactor.callFromThread(self.report, e)
+            if finished is not None:
+                finished(result)
+            if self.waiting and not self.resuming:
+                self.resuming = True
+                self.reactor.callFromThread(self.resume)
+        self.reactor.callFromThread(self.stopped)
+
+    def report(self, error):
+        if self.logger is not None:
+            self.logger.error(f"Failed to write {self.name}: {error}")
+        if self.stats is not None:
+            self.stats.inc_value(f'writer/{self.name}/errors')
+
+    def stopped(self):
+        self.thread.join()
+        self.closing.callback(None)